@@ -232,6 +232,9 @@ checkCooldown = {"minutes":3}
 # number of bounties ahead of a checked system in a route to report a recent criminal spotting (+1)
 closeBountyThreshold = 4
 
+# How many seconds to gather checks for, before telling every other guild about them in a single digest message
+checkDigestWindowSeconds = 30
+
 # Text to send to a BountyBoardChannel when no bounties are currently active
 bbcNoBountiesMsg = "```css\n[ NO ACTIVE BOUNTIES ]\n\nThere are currently no active bounty listings.\nPlease check back later, or use [ $notify bounties ] to be pinged when new ones become available!\n```"
 
@@ -241,18 +244,78 @@ bbcHTTPErrRetries = 3
 # The number of seconds to wait between BBC listing update retries upon HTTP exception catching
 bbcHTTPErrRetryDelaySeconds = 1
 
+# The maximum number of messages to read from a BBC's channel history when finding its listings on startup.
+# Listings not found within this many messages are fetched individually.
+bbcHistoryScanLimit = 200
+
+# The maximum number of BBCs to load at once on startup
+bbcMaxConcurrentInits = 16
+
+# The minimum number of seconds between edits to a BBC listing. Checks made in the meantime are shown by the next edit.
+bbcEditIntervalSeconds = 5
+
+# The maximum number of BBC listing edits in flight at once
+bbcMaxConcurrentEdits = 8
+
 
 ##### SAVING #####
 
 # The time to wait inbetween database autosaves.
 savePeriod = {"hours":1}
 
+# Where to store the users, guilds and bounties databases. One of:
+# "json": JSON files at the paths below
+# "sqlite": A SQLite database at sqliteDBPath. Existing JSON saves can be copied into it with migrateToSQLite.py
+databaseBackend = "json"
+# path to the SQLite database file, used if databaseBackend is "sqlite"
+sqliteDBPath = "saveData/bountybot.sqlite3"
+# Only load users from the SQLite database when they are first used, keeping just their IDs and leaderboard stats in memory.
+# Requires databaseBackend to be "sqlite"
+lazyUserLoading = False
+# When lazyUserLoading, the number of least recently used users to keep in memory after each save
+userCacheSize = 1000
+
 # path to JSON files for database saves
 userDBPath = "saveData/users.json"
 guildDBPath = "saveData/guilds.json"
 bountyDBPath = "saveData/bounties.json"
 reactionMenusDBPath = "saveData/reactionMenus.json"
 
+# The file format of userDBPath. One of:
+# "json": A single JSON object, which must be read into memory all at once
+# "ndjson": Newline-delimited JSON with one user per line, which is loaded one user at a time
+# "binary": A compact binary encoding storing builtIn items as IDs, which is also loaded one user at a time. Can be exported to "ndjson" with exportUsersDB.py
+# Saves in any of these formats are still read, and replaced on the next full save
+userDBFormat = "json"
+# The number of worker processes used to decode and validate "ndjson" users saves and sharded users databases at startup. 0 reads them in the main process.
+# Users are still built in the main process, which is most of the loading time, and passing decoded users back from workers
+# costs about as much as decoding them. Only worth enabling with several idle cores, or to skip invalid users rather than failing to start
+userDBLoadProcesses = 0
+
+# How to save the users database when databaseBackend is "json". One of:
+# "full": Write every user to userDBPath on every save
+# "incremental": Append only the users that have changed since the last save to userDBJournalPath, and write a full snapshot every userDBSnapshotPeriod saves
+# "sharded": Split users between userDBShardCount files in userDBShardDir by a hash of their ID, only rewriting the files containing changed users.
+#               Existing userDBPath saves are still read, and replaced by shards on the first save
+userDBSaveMode = "full"
+# path to the journal of changed users, merged on top of userDBPath when loading
+userDBJournalPath = "saveData/users.journal"
+# In incremental save mode, the number of saves between full snapshots of the users database, after which the journal is emptied
+userDBSnapshotPeriod = 24
+# In sharded save mode, the directory holding the users database shards and their manifest
+userDBShardDir = "saveData/users"
+# In sharded save mode, the number of files to split the users database into. Changing this rewrites every shard on the next save
+userDBShardCount = 16
+
+# Whether or not to record changes to user balances in an append-only journal, making them durable between saves
+useEconomyJournal = False
+# path to the economy journal, replayed on top of the users database when loading
+economyJournalPath = "saveData/economy.journal"
+# The time to wait inbetween writes of recorded balance changes to the economy journal.
+# In "dynamic" timedTaskCheckingType, at most this much play is lost in a crash. In "fixed" timedTaskCheckingType, flushes only happen
+# on passes of the checking loop, so up to the larger of this and timedTaskLatenessThresholdSeconds (10s by default) is lost.
+economyJournalFlushPeriod = {"seconds": 1}
+
 # path to folder to save log txts to
 loggingFolderPath = "saveData/logs"
 
@@ -261,6 +324,7 @@ loggingFolderPath = "saveData/logs"
 ##### SCHEDULING #####
 
 # Whether to execute timedtask checks every timedTaskLatenessThresholdSeconds ("fixed"), or to calculate the delay to wait until the next TimedTask is schedule to expire ("dynamic")
+# In "dynamic" mode, the checking loop also wakes early whenever a task is scheduled to expire before every other scheduled task
 timedTaskCheckingType = "fixed"
 
 # How late a timed task may acceptably be in seconds.
@@ -268,6 +332,50 @@ timedTaskCheckingType = "fixed"
 # replaces the depracated 'delayFactor' variable
 timedTaskLatenessThresholdSeconds = 10
 
+# The maximum number of expired TimedTasks whose expiry functions may run at the same time
+timedTaskMaxConcurrentExpiries = 8
+
+# How long in seconds a TimedTask's expiry function may run before it is cancelled. Database saves are never cancelled.
+timedTaskExpiryTimeoutSeconds = 120
+
+# Where to keep duel request and reaction menu timeouts. "heap" keeps them in the same heap as every other TimedTask.
+# "wheel" keeps them in a hashed timing wheel, which schedules and cancels timeouts in constant time, but may expire them up to timedTaskWheelTickSeconds late.
+timedTaskGroupBackend = "heap"
+
+# The length of a timing wheel tick in seconds, when timedTaskGroupBackend is "wheel"
+timedTaskWheelTickSeconds = 1
+
+# The number of slots in the timing wheel, when timedTaskGroupBackend is "wheel". Timeouts further away than timedTaskWheelTickSeconds * timedTaskWheelSlots seconds share slots with nearer timeouts.
+timedTaskWheelSlots = 512
+
+
+
+##### MESSAGING #####
+
+# The maximum number of messages that may be in flight at once when announcing to every guild
+fanOutMaxConcurrent = 16
+
+# The maximum long-run number of announcement messages sent per second across all guilds, and how many may be sent at once before this applies.
+# Discord's global limit is 50 requests per second, and announcements share it with everything else the bot does.
+fanOutGlobalRatePerSecond = 40
+fanOutGlobalBurst = 40
+
+# The maximum long-run number of announcement messages sent per second to a single channel, and how many may be sent at once before this applies.
+# Discord allows 5 messages per 5 seconds in each channel.
+fanOutChannelRatePerSecond = 1
+fanOutChannelBurst = 5
+
+# How many times to retry an announcement message which is rate limited or hits a discord server error,
+# and how long to wait before the first retry. The wait doubles for each following retry, unless discord says how long to wait.
+fanOutMaxRetries = 3
+fanOutRetryBaseDelaySeconds = 1
+
+# How long to wait for more plain text to merge into a message to the same channel, before sending it
+outboundCoalesceWindowSeconds = 0.25
+
+# The maximum number of unsent messages that may be queued to a single channel. Commands sending to a full channel wait for it to have room.
+outboundMaxPendingPerChannel = 20
+
 
 
 ##### MISC #####
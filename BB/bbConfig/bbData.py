@@ -543,6 +543,8 @@ builtInSystemObjs = {}
 builtInCriminalObjs = {}
 # Ships are now stored as keys (names) rather than objects, as ships are no longer shared - every user has a unique ship object to allow for customisation
 # builtInShipObjs = {}
+# Ship emojis are shared between all ships of the same type instead
+builtInShipEmojis = {}
 builtInModuleObjs = {}
 builtInWeaponObjs = {}
 builtInUpgradeObjs = {}
@@ -0,0 +1,111 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from ..bbObjects import bbUser
+
+import asyncio
+from .. import bbUtil, bbGlobals
+
+
+# The bbUser attributes recorded for every economy journal entry
+economyAttributeNames = ["credits", "lifetimeCredits", "duelWins", "duelLosses", "duelCreditsWins", "duelCreditsLosses"]
+
+
+class bbEconomyJournal:
+    """An append-only journal of changes to user balances, allowing credit movements to be made durable without saving the users database.
+    Entries are buffered in memory and appended to file in batches by flush, with each batch flushed to disk before flush returns.
+
+    Each entry records the absolute values of the changed user's economyAttributeNames, so replaying an entry more than once is harmless.
+    Entries which also moved items, such as shop transactions, record the entire serialized user instead.
+    Entries are stamped with the users database saveGeneration at the time of the change. Entries from before a users database save
+    are included in that save, so compact can remove them from the journal. Entries are replayed with bbUserDB.applyEconomyJournal.
+
+    :var filePath: Path to the JSON lines file where the journal is stored
+    :vartype filePath: str
+    :var pendingEntries: Entries which have been recorded but not yet written to file
+    :vartype pendingEntries: list[dict]
+    :var writtenEntries: Entries which have been written to file, and have not yet been removed by compact
+    :vartype writtenEntries: list[dict]
+    :var fileLock: Lock preventing flush and compact from writing to the journal file at the same time. Created on first use, as it must belong to the running event loop.
+    :vartype fileLock: asyncio.Lock
+    """
+
+    def __init__(self, filePath : str, writtenEntries=[]):
+        """
+        :param str filePath: Path to the JSON lines file where the journal is stored
+        :param list[dict] writtenEntries: Entries already stored in the file at filePath (Default [])
+        """
+        self.filePath = filePath
+        self.pendingEntries = []
+        self.writtenEntries = list(writtenEntries)
+        self.fileLock = None
+
+
+    def getFileLock(self) -> asyncio.Lock:
+        """Get the lock guarding writes to the journal file, creating it if this is the first time it has been requested.
+
+        :return: The lock guarding writes to the journal file
+        :rtype: asyncio.Lock
+        """
+        if self.fileLock is None:
+            self.fileLock = asyncio.Lock()
+        return self.fileLock
+
+
+    def record(self, user : bbUser.bbUser, reason : str, saveGeneration : int, wholeUser=False):
+        """Record the current balance of the given user in the journal.
+        The entry will be written to file by the next call to flush.
+
+        :param bbUser user: The user whose balance has changed
+        :param str reason: A short description of the reason for the change, e.g "pay" or "duel"
+        :param int saveGeneration: The saveGeneration of the users database that user is stored in
+        :param bool wholeUser: Give True to record the entire serialized user, for changes which moved items as well as credits (Default False)
+        """
+        entry = {"saveGeneration": saveGeneration, "id": user.id, "reason": reason}
+        if wholeUser:
+            entry["user"] = user.toDictNoId()
+        else:
+            for attrName in economyAttributeNames:
+                entry[attrName] = getattr(user, attrName)
+        self.pendingEntries.append(entry)
+
+
+    async def flush(self):
+        """Append all pending entries to the journal file in a worker thread, in a single write which is flushed to disk.
+        """
+        if len(self.pendingEntries) == 0:
+            return
+        async with self.getFileLock():
+            entries = self.pendingEntries
+            self.pendingEntries = []
+            try:
+                await bbUtil.appendJSONLinesAsync(self.filePath, entries)
+            except Exception:
+                # Put the entries back so they are retried by the next flush
+                self.pendingEntries = entries + self.pendingEntries
+                raise
+            self.writtenEntries += entries
+
+
+    async def compact(self, saveGeneration : int):
+        """Fold the journal into a completed save of the users database, by removing all entries that the save already includes.
+        The remaining entries are written over the journal file atomically, in a worker thread.
+
+        :param int saveGeneration: The saveGeneration of the users database save that has just completed
+        """
+        async with self.getFileLock():
+            self.pendingEntries = [entry for entry in self.pendingEntries if entry["saveGeneration"] >= saveGeneration]
+            remainingEntries = [entry for entry in self.writtenEntries if entry["saveGeneration"] >= saveGeneration]
+            await bbUtil.writeJSONLinesAsync(self.filePath, remainingEntries)
+            self.writtenEntries = remainingEntries
+
+
+def recordUserCredits(user : bbUser.bbUser, reason : str, wholeUser=False):
+    """Record the current balance of the given user in bbGlobals.economyJournal, if the economy journal is enabled.
+
+    :param bbUser user: The user whose balance has changed
+    :param str reason: A short description of the reason for the change, e.g "pay" or "duel"
+    :param bool wholeUser: Give True to record the entire serialized user, for changes which moved items as well as credits (Default False)
+    """
+    if bbGlobals.economyJournal is not None:
+        bbGlobals.economyJournal.record(user, reason, bbGlobals.usersDB.saveGeneration, wholeUser=wholeUser)
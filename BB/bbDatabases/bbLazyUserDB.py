@@ -0,0 +1,267 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, List, Union
+if TYPE_CHECKING:
+    from .bbSQLiteDB import bbSQLiteStore
+
+from collections import OrderedDict
+from ..bbObjects import bbUser
+from . import bbUserDB
+
+
+class bbLazyUserDB(bbUserDB.bbUserDB):
+    """A bbUserDB which only keeps a compact index of its users in memory, building full bbUser objects as they are needed.
+    The index records every user's ID, along with the stats named in bbUserDB.indexedStatNames so that leaderboards can be built without loading users.
+    bbUsers are read from a bbSQLiteStore on first access by getUser or getOrAddID, and kept in users, which is ordered from least to most recently used.
+
+    Users are only evicted by evictColdUsers, which should be called once a save of the database has been written successfully.
+    This means that evicted users are always already written back to the store. users may therefore grow beyond cacheSize between saves.
+    Users with open duel challenges, targetted by open duel challenges, or which own a running poll are never evicted,
+    as other objects hold references to them.
+
+    Commands may hold a bbUser across awaits, during which a save may begin and clear the user's dirty flag. Were the user then evicted,
+    the command's later changes would be made to an object that the database no longer holds, and lost. To prevent this, command handlers
+    call startCommand and finishCommand around each command, and every user fetched or added while any command is running is kept in inUseIDs.
+    Users in inUseIDs are not evicted, and inUseIDs is emptied once no commands are running.
+
+    Users that are not loaded are read from the store by a synchronous SQLite query on the calling thread, which is usually the event loop.
+    This is deliberate: reading a single user by its primary key takes well under a millisecond, and keeping getUser synchronous avoids
+    making every user lookup in the bot awaitable.
+
+    :var inUseIDs: The IDs of users fetched or added while a command was running, which must not be evicted
+    :vartype inUseIDs: set[int]
+    :var numActiveCommands: The number of commands started with startCommand that have not yet finished
+    :vartype numActiveCommands: int
+
+    :var store: The store that users are read from
+    :vartype store: bbSQLiteStore
+    :var cacheSize: The number of users to keep in memory after evicting cold users
+    :vartype cacheSize: int
+    :var userStats: The indexed stats of every user in the database, as tuples ordered by bbUserDB.indexedStatNames. Stats of users in memory may be out of date.
+    :vartype userStats: dict[int, tuple]
+    """
+
+    def __init__(self, store : bbSQLiteStore, cacheSize : int):
+        """
+        :param bbSQLiteStore store: The store to read users from
+        :param int cacheSize: The number of users to keep in memory after evicting cold users
+        """
+        super().__init__()
+        self.users = OrderedDict()
+        self.store = store
+        self.cacheSize = cacheSize
+        self.userStats = {}
+        self.inUseIDs = set()
+        self.numActiveCommands = 0
+
+
+    def startCommand(self):
+        """Record that a command has started running. Until every running command has finished, users fetched or added are not evicted.
+        Every call must be matched by a call to finishCommand once the command has finished.
+        """
+        self.numActiveCommands += 1
+
+
+    def finishCommand(self):
+        """Record that a command started with startCommand has finished. Once no commands are running, users are no longer kept in memory for commands.
+        """
+        self.numActiveCommands -= 1
+        if self.numActiveCommands == 0:
+            self.inUseIDs.clear()
+
+
+    def markInUse(self, id : int):
+        """Prevent the user with the given ID from being evicted until no commands are running, if a command is running.
+
+        :param int id: integer discord ID for the user being used
+        """
+        if self.numActiveCommands > 0:
+            self.inUseIDs.add(id)
+
+
+    def userIDExists(self, id : int) -> bool:
+        """Check if a user is stored in the database with the given ID, whether or not it is currently loaded.
+
+        :param int id: integer discord ID for the bbUser to search for
+        :return: True if id corresponds to a user in the database, false if no user is found with the id
+        :rtype: bool
+        """
+        return id in self.userStats
+
+
+    def isLoaded(self, id : int) -> bool:
+        """Check if the user with the given ID is currently held in memory.
+
+        :param int id: integer discord ID for the bbUser to search for
+        :return: True if a bbUser object with the given ID is held in users, False otherwise
+        :rtype: bool
+        """
+        return id in self.users
+
+
+    def reinitUser(self, id : int):
+        """Reset the stats for the user with the specified ID.
+
+        :param int ID: The ID of the user to reset. Can be integer or a string of digits.
+        :raise KeyError: If no user is found with the requested ID
+        """
+        self.getUser(id).resetUser()
+
+
+    def addUser(self, id : int) -> bbUser.bbUser:
+        """
+        Create a new bbUser object with the specified ID and add it to the database
+
+        :param int id: integer discord ID for the user to add
+        :raise KeyError: If a bbUser already exists in the database with the specified ID
+        :return: the newly created bbUser
+        :rtype: bbUser
+        """
+        newUser = super().addUser(id)
+        self.userStats[newUser.id] = bbUserDB.getIndexedStats(newUser)
+        self.markInUse(newUser.id)
+        return newUser
+
+
+    def addUserObj(self, userObj : bbUser.bbUser):
+        """Store the given bbUser object in the database
+
+        :param bbUser userObj: bbUser to store
+        :raise KeyError: If a bbUser already exists in the database with the same ID as the given bbUser
+        """
+        super().addUserObj(userObj)
+        self.userStats[userObj.id] = bbUserDB.getIndexedStats(userObj)
+        self.markInUse(userObj.id)
+
+
+    def removeUser(self, id : int):
+        """Remove the bbUser with the specified ID from the database, whether or not it is currently loaded.
+
+        :param int id: integer discord ID for the user to remove
+        :raise KeyError: If no bbUser exists in the database with the specified ID
+        """
+        id = self.validateID(id)
+        if not self.userIDExists(id):
+            raise KeyError("user not found: " + str(id))
+        self.users.pop(id, None)
+        del self.userStats[id]
+        self.removedUserIDs.add(id)
+
+
+    def getUser(self, id : int) -> bbUser.bbUser:
+        """Fetch the bbUser from the database with the given ID, reading it from the store if it is not already loaded.
+        The store is read synchronously, blocking the event loop for the duration of a single-row SQLite query.
+
+        :param int ID: integer discord ID for the user to fetch
+        :return: the stored bbUser with the given ID
+        :rtype: bbUser
+        :raise KeyError: If no user is found with the requested ID
+        """
+        id = self.validateID(id)
+        self.markInUse(id)
+        if id in self.users:
+            self.users.move_to_end(id)
+            return self.users[id]
+        if not self.userIDExists(id):
+            raise KeyError("user not found: " + str(id))
+        userDict = self.store.loadUserDict(id)
+        if userDict is None:
+            raise KeyError("user is indexed but missing from the store: " + str(id))
+        loadedUser = bbUser.fromDict(id, userDict)
+        self.users[id] = loadedUser
+        return loadedUser
+
+
+    def getUsers(self) -> List[bbUser.bbUser]:
+        """Get a list of all bbUser objects stored in the database.
+        ⚠ This loads every user into memory. To read users' stats, use getUserStat instead.
+
+        :return: list containing all bbUser objects in the db
+        :rtype: list[bbUser]
+        """
+        return [self.getUser(id) for id in self.getIds()]
+
+
+    def getIds(self) -> List[int]:
+        """Get a list of all user IDs stored in the database, whether or not they are currently loaded
+
+        :return: list containing all int discord IDs for which bbUsers are stored in the database
+        :rtype: list[int]
+        """
+        return list(self.userStats.keys())
+
+
+    def getLoadedIds(self) -> List[int]:
+        """Get a list of the IDs of all users currently held in memory.
+        Users that are not loaded have not changed since they were last written to the store.
+
+        :return: list containing the IDs of all bbUsers held in users
+        :rtype: list[int]
+        """
+        return list(self.users.keys())
+
+
+    def getUserStat(self, id : int, stat : str) -> Union[int, float]:
+        """Get a stat of the user with the given ID, without loading the user if it is not already loaded.
+
+        :param int id: integer discord ID for the user whose stat to get
+        :param str stat: One of bbUserDB.indexedStatNames, or any stat accepted by bbUser.getStatByName if the user is loaded
+        :return: The requested stat
+        :rtype: int or float
+        :raise KeyError: If no user is found with the requested ID
+        """
+        id = self.validateID(id)
+        if id in self.users:
+            return self.users[id].getStatByName(stat)
+        if stat not in bbUserDB.indexedStatNames:
+            return self.getUser(id).getStatByName(stat)
+        return self.userStats[id][bbUserDB.indexedStatNames.index(stat)]
+
+
+    def evictColdUsers(self) -> int:
+        """Remove the least recently used users from memory until at most cacheSize users are loaded, updating their indexed stats.
+        Only users which have not changed since the last save can be evicted, so this should be called after a save has been written successfully.
+        Users in inUseIDs are not evicted, as a running command may still change them.
+
+        :return: The number of users evicted
+        :rtype: int
+        """
+        if len(self.users) <= self.cacheSize:
+            return 0
+        # Users issuing duel challenges are never evicted, so all challenge targets can be found among loaded users
+        pinnedIDs = set()
+        for user in self.users.values():
+            if user.duelRequests or user.pollOwned:
+                pinnedIDs.add(user.id)
+                pinnedIDs.update(target.id for target in user.duelRequests)
+
+        numEvicted = 0
+        for id in list(self.users.keys()):
+            if len(self.users) <= self.cacheSize:
+                break
+            user = self.users[id]
+            if id in pinnedIDs or id in self.inUseIDs or user.isDirty():
+                continue
+            self.userStats[id] = bbUserDB.getIndexedStats(user)
+            del self.users[id]
+            numEvicted += 1
+        return numEvicted
+
+
+    def toDict(self) -> dict:
+        """Serialise this bbUserDB into dictionary format. ⚠ This loads every user into memory.
+
+        :return: A dictionary containing all data needed to recreate this bbUserDB
+        :rtype: dict
+        """
+        self.getUsers()
+        return super().toDict()
+
+
+    def __str__(self) -> str:
+        """Get summarising information about this bbLazyUserDB in string format.
+
+        :return: A string containing summarising info about this db
+        :rtype: str
+        """
+        return "<bbLazyUserDB: " + str(len(self.userStats)) + " users, " + str(len(self.users)) + " loaded>"
+
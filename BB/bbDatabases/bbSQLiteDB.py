@@ -0,0 +1,235 @@
+from __future__ import annotations
+from typing import List
+
+import sqlite3
+import json
+import threading
+import asyncio
+from os import path
+from . import bbUserDB, bbGuildDB, bbBountyDB, bbLazyUserDB, bbUserDBBinary
+from ..bbObjects import bbUser
+from .. import bbUtil
+
+
+# Statements creating the tables used by bbSQLiteStore, if they do not already exist
+createTableStatements = ["CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, data TEXT NOT NULL, stats TEXT)",
+                            "CREATE TABLE IF NOT EXISTS guilds (id INTEGER PRIMARY KEY, data TEXT NOT NULL)",
+                            "CREATE TABLE IF NOT EXISTS bounties (faction TEXT NOT NULL, data TEXT NOT NULL)",
+                            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"]
+
+
+def connect(filePath : str) -> sqlite3.Connection:
+    """Open a connection to the SQLite database at the given path, creating BountyBot's tables if needed.
+    The database is put into write-ahead logging mode, so that reads are not blocked by a save in progress.
+
+    :param str filePath: Path to the SQLite database file. The file is created if it does not exist.
+    :return: A new connection to the database, which may be used from any thread.
+    :rtype: sqlite3.Connection
+    """
+    connection = sqlite3.connect(filePath, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    # In WAL mode, NORMAL still guarantees a consistent database after a crash, only risking the last transaction on power loss
+    connection.execute("PRAGMA synchronous=NORMAL")
+    with connection:
+        for statement in createTableStatements:
+            connection.execute(statement)
+        # Databases created before users' stats were indexed do not have the stats column
+        if "stats" not in [column[1] for column in connection.execute("PRAGMA table_info(users)")]:
+            connection.execute("ALTER TABLE users ADD COLUMN stats TEXT")
+    return connection
+
+
+class bbSQLiteStore:
+    """A SQLite-backed store for the users, guilds and bounties databases, to be used in place of their JSON save files.
+    The databases are still held in memory as bbUserDB, bbGuildDB and bbBountyDB objects, so all of their methods behave as normal.
+    Saves only rewrite the users that have changed since the previous save, and all writes of a save are made in a single transaction.
+
+    :var filePath: Path to the SQLite database file
+    :vartype filePath: str
+    :var readConnection: Connection used for reading from the database on the event loop
+    :vartype readConnection: sqlite3.Connection
+    :var writeConnection: Connection used for writing saves, from worker threads
+    :vartype writeConnection: sqlite3.Connection
+    :var writeLock: Lock ensuring only one worker thread writes through writeConnection at a time
+    :vartype writeLock: threading.Lock
+    """
+
+    def __init__(self, filePath : str):
+        """
+        :param str filePath: Path to the SQLite database file. The file is created if it does not exist.
+        """
+        self.filePath = filePath
+        self.readConnection = connect(filePath)
+        self.writeConnection = connect(filePath)
+        self.writeLock = threading.Lock()
+
+
+    def getMeta(self, key : str, default=None):
+        """Read a JSON value stored in the meta table.
+
+        :param str key: The name of the value to read
+        :param default: The value to return if nothing is stored under key (Default None)
+        :return: The stored value, or default if none is stored
+        """
+        row = self.readConnection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return default if row is None else json.loads(row[0])
+
+
+    def loadUsersDB(self) -> bbUserDB.bbUserDB:
+        """Build a bbUserDB from the users stored in the database.
+
+        :return: A bbUserDB containing all stored users
+        :rtype: bbUserDB
+        """
+        usersDict = {}
+        for id, data in self.readConnection.execute("SELECT id, data FROM users"):
+            usersDict[str(id)] = json.loads(data)
+        return bbUserDB.fromDict({"saveGeneration": self.getMeta("usersSaveGeneration", default=0), "users": usersDict})
+
+
+    def loadLazyUsersDB(self, cacheSize : int) -> bbLazyUserDB.bbLazyUserDB:
+        """Build a bbLazyUserDB indexing the users stored in the database, without loading any users into memory.
+        Users stored without indexed stats, for example because they were saved before stats were indexed, are loaded
+        to calculate their stats, and marked as changed so that their stats are stored by the next save.
+
+        :param int cacheSize: The number of users the bbLazyUserDB should keep in memory after evicting cold users
+        :return: A bbLazyUserDB indexing all stored users
+        :rtype: bbLazyUserDB
+        """
+        newDB = bbLazyUserDB.bbLazyUserDB(self, cacheSize)
+        newDB.saveGeneration = self.getMeta("usersSaveGeneration", default=0)
+        unindexedIDs = []
+        for id, stats in self.readConnection.execute("SELECT id, stats FROM users"):
+            if stats is None:
+                unindexedIDs.append(id)
+                newDB.userStats[id] = None
+            else:
+                newDB.userStats[id] = tuple(json.loads(stats))
+        for id in unindexedIDs:
+            newUser = newDB.getUser(id)
+            newUser.markDirty()
+            newDB.userStats[id] = bbUserDB.getIndexedStats(newUser)
+        return newDB
+
+
+    def loadUserDict(self, id : int) -> dict:
+        """Read the serialized user with the given ID from the database.
+
+        :param int id: The ID of the user to read
+        :return: The user serialized with bbUser.toDictNoId, or None if no user is stored with the given ID
+        :rtype: dict
+        """
+        row = self.readConnection.execute("SELECT data FROM users WHERE id = ?", (id,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+
+    def loadGuildsDB(self) -> bbGuildDB.bbGuildDB:
+        """Build a bbGuildDB from the guilds stored in the database.
+
+        :return: A bbGuildDB containing all stored guilds
+        :rtype: bbGuildDB
+        """
+        guildsDict = {}
+        for id, data in self.readConnection.execute("SELECT id, data FROM guilds"):
+            guildsDict[str(id)] = json.loads(data)
+        return bbGuildDB.fromDict(guildsDict)
+
+
+    def loadBountiesDB(self, maxBountiesPerFaction : int, dbReload=False) -> bbBountyDB.bbBountyDB:
+        """Build a bbBountyDB from the bounties stored in the database.
+
+        :param int maxBountiesPerFaction: The maximum number of bounties each faction may store
+        :param bool dbReload: Whether or not the bbBountyDB is being created during the initial database loading phase of bountybot (Default False)
+        :return: A bbBountyDB containing all stored bounties
+        :rtype: bbBountyDB
+        """
+        bountiesDict = {faction: [] for faction in self.getMeta("bountyFactions", default=[])}
+        for faction, data in self.readConnection.execute("SELECT faction, data FROM bounties ORDER BY rowid"):
+            if faction not in bountiesDict:
+                bountiesDict[faction] = []
+            bountiesDict[faction].append(json.loads(data))
+        return bbBountyDB.fromDict(bountiesDict, maxBountiesPerFaction, dbReload=dbReload)
+
+
+    def writeSave(self, userRecords : List[dict], usersSaveGeneration : int, guildsDict : dict, bountiesDict : dict):
+        """Write a save of the users, guilds and bounties databases in a single transaction.
+        This method blocks, and should be called from a worker thread - see writeSaveAsync.
+
+        :param list[dict] userRecords: Records of changed and removed users, as given by bbUserDB.toJournalRecords. Records including stats also update the users' indexed stats.
+        :param int usersSaveGeneration: The saveGeneration of the users database save
+        :param dict guildsDict: A bbGuildDB serialized with toDict
+        :param dict bountiesDict: A bbBountyDB serialized with toDict
+        """
+        changedUsers = [(record["id"], json.dumps(record["user"]), json.dumps(record["stats"]) if "stats" in record else None) for record in userRecords if record["user"] is not None]
+        removedUsers = [(record["id"],) for record in userRecords if record["user"] is None]
+        guildRows = [(int(id), json.dumps(guildsDict[id])) for id in guildsDict]
+        bountyRows = [(faction, json.dumps(bountyDict)) for faction in bountiesDict for bountyDict in bountiesDict[faction]]
+        metaRows = [("usersSaveGeneration", json.dumps(usersSaveGeneration)), ("bountyFactions", json.dumps(list(bountiesDict.keys())))]
+
+        with self.writeLock, self.writeConnection:
+            self.writeConnection.executemany("INSERT OR REPLACE INTO users (id, data, stats) VALUES (?, ?, ?)", changedUsers)
+            self.writeConnection.executemany("DELETE FROM users WHERE id = ?", removedUsers)
+            self.writeConnection.execute("DELETE FROM guilds")
+            self.writeConnection.executemany("INSERT INTO guilds (id, data) VALUES (?, ?)", guildRows)
+            self.writeConnection.execute("DELETE FROM bounties")
+            self.writeConnection.executemany("INSERT INTO bounties (faction, data) VALUES (?, ?)", bountyRows)
+            self.writeConnection.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", metaRows)
+
+
+    async def writeSaveAsync(self, userRecords : List[dict], usersSaveGeneration : int, guildsDict : dict, bountiesDict : dict):
+        """Write a save of the users, guilds and bounties databases in a single transaction, in the event loop's default worker thread pool.
+        None of the given save data may be mutated until this coroutine has completed.
+
+        :param list[dict] userRecords: Records of changed and removed users, as given by bbUserDB.toJournalRecords
+        :param int usersSaveGeneration: The saveGeneration of the users database save
+        :param dict guildsDict: A bbGuildDB serialized with toDict
+        :param dict bountiesDict: A bbBountyDB serialized with toDict
+        """
+        await asyncio.get_event_loop().run_in_executor(None, self.writeSave, userRecords, usersSaveGeneration, guildsDict, bountiesDict)
+
+
+    def close(self):
+        """Close both of the store's database connections.
+        """
+        self.readConnection.close()
+        with self.writeLock:
+            self.writeConnection.close()
+
+
+def migrateFromJSON(sqlitePath : str, userDBPath : str, guildDBPath : str, bountyDBPath : str, userDBJournalPath=""):
+    """Copy the contents of BountyBot's JSON save files into the SQLite database at the given path, overwriting any users, guilds and bounties already stored there.
+    Users are copied as they are saved, but each user is built once, one at a time, to store their indexed stats alongside them.
+    This means that a bbLazyUserDB does not need to load every user the first time it is built from the migrated database.
+    Users that cannot be built are stored without stats, to be indexed when the database is first loaded. This does not need the bot to be running.
+
+    :param str sqlitePath: Path to the SQLite database to migrate into. The file is created if it does not exist.
+    :param str userDBPath: Path to the users database save, in the JSON, newline-delimited JSON or binary format
+    :param str guildDBPath: Path to the guilds database JSON file
+    :param str bountyDBPath: Path to the bounties database JSON file
+    :param str userDBJournalPath: Path to the users journal to merge on top of the users database. Give "" to skip the journal. (Default "")
+    """
+    if bbUserDBBinary.isBinarySave(userDBPath):
+        userDBDict = bbUserDB.ndjsonRecordsToDict(bbUserDBBinary.iterBinarySave(userDBPath))
+    elif bbUserDB.isNDJSONSave(userDBPath):
+        userDBDict = bbUserDB.ndjsonRecordsToDict(bbUtil.iterJSONLines(userDBPath))
+    else:
+        userDBDict = bbUtil.readJSON(userDBPath)
+    if userDBJournalPath != "" and path.exists(userDBJournalPath):
+        userDBDict = bbUserDB.applyJournal(userDBDict, bbUtil.readJSONLines(userDBJournalPath))
+    userDBDict = bbUserDB.normaliseDict(userDBDict)
+    userRecords = []
+    numUnindexed = 0
+    for id in userDBDict["users"]:
+        record = {"saveGeneration": userDBDict["saveGeneration"], "id": int(id), "user": userDBDict["users"][id]}
+        try:
+            record["stats"] = list(bbUserDB.getIndexedStats(bbUser.fromDict(int(id), userDBDict["users"][id])))
+        except Exception:
+            numUnindexed += 1
+        userRecords.append(record)
+
+    store = bbSQLiteStore(sqlitePath)
+    with store.writeLock, store.writeConnection:
+        store.writeConnection.execute("DELETE FROM users")
+    store.writeSave(userRecords, userDBDict["saveGeneration"], bbUtil.readJSON(guildDBPath), bbUtil.readJSON(bountyDBPath))
+    print("Migrated " + str(len(userRecords)) + " users into " + sqlitePath + (", " + str(numUnindexed) + " of which could not be indexed" if numUnindexed > 0 else ""))
+    store.close()
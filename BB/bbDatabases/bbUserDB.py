@@ -1,19 +1,39 @@
 from ..bbObjects import bbUser
 from .. import bbUtil
 from ..logging import bbLogger
+from . import bbEconomyJournal
 import traceback
-from typing import List
+from typing import List, Tuple, Union, Iterable
+
+
+# The format name recorded in the header of users databases saved in the newline-delimited JSON format
+ndjsonSaveFormat = "bbUserDB-ndjson"
+# Every users database saved in the newline-delimited JSON format begins with this text, as the start of its header line
+ndjsonSavePrefix = '{"format": "' + ndjsonSaveFormat + '"'
+
+# The bbUser stats that are stored alongside each user by bbSQLiteStore, and kept in memory for every user by bbLazyUserDB
+indexedStatNames = ["credits", "systemsChecked", "bountyWins", "value"]
+
 
 class bbUserDB:
     """A database of bbUser objects.
     
     :var users: Dictionary of users in the database, where values are the bbUser objects and keys are the ids of their respective bbUser
     :vartype users: dict[int, bbUser]
+    :var saveGeneration: The number of times this database has been saved. Used to order journal records against full snapshots.
+    :vartype saveGeneration: int
+    :var removedUserIDs: The IDs of users removed from the database since the last save
+    :vartype removedUserIDs: set[int]
+    :var fullSaveRequired: Whether or not the next save must be a full snapshot, for example because the last save failed
+    :vartype fullSaveRequired: bool
     """
 
     def __init__(self):
         # Store users as a dict of user.id: user
         self.users = {}
+        self.saveGeneration = 0
+        self.removedUserIDs = set()
+        self.fullSaveRequired = False
 
 
     def userIDExists(self, id : int) -> bool:
@@ -86,7 +106,9 @@ class bbUserDB:
             raise KeyError("Attempted to add a user that is already in this bbUserDB")
         # Create and return a new user
         newUser = bbUser.fromDict(id, bbUser.defaultUserDict)
+        newUser.markDirty()
         self.users[id] = newUser
+        self.removedUserIDs.discard(id)
         return newUser
 
     def addUserObj(self, userObj : bbUser.bbUser):
@@ -100,6 +122,7 @@ class bbUserDB:
             raise KeyError("Attempted to add a user that is already in this bbUserDB: " + str(userObj))
         # Store the passed bbUser
         self.users[userObj.id] = userObj
+        self.removedUserIDs.discard(userObj.id)
 
 
     def getOrAddID(self, id : int) -> bbUser.bbUser:
@@ -123,6 +146,22 @@ class bbUserDB:
         if not self.userIDExists(id):
             raise KeyError("user not found: " + str(id))
         del self.users[id]
+        self.removedUserIDs.add(id)
+
+    
+    def startCommand(self):
+        """Record that a command has started running, which may hold bbUser objects from this database across awaits.
+        Every call must be matched by a call to finishCommand once the command has finished.
+        All users are always held in memory by bbUserDB, so this does nothing. See bbLazyUserDB.startCommand.
+        """
+        pass
+
+
+    def finishCommand(self):
+        """Record that a command started with startCommand has finished.
+        All users are always held in memory by bbUserDB, so this does nothing. See bbLazyUserDB.finishCommand.
+        """
+        pass
 
     
     def getUser(self, id : int) -> bbUser.bbUser:
@@ -153,7 +192,100 @@ class bbUserDB:
         """
         return list(self.users.keys())
 
+
+    def getLoadedIds(self) -> List[int]:
+        """Get a list of the IDs of all users currently held in memory. In a bbUserDB, this is every user in the database.
+
+        :return: list containing all int discord IDs for which bbUsers are held in memory
+        :rtype: list[int]
+        """
+        return self.getIds()
+
+
+    def getUserStat(self, id : int, stat : str) -> Union[int, float]:
+        """Get a stat of the user with the given ID. This method is primarily used in leaderboard generation.
+
+        :param int id: integer discord ID for the user whose stat to get
+        :param str stat: Any stat accepted by bbUser.getStatByName
+        :return: The requested stat
+        :rtype: int or float
+        """
+        return self.getUser(id).getStatByName(stat)
+
     
+    def applyEconomyJournal(self, entries : List[dict]) -> int:
+        """Apply the given bbEconomyJournal entries on top of this database, which should have just been loaded from file.
+        Entries are applied in order, and entries already included in the database's last save are skipped.
+        All users changed by the journal are marked as dirty, so that they are included in the next save.
+
+        :param list[dict] entries: The journal entries to apply, in the order they were written
+        :return: The number of entries applied
+        :rtype: int
+        """
+        numApplied = 0
+        for entry in entries:
+            if entry["saveGeneration"] < self.saveGeneration:
+                continue
+            try:
+                if "user" in entry:
+                    replayedUser = bbUser.fromDict(entry["id"], entry["user"])
+                    replayedUser.markDirty()
+                    if self.userIDExists(replayedUser.id):
+                        self.removeUser(replayedUser.id)
+                    self.addUserObj(replayedUser)
+                else:
+                    user = self.getOrAddID(entry["id"])
+                    for attrName in bbEconomyJournal.economyAttributeNames:
+                        setattr(user, attrName, entry[attrName])
+                numApplied += 1
+            except Exception as e:
+                bbLogger.log("UserDB", "applyEcoJrnl", "Failed to apply economy journal entry for user " + str(entry["id"]) + ": " + e.__class__.__name__, category="usersDB", trace=traceback.format_exc(), eventType="ECO_JRNL_ERR")
+        return numApplied
+
+
+    def startSave(self) -> Tuple[List[int], List[int]]:
+        """Begin a new save of the database, incrementing saveGeneration.
+        The IDs of all users that have changed or been removed since the previous save are collected,
+        and all users are marked as unchanged.
+
+        :return: A tuple whose first element is a list of the IDs of all users that have changed since the previous save, and whose second element is a list of the IDs of all users removed since the previous save
+        :rtype: tuple[list[int], list[int]]
+        """
+        self.saveGeneration += 1
+        dirtyIDs = []
+        for id in self.users:
+            if self.users[id].isDirty():
+                dirtyIDs.append(id)
+                self.users[id].clearDirty()
+        removedIDs = list(self.removedUserIDs)
+        self.removedUserIDs.clear()
+        return dirtyIDs, removedIDs
+
+
+    def toJournalRecords(self, dirtyIDs : List[int], removedIDs : List[int], includeStats=False) -> List[dict]:
+        """Serialise the given changed and removed users into journal records, to be appended to the users journal.
+        Each record contains the current saveGeneration, the user ID, and the serialised user - or None if the user was removed.
+
+        :param list[int] dirtyIDs: The IDs of users to serialise, as given by startSave
+        :param list[int] removedIDs: The IDs of removed users, as given by startSave
+        :param bool includeStats: Whether or not to also record each changed user's indexedStatNames, as a list under "stats" (Default False)
+        :return: A list of journal records describing the changes to the database since the previous save
+        :rtype: list[dict]
+        """
+        records = []
+        for id in dirtyIDs:
+            try:
+                record = {"saveGeneration": self.saveGeneration, "id": id, "user": self.users[id].toDictNoId()}
+                if includeStats:
+                    record["stats"] = list(getIndexedStats(self.users[id]))
+                records.append(record)
+            except Exception as e:
+                bbLogger.log("UserDB", "toJrnlRcrds", "Error serialising bbUser: " + e.__class__.__name__, trace=traceback.format_exc(), eventType="USERERR")
+        for id in removedIDs:
+            records.append({"saveGeneration": self.saveGeneration, "id": id, "user": None})
+        return records
+
+
     def toDict(self) -> dict:
         """Serialise this bbUserDB into dictionary format.
 
@@ -169,7 +301,19 @@ class bbUserDB:
                 data[str(id)] = self.users[id].toDictNoId()
             except Exception as e:
                 bbLogger.log("UserDB", "toDict", "Error serialising bbUser: " + e.__class__.__name__, trace=traceback.format_exc(), eventType="USERERR")
-        return data
+        return {"saveGeneration": self.saveGeneration, "users": data}
+
+
+    def toNDJSONRecords(self) -> List[dict]:
+        """Serialise this bbUserDB into the newline-delimited JSON save format, as a list of records to be written one per line.
+        The first record is a header recording the database's saveGeneration, and each following record contains one user's ID and serialised user.
+        Unlike the dictionary format, this can be read back one user at a time with fromNDJSONRecords.
+
+        :return: A list of records containing all data needed to recreate this bbUserDB
+        :rtype: list[dict]
+        """
+        usersDict = self.toDict()["users"]
+        return [{"format": ndjsonSaveFormat, "saveGeneration": self.saveGeneration}] + [{"id": int(id), "user": usersDict[id]} for id in usersDict]
 
     
     def __str__(self) -> str:
@@ -182,6 +326,78 @@ class bbUserDB:
         return "<bbUserDB: " + str(len(self.users)) + " users>"
 
 
+def getIndexedStats(user : bbUser.bbUser) -> tuple:
+    """Collect the stats of the given user that are named in indexedStatNames.
+
+    :param bbUser user: The user whose stats to collect
+    :return: The user's stats, ordered by indexedStatNames
+    :rtype: tuple
+    """
+    return tuple(user.getStatByName(stat) for stat in indexedStatNames)
+
+
+def applyJournal(userDBDict : dict, journalRecords : List[dict]) -> dict:
+    """Merge the given users journal records on top of a dictionary-serialised bbUserDB, as written by bbUserDB.toDict.
+    Records are applied in order, and records from save generations already included in userDBDict are ignored.
+
+    :param dict userDBDict: a dictionary-serialised representation of a bbUserDB
+    :param list[dict] journalRecords: journal records as created by bbUserDB.toJournalRecords, in the order they were written
+    :return: userDBDict, updated with all of the changes described in journalRecords
+    :rtype: dict
+    """
+    userDBDict = normaliseDict(userDBDict)
+    snapshotGeneration = userDBDict["saveGeneration"]
+    for record in journalRecords:
+        if record["saveGeneration"] <= snapshotGeneration:
+            continue
+        if record["user"] is None:
+            userDBDict["users"].pop(str(record["id"]), None)
+        else:
+            userDBDict["users"][str(record["id"])] = record["user"]
+        userDBDict["saveGeneration"] = max(userDBDict["saveGeneration"], record["saveGeneration"])
+    return userDBDict
+
+
+def isNDJSONSave(filePath : str) -> bool:
+    """Decide whether the users database save at the given path is in the newline-delimited JSON format written by toNDJSONRecords,
+    rather than the dictionary format. Only the start of the file is read.
+
+    :param str filePath: Path to the users database save to check
+    :return: True if the file is a newline-delimited JSON users database save, False otherwise
+    :rtype: bool
+    """
+    with open(filePath, "rb") as f:
+        return f.read(len(ndjsonSavePrefix)) == ndjsonSavePrefix.encode("utf-8")
+
+
+def ndjsonRecordsToDict(records : Iterable[dict]) -> dict:
+    """Convert a bbUserDB serialised into newline-delimited JSON records by toNDJSONRecords, into the dictionary format written by toDict.
+
+    :param Iterable[dict] records: The records of a newline-delimited JSON users database save, in file order
+    :return: A dictionary-serialised representation of the same bbUserDB
+    :rtype: dict
+    """
+    records = iter(records)
+    userDBDict = {"saveGeneration": next(records)["saveGeneration"], "users": {}}
+    for record in records:
+        userDBDict["users"][str(record["id"])] = record["user"]
+    return userDBDict
+
+
+def normaliseDict(userDBDict : dict) -> dict:
+    """Convert a dictionary-serialised bbUserDB in the old format, a dictionary directly mapping user IDs to users,
+    into the current format, which also records the database's saveGeneration.
+    userDBDicts already in the current format are returned unchanged.
+
+    :param dict userDBDict: a dictionary-serialised representation of a bbUserDB, in either format
+    :return: userDBDict in the current format
+    :rtype: dict
+    """
+    if "users" in userDBDict and "saveGeneration" in userDBDict:
+        return userDBDict
+    return {"saveGeneration": 0, "users": userDBDict}
+
+
 def fromDict(userDBDict : dict) -> bbUserDB:
     """Construct a bbUserDB from a dictionary-serialised representation - the reverse of bbUserDB.toDict()
 
@@ -189,11 +405,57 @@ def fromDict(userDBDict : dict) -> bbUserDB:
     :return: the new bbUserDB
     :rtype: bbUserDB
     """
+    userDBDict = normaliseDict(userDBDict)
     # Instance the new bbUserDB
     newDB = bbUserDB()
+    newDB.saveGeneration = userDBDict["saveGeneration"]
+    usersDict = userDBDict["users"]
     # iterate over all user IDs to spawn
-    for id in userDBDict.keys():
+    for id in usersDict.keys():
         # Construct new bbUsers for each ID in the database
         # JSON stores properties as strings, so ids must be converted to int first.
-        newDB.addUserObj(bbUser.fromDict(int(id), userDBDict[id]))
+        newDB.addUserObj(bbUser.fromDict(int(id), usersDict[id]))
+    return newDB
+
+
+def fromNDJSONRecords(records : Iterable[dict], journalRecords=[]) -> bbUserDB:
+    """Construct a bbUserDB from its newline-delimited JSON records, as written by bbUserDB.toNDJSONRecords.
+    Users are constructed one at a time as records are read, so records may be a stream read lazily from file
+    and only one serialised user needs to be held in memory at a time.
+    Users journal records may also be given, which are merged on top of the save as they would be by applyJournal.
+
+    :param Iterable[dict] records: The records of a newline-delimited JSON users database save, in file order
+    :param list[dict] journalRecords: journal records as created by bbUserDB.toJournalRecords, in the order they were written (Default [])
+    :return: the new bbUserDB
+    :rtype: bbUserDB
+    """
+    records = iter(records)
+    newDB = bbUserDB()
+    newDB.saveGeneration = next(records)["saveGeneration"]
+
+    # Find the latest journal record for each user that changed after the save was written
+    journalledUsers = {}
+    journalGeneration = newDB.saveGeneration
+    for record in journalRecords:
+        if record["saveGeneration"] > newDB.saveGeneration:
+            journalledUsers[record["id"]] = record["user"]
+            journalGeneration = max(journalGeneration, record["saveGeneration"])
+
+    for record in records:
+        id = record["id"]
+        if id in journalledUsers:
+            userDict = journalledUsers.pop(id)
+            # The user was removed after the save was written
+            if userDict is None:
+                continue
+        else:
+            userDict = record["user"]
+        newDB.addUserObj(bbUser.fromDict(id, userDict))
+
+    # Users added after the save was written
+    for id in journalledUsers:
+        if journalledUsers[id] is not None:
+            newDB.addUserObj(bbUser.fromDict(id, journalledUsers[id]))
+
+    newDB.saveGeneration = journalGeneration
     return newDB
@@ -0,0 +1,398 @@
+from typing import List, Dict, Iterable, Iterator, BinaryIO
+
+import struct
+import json
+import os
+import tempfile
+import asyncio
+from ..bbConfig import bbData
+from .. import bbUtil
+from . import bbUserDB
+
+
+# Every users database saved in the binary format begins with these bytes
+binarySaveMagic = b"BBUD"
+# The version of the binary format written by writeBinarySave. Increment this whenever the layout of the format changes,
+# and keep reading older versions in iterBinarySave.
+binarySaveVersion = 1
+
+# The types of builtIn item, in the order that their name tables are stored in a binary save.
+# builtIn items are stored as their index in their type's name table.
+builtInItemTables = ["ships", "weapons", "modules", "turrets", "shipUpgrades"]
+
+# File header: magic, format version, users database saveGeneration
+headerStruct = struct.Struct("<4sHQ")
+# Unsigned 16-bit integer, used for name table lengths, string lengths, item IDs and list lengths
+uint16Struct = struct.Struct("<H")
+# Unsigned 32-bit integer, used for record lengths, JSON blob lengths and item counts
+uint32Struct = struct.Struct("<I")
+# The fixed fields of a user record: user ID, record kind, credits, lifetimeCredits, bountyCooldownEnd, systemsChecked, bountyWins, lastSeenGuildId,
+# duelWins, duelLosses, duelCreditsWins, duelCreditsLosses, bountyWinsToday, dailyBountyWinsReset, pollOwned
+userStruct = struct.Struct("<QBqqdqqqqqqqqd?")
+# The serialised user keys stored in userStruct, in order, and whether each is stored as a float rather than an int
+userStructKeys = [("credits", False), ("lifetimeCredits", False), ("bountyCooldownEnd", True), ("systemsChecked", False), ("bountyWins", False),
+                    ("lastSeenGuildId", False), ("duelWins", False), ("duelLosses", False), ("duelCreditsWins", False), ("duelCreditsLosses", False),
+                    ("bountyWinsToday", False), ("dailyBountyWinsReset", True)]
+# The serialised user inventories stored in a user record, in order
+userInventoryKeys = ["inactiveShips", "inactiveWeapons", "inactiveModules", "inactiveTurrets"]
+# The builtIn item type of each item list in a serialised ship
+shipItemKeys = [("weapons", "weapons"), ("modules", "modules"), ("turrets", "turrets"), ("shipUpgrades", "shipUpgrades")]
+# The builtIn item type of each user inventory
+inventoryItemTables = {"inactiveShips": "ships", "inactiveWeapons": "weapons", "inactiveModules": "modules", "inactiveTurrets": "turrets"}
+
+# Every serialised user key stored in a compact user record. Any other keys are stored in the record's trailing JSON blob.
+userBinaryKeys = {key for key, isFloat in userStructKeys}.union(userInventoryKeys, ("pollOwned", "activeShip"))
+
+# Record and item kinds. Anything which cannot be stored compactly is stored as a JSON blob instead.
+KIND_COMPACT = 0
+KIND_JSON = 1
+
+
+def builtInItemNames() -> Dict[str, List[str]]:
+    """Get the names of all builtIn items of each type, which are stored in a binary save's name tables.
+
+    :return: A dictionary mapping each of builtInItemTables to a sorted list of the names of all builtIn items of that type
+    :rtype: dict[str, list[str]]
+    """
+    return {"ships": sorted(bbData.builtInShipData.keys()), "weapons": sorted(bbData.builtInWeaponData.keys()),
+            "modules": sorted(bbData.builtInModuleData.keys()), "turrets": sorted(bbData.builtInTurretData.keys()),
+            "shipUpgrades": sorted(bbData.builtInUpgradeData.keys())}
+
+
+def isBinarySave(filePath : str) -> bool:
+    """Decide whether the users database save at the given path is in the binary format written by writeBinarySave.
+    Only the start of the file is read.
+
+    :param str filePath: Path to the users database save to check
+    :return: True if the file is a binary users database save, False otherwise
+    :rtype: bool
+    """
+    with open(filePath, "rb") as f:
+        return f.read(len(binarySaveMagic)) == binarySaveMagic
+
+
+def packString(s : str) -> bytes:
+    """Encode a string of up to 65535 bytes, prefixed by its length.
+
+    :param str s: The string to encode
+    :return: The encoded string
+    :rtype: bytes
+    """
+    encoded = s.encode("utf-8")
+    return uint16Struct.pack(len(encoded)) + encoded
+
+
+def packJSON(obj) -> bytes:
+    """Encode a JSON-serializable object as a JSON blob, prefixed by its length.
+
+    :param obj: The object to encode
+    :return: The encoded object
+    :rtype: bytes
+    """
+    encoded = json.dumps(obj).encode("utf-8")
+    return uint32Struct.pack(len(encoded)) + encoded
+
+
+def packItem(itemDict : dict, itemIDs : Dict[str, int]) -> bytes:
+    """Encode a serialised item. builtIn items are stored as an ID from their type's name table, and all other items as a JSON blob.
+
+    :param dict itemDict: The item serialised with its toDict method
+    :param dict[str, int] itemIDs: The ID of every builtIn item of itemDict's type, by name
+    :return: The encoded item
+    :rtype: bytes
+    """
+    if itemDict.get("builtIn", False) and len(itemDict) == 2 and itemDict.get("name") in itemIDs:
+        return bytes((KIND_COMPACT,)) + uint16Struct.pack(itemIDs[itemDict["name"]])
+    return bytes((KIND_JSON,)) + packJSON(itemDict)
+
+
+def packShip(shipDict : dict, allItemIDs : Dict[str, Dict[str, int]]) -> bytes:
+    """Encode a serialised ship. builtIn ships are stored as an ID, a nickname, and their equipped items, and all other ships as a JSON blob.
+
+    :param dict shipDict: The ship serialised with bbShip.toDict
+    :param dict[str, dict[str, int]] allItemIDs: The ID of every builtIn item, by type and then name
+    :return: The encoded ship
+    :rtype: bytes
+    """
+    if not shipDict.get("builtIn", False) or shipDict.get("name") not in allItemIDs["ships"] or "nickname" not in shipDict \
+            or any(key not in ("name", "builtIn", "nickname", "weapons", "modules", "turrets", "shipUpgrades") for key in shipDict):
+        return bytes((KIND_JSON,)) + packJSON(shipDict)
+    parts = [bytes((KIND_COMPACT,)), uint16Struct.pack(allItemIDs["ships"][shipDict["name"]]), packString(shipDict["nickname"])]
+    for listKey, tableName in shipItemKeys:
+        items = shipDict.get(listKey, [])
+        parts.append(uint16Struct.pack(len(items)))
+        parts += [packItem(itemDict, allItemIDs[tableName]) for itemDict in items]
+    return b"".join(parts)
+
+
+def packUser(id : int, userDict : dict, allItemIDs : Dict[str, Dict[str, int]]) -> bytes:
+    """Encode a serialised user as a binary save record, without its length prefix.
+    Users whose fixed fields are missing or of an unexpected type are stored as a JSON blob.
+    Any keys not part of the binary format are stored in a trailing JSON blob, so that no information is lost.
+
+    :param int id: The ID of the user
+    :param dict userDict: The user serialised with bbUser.toDictNoId
+    :param dict[str, dict[str, int]] allItemIDs: The ID of every builtIn item, by type and then name
+    :return: The encoded user record
+    :rtype: bytes
+    """
+    fixedValues = []
+    for key, isFloat in userStructKeys:
+        value = userDict.get(key)
+        if type(value) == int and (isFloat or -2**63 <= value < 2**63):
+            fixedValues.append(value)
+        elif isFloat and type(value) == float:
+            fixedValues.append(value)
+        else:
+            return userStruct.pack(id, KIND_JSON, *([0] * len(userStructKeys)), False) + packJSON(userDict)
+    if type(userDict.get("pollOwned", False)) != bool or "activeShip" not in userDict:
+        return userStruct.pack(id, KIND_JSON, *([0] * len(userStructKeys)), False) + packJSON(userDict)
+
+    parts = [userStruct.pack(id, KIND_COMPACT, *fixedValues, userDict.get("pollOwned", False)), packShip(userDict["activeShip"], allItemIDs)]
+    for inventoryKey in userInventoryKeys:
+        listings = userDict.get(inventoryKey, [])
+        parts.append(uint32Struct.pack(len(listings)))
+        for listing in listings:
+            parts.append(uint32Struct.pack(listing["count"]))
+            if inventoryKey == "inactiveShips":
+                parts.append(packShip(listing["item"], allItemIDs))
+            else:
+                parts.append(packItem(listing["item"], allItemIDs[inventoryItemTables[inventoryKey]]))
+
+    extras = {key: userDict[key] for key in userDict if key not in userBinaryKeys}
+    parts.append(packJSON(extras) if extras else uint32Struct.pack(0))
+    return b"".join(parts)
+
+
+def writeBinarySave(filePath : str, records : Iterable[dict]):
+    """Write a users database in the binary format over the given file.
+    Records are encoded and written one at a time. As with bbUtil.writeJSON, the file is replaced atomically.
+
+    The file begins with a header containing binarySaveMagic, binarySaveVersion and the database's saveGeneration,
+    followed by the names of every builtIn item of each type in builtInItemTables. builtIn items are stored by their index in these tables,
+    so a save can still be read after builtIn items are added or removed. Each user then follows as a length-prefixed record.
+
+    :param str filePath: Path to the file which the save should be written to
+    :param Iterable[dict] records: The users database serialised with bbUserDB.toNDJSONRecords
+    """
+    records = iter(records)
+    header = next(records)
+    itemNames = builtInItemNames()
+    allItemIDs = {tableName: {name: itemID for itemID, name in enumerate(itemNames[tableName])} for tableName in builtInItemTables}
+
+    fileDir, fileName = os.path.split(filePath)
+    tempFD, tempPath = tempfile.mkstemp(prefix=fileName + ".", suffix=".tmp", dir=fileDir if fileDir != "" else ".")
+    try:
+        with os.fdopen(tempFD, "wb") as f:
+            f.write(headerStruct.pack(binarySaveMagic, binarySaveVersion, header["saveGeneration"]))
+            for tableName in builtInItemTables:
+                f.write(uint16Struct.pack(len(itemNames[tableName])))
+                for name in itemNames[tableName]:
+                    f.write(packString(name))
+            for record in records:
+                packedUser = packUser(record["id"], record["user"], allItemIDs)
+                f.write(uint32Struct.pack(len(packedUser)) + packedUser)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tempPath, filePath)
+    except BaseException:
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+        raise
+
+
+async def writeBinarySaveAsync(filePath : str, records : List[dict]):
+    """Write a users database in the binary format over the given file, in the event loop's default worker thread pool.
+    records must not be mutated until this coroutine has completed.
+
+    :param str filePath: Path to the file which the save should be written to
+    :param list[dict] records: The users database serialised with bbUserDB.toNDJSONRecords
+    """
+    await asyncio.get_event_loop().run_in_executor(None, writeBinarySave, filePath, records)
+
+
+class bbBinarySaveReader:
+    """Decodes the records of a binary users database save. Each record is decoded from a separate buffer, given by setData.
+
+    :var data: The bytes being decoded
+    :vartype data: bytes
+    :var pos: The position in data of the next byte to decode
+    :vartype pos: int
+    :var itemNames: The names of builtIn items of each type, by ID, as stored in the save's header
+    :vartype itemNames: dict[str, list[str]]
+    """
+
+    def __init__(self, itemNames : Dict[str, List[str]]):
+        """
+        :param dict[str, list[str]] itemNames: The names of builtIn items of each type, by ID, as stored in the save's header
+        """
+        self.data = b""
+        self.pos = 0
+        self.itemNames = itemNames
+
+
+    def setData(self, data : bytes):
+        """Start decoding a new buffer from its beginning.
+
+        :param bytes data: The bytes to decode
+        """
+        self.data = data
+        self.pos = 0
+
+
+    def readStruct(self, fmt : struct.Struct) -> tuple:
+        """Decode the given struct at the current position.
+
+        :param struct.Struct fmt: The struct to decode
+        :return: The decoded values
+        :rtype: tuple
+        """
+        values = fmt.unpack_from(self.data, self.pos)
+        self.pos += fmt.size
+        return values
+
+
+    def readKind(self) -> int:
+        """Decode a record or item kind at the current position.
+
+        :return: KIND_COMPACT or KIND_JSON
+        :rtype: int
+        """
+        self.pos += 1
+        return self.data[self.pos - 1]
+
+
+    def readString(self) -> str:
+        """Decode a length-prefixed string at the current position.
+
+        :return: The decoded string
+        :rtype: str
+        """
+        length = self.readStruct(uint16Struct)[0]
+        self.pos += length
+        return self.data[self.pos - length:self.pos].decode("utf-8")
+
+
+    def readJSON(self):
+        """Decode a length-prefixed JSON blob at the current position.
+
+        :return: The decoded object, or None if the blob is empty
+        """
+        length = self.readStruct(uint32Struct)[0]
+        if length == 0:
+            return None
+        self.pos += length
+        return json.loads(self.data[self.pos - length:self.pos])
+
+
+    def readItem(self, tableName : str) -> dict:
+        """Decode an item encoded by packItem at the current position.
+
+        :param str tableName: The builtIn item type of the item, one of builtInItemTables
+        :return: The item, serialised as by its toDict method
+        :rtype: dict
+        """
+        if self.readKind() == KIND_JSON:
+            return self.readJSON()
+        return {"name": self.itemNames[tableName][self.readStruct(uint16Struct)[0]], "builtIn": True}
+
+
+    def readShip(self) -> dict:
+        """Decode a ship encoded by packShip at the current position.
+
+        :return: The ship, serialised as by bbShip.toDict
+        :rtype: dict
+        """
+        if self.readKind() == KIND_JSON:
+            return self.readJSON()
+        shipDict = {"name": self.itemNames["ships"][self.readStruct(uint16Struct)[0]], "builtIn": True, "nickname": self.readString()}
+        for listKey, tableName in shipItemKeys:
+            shipDict[listKey] = [self.readItem(tableName) for i in range(self.readStruct(uint16Struct)[0])]
+        return shipDict
+
+
+    def readUser(self) -> dict:
+        """Decode a user record encoded by packUser.
+
+        :return: A users database save record containing the user's ID and serialised user, as in bbUserDB.toNDJSONRecords
+        :rtype: dict
+        """
+        fixedValues = self.readStruct(userStruct)
+        id, kind = fixedValues[0], fixedValues[1]
+        if kind == KIND_JSON:
+            return {"id": id, "user": self.readJSON()}
+        userDict = {key: fixedValues[i + 2] for i, (key, isFloat) in enumerate(userStructKeys)}
+        userDict["pollOwned"] = fixedValues[-1]
+        userDict["activeShip"] = self.readShip()
+        for inventoryKey in userInventoryKeys:
+            listings = []
+            for i in range(self.readStruct(uint32Struct)[0]):
+                count = self.readStruct(uint32Struct)[0]
+                item = self.readShip() if inventoryKey == "inactiveShips" else self.readItem(inventoryItemTables[inventoryKey])
+                listings.append({"item": item, "count": count})
+            userDict[inventoryKey] = listings
+        extras = self.readJSON()
+        if extras is not None:
+            userDict.update(extras)
+        return {"id": id, "user": userDict}
+
+
+def readExactly(f : BinaryIO, numBytes : int) -> bytes:
+    """Read exactly the given number of bytes from a file.
+
+    :param BinaryIO f: The file to read from
+    :param int numBytes: The number of bytes to read
+    :return: The bytes read
+    :rtype: bytes
+    :raise EOFError: If the file ends before numBytes bytes could be read
+    """
+    data = f.read(numBytes)
+    if len(data) != numBytes:
+        raise EOFError("Binary users database save ended unexpectedly")
+    return data
+
+
+def iterBinarySave(filePath : str) -> Iterator[dict]:
+    """Read the users database save in the binary format at the given path one user at a time.
+    The save is yielded as the same records written by bbUserDB.toNDJSONRecords, so it can be loaded with bbUserDB.fromNDJSONRecords.
+
+    :param str filePath: Path to the binary users database save
+    :return: An iterator over the records of the save - a header containing the database's saveGeneration, followed by one record per user
+    :rtype: Iterator[dict]
+    :raise ValueError: If the file is not a binary users database save, or was written by a newer version of the format
+    """
+    with open(filePath, "rb") as f:
+        magic, version, saveGeneration = headerStruct.unpack(readExactly(f, headerStruct.size))
+        if magic != binarySaveMagic:
+            raise ValueError("Not a binary users database save: " + filePath)
+        if version > binarySaveVersion:
+            raise ValueError("Unsupported binary users database save version " + str(version) + ": " + filePath)
+        yield {"format": bbUserDB.ndjsonSaveFormat, "saveGeneration": saveGeneration}
+
+        itemNames = {}
+        for tableName in builtInItemTables:
+            tableLength = uint16Struct.unpack(readExactly(f, uint16Struct.size))[0]
+            names = []
+            for i in range(tableLength):
+                names.append(readExactly(f, uint16Struct.unpack(readExactly(f, uint16Struct.size))[0]).decode("utf-8"))
+            itemNames[tableName] = names
+
+        reader = bbBinarySaveReader(itemNames)
+        while True:
+            lengthBytes = f.read(uint32Struct.size)
+            if len(lengthBytes) == 0:
+                return
+            if len(lengthBytes) != uint32Struct.size:
+                raise EOFError("Binary users database save ended unexpectedly")
+            reader.setData(readExactly(f, uint32Struct.unpack(lengthBytes)[0]))
+            yield reader.readUser()
+
+
+def exportToNDJSON(filePath : str, exportPath : str):
+    """Convert the binary users database save at the given path into a newline-delimited JSON users database save, for debugging.
+    The exported save can be loaded by the bot in place of the binary save.
+
+    :param str filePath: Path to the binary users database save
+    :param str exportPath: Path to write the newline-delimited JSON save to
+    """
+    bbUtil.writeJSONLines(exportPath, iterBinarySave(filePath))
@@ -0,0 +1,162 @@
+from typing import List, Tuple, Iterator
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from ..bbConfig import bbData
+from ..logging import bbLogger
+
+
+# Keys that bbUser.fromDict requires in every serialised user
+requiredUserKeys = ["credits", "lifetimeCredits", "bountyCooldownEnd", "systemsChecked", "bountyWins", "activeShip"]
+# Keys that bbShip.fromDict requires in every serialised ship that is not builtIn
+requiredCustomShipKeys = ["name", "maxPrimaries", "maxTurrets", "maxModules"]
+# The builtIn item data for each inventory in a serialised user, used to check that builtIn items exist. None for ship inventories.
+inventoryBuiltInData = {"inactiveShips": None, "inactiveWeapons": bbData.builtInWeaponData,
+                        "inactiveModules": bbData.builtInModuleData, "inactiveTurrets": bbData.builtInTurretData}
+# The builtIn item data for each list of items equipped to a serialised ship
+loadoutBuiltInData = {"weapons": bbData.builtInWeaponData, "modules": bbData.builtInModuleData,
+                        "turrets": bbData.builtInTurretData, "shipUpgrades": bbData.builtInUpgradeData}
+
+
+def normaliseItemDict(itemDict : dict, builtInData : dict) -> dict:
+    """Check that the given serialised item can be constructed by its fromDict function.
+    builtIn items are reduced to their name, as all other information is read from bbData when they are constructed.
+
+    :param dict itemDict: The serialised item to check
+    :param dict builtInData: The bbData dictionary of builtIn items of the same type as itemDict
+    :return: itemDict, with any information that is unused when constructing it removed
+    :rtype: dict
+    :raise ValueError: If itemDict could not be constructed
+    """
+    if "name" not in itemDict:
+        raise ValueError("Item has no name")
+    if itemDict.get("builtIn", False):
+        if itemDict["name"] not in builtInData:
+            raise ValueError("Unknown builtIn item: " + str(itemDict["name"]))
+        return {"name": itemDict["name"], "builtIn": True}
+    return itemDict
+
+
+def normaliseShipDict(shipDict : dict) -> dict:
+    """Check that the given serialised ship, and all items equipped to it, can be constructed by bbShip.fromDict.
+    Equipped builtIn items are reduced to their names.
+
+    :param dict shipDict: The serialised ship to check
+    :return: shipDict, with any information that is unused when constructing it removed
+    :rtype: dict
+    :raise ValueError: If shipDict could not be constructed
+    """
+    if "builtIn" not in shipDict:
+        raise ValueError("Ship has no builtIn flag")
+    if shipDict["builtIn"]:
+        if shipDict.get("name") not in bbData.builtInShipData:
+            raise ValueError("Unknown builtIn ship: " + str(shipDict.get("name")))
+    else:
+        for key in requiredCustomShipKeys:
+            if key not in shipDict:
+                raise ValueError("Custom ship missing required key: " + key)
+    for loadoutKey in loadoutBuiltInData:
+        if loadoutKey in shipDict:
+            shipDict[loadoutKey] = [normaliseItemDict(itemDict, loadoutBuiltInData[loadoutKey]) for itemDict in shipDict[loadoutKey]]
+    return shipDict
+
+
+def normaliseUserRecord(record : dict) -> dict:
+    """Check that the user in the given newline-delimited JSON save record can be constructed by bbUser.fromDict.
+    builtIn items in the user's ships and inventories are reduced to their names.
+
+    :param dict record: A user record from a newline-delimited JSON users database save, as written by bbUserDB.toNDJSONRecords
+    :return: record, with any information that is unused when constructing its user removed
+    :rtype: dict
+    :raise ValueError: If the record's user could not be constructed
+    """
+    if type(record.get("id")) != int:
+        raise ValueError("Record has no integer id")
+    userDict = record.get("user")
+    if type(userDict) != dict:
+        raise ValueError("Record has no user")
+    for key in requiredUserKeys:
+        if key not in userDict:
+            raise ValueError("User missing required key: " + key)
+    userDict["activeShip"] = normaliseShipDict(userDict["activeShip"])
+    for inventoryKey in inventoryBuiltInData:
+        if inventoryKey in userDict:
+            for listingDict in userDict[inventoryKey]:
+                if type(listingDict.get("count")) != int or "item" not in listingDict:
+                    raise ValueError("Invalid " + inventoryKey + " listing")
+                if inventoryBuiltInData[inventoryKey] is None:
+                    listingDict["item"] = normaliseShipDict(listingDict["item"])
+                else:
+                    listingDict["item"] = normaliseItemDict(listingDict["item"], inventoryBuiltInData[inventoryKey])
+    return record
+
+
+def readNDJSONChunk(filePath : str, start : int, end : int) -> Tuple[List[dict], List[str]]:
+    """Read, decode and normalise the records of a newline-delimited JSON users database save that begin within the given range of bytes.
+    This is run in worker processes by iterNDJSONRecordsParallel. Errors are returned rather than logged, as worker processes do not share the bot's log.
+
+    :param str filePath: Path to the newline-delimited JSON users database save
+    :param int start: The position in the file of the start of the first line to read
+    :param int end: The position in the file after which no more lines should be started
+    :return: A tuple whose first element is the list of valid records in the range, in file order, and whose second element is a list of descriptions of the invalid lines that were skipped
+    :rtype: tuple[list[dict], list[str]]
+    """
+    records = []
+    errors = []
+    with open(filePath, "rb") as f:
+        f.seek(start)
+        while f.tell() < end:
+            linePos = f.tell()
+            line = f.readline()
+            if line == b"":
+                break
+            if line.strip() == b"":
+                continue
+            try:
+                record = json.loads(line)
+                # The header line has no id
+                records.append(record if linePos == 0 else normaliseUserRecord(record))
+            except (ValueError, TypeError, AttributeError) as e:
+                errors.append("Skipped invalid record at byte " + str(linePos) + " of " + filePath + ": " + e.__class__.__name__ + ": " + str(e))
+    return records, errors
+
+
+def chunkBoundaries(filePath : str, numChunks : int) -> List[Tuple[int, int]]:
+    """Split the given file into at most numChunks ranges of roughly equal size, each of which begins at the start of a line.
+
+    :param str filePath: Path to the file to split
+    :param int numChunks: The number of ranges to split the file into
+    :return: A list of (start, end) byte positions for each range, in file order
+    :rtype: list[tuple[int, int]]
+    """
+    fileSize = os.path.getsize(filePath)
+    starts = [0]
+    with open(filePath, "rb") as f:
+        for chunkNum in range(1, numChunks):
+            f.seek(max(fileSize * chunkNum // numChunks, starts[-1]))
+            # Move to the start of the next line
+            f.readline()
+            if f.tell() >= fileSize:
+                break
+            if f.tell() > starts[-1]:
+                starts.append(f.tell())
+    return [(starts[i], starts[i + 1] if i + 1 < len(starts) else fileSize) for i in range(len(starts))]
+
+
+def iterNDJSONRecordsParallel(filePath : str, numProcesses : int) -> Iterator[dict]:
+    """Read the records of a newline-delimited JSON users database save, decoding and normalising them across a pool of worker processes.
+    The file is split into several chunks per process, which are yielded in file order as they become available, so that the users of
+    earlier chunks can be constructed by bbUserDB.fromNDJSONRecords while later chunks are still being read. Invalid records are logged and skipped.
+
+    :param str filePath: Path to the newline-delimited JSON users database save
+    :param int numProcesses: The number of worker processes to use
+    :return: An iterator over the valid records in the file, in file order
+    :rtype: Iterator[dict]
+    """
+    chunks = chunkBoundaries(filePath, numProcesses * 4)
+    with ProcessPoolExecutor(max_workers=numProcesses) as pool:
+        for records, errors in pool.map(readNDJSONChunk, [filePath] * len(chunks), [chunk[0] for chunk in chunks], [chunk[1] for chunk in chunks]):
+            for error in errors:
+                bbLogger.log("UserDBLoader", "iterNDJSONPara", error, category="usersDB", eventType="USER_LOAD_ERR")
+            yield from records
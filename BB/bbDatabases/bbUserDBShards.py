@@ -0,0 +1,152 @@
+from typing import List, Dict, Iterable, Iterator, Tuple
+
+import os
+import zlib
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from . import bbUserDB, bbUserDBLoader
+from .. import bbUtil
+from ..logging import bbLogger
+import traceback
+
+
+# The name of the manifest file in a sharded users database directory
+manifestFileName = "manifest.json"
+
+
+def shardOf(id : int, shardCount : int) -> int:
+    """Decide which shard the user with the given ID is stored in.
+    Discord IDs are snowflakes whose lowest bits are often the same, so the ID is hashed before being split into shards.
+
+    :param int id: The ID of the user
+    :param int shardCount: The number of shards the users database is split into
+    :return: The number of the shard that the user belongs in, between 0 and shardCount - 1
+    :rtype: int
+    """
+    return zlib.crc32(id.to_bytes(8, "little")) % shardCount
+
+
+def shardFileName(shardNum : int) -> str:
+    """Get the name of the file that the given shard is stored in, within a sharded users database directory.
+
+    :param int shardNum: The number of the shard
+    :return: The name of the shard's file
+    :rtype: str
+    """
+    return "users." + str(shardNum) + ".ndjson"
+
+
+def manifestExists(shardDir : str) -> bool:
+    """Check if a sharded users database has been saved in the given directory.
+
+    :param str shardDir: Path to the sharded users database directory
+    :return: True if the directory contains a manifest, False otherwise
+    :rtype: bool
+    """
+    return os.path.exists(os.path.join(shardDir, manifestFileName))
+
+
+def buildShardSaves(userDB : bbUserDB.bbUserDB, dirtyIDs : List[int], removedIDs : List[int], shardCount : int, fullSave : bool) -> Dict[int, List[dict]]:
+    """Serialise every shard of the given users database that contains a changed or removed user, in the newline-delimited JSON format.
+    This should be called on the event loop, directly after userDB.startSave.
+
+    :param bbUserDB userDB: The users database to save
+    :param list[int] dirtyIDs: The IDs of users that have changed since the last save, as given by startSave
+    :param list[int] removedIDs: The IDs of users removed since the last save, as given by startSave
+    :param int shardCount: The number of shards to split the database into
+    :param bool fullSave: Give True to serialise every shard, whether or not it has changed
+    :return: A dictionary mapping the number of each shard to rewrite, to the records of that shard as created by bbUserDB.toNDJSONRecords
+    :rtype: dict[int, list[dict]]
+    """
+    if fullSave:
+        dirtyShards = set(range(shardCount))
+    else:
+        dirtyShards = {shardOf(id, shardCount) for id in dirtyIDs}
+        dirtyShards.update(shardOf(id, shardCount) for id in removedIDs)
+
+    shardSaves = {shardNum: [{"format": bbUserDB.ndjsonSaveFormat, "saveGeneration": userDB.saveGeneration}] for shardNum in dirtyShards}
+    if len(dirtyShards) == 0:
+        return shardSaves
+    for id in userDB.getIds():
+        shardNum = shardOf(id, shardCount)
+        if shardNum in dirtyShards:
+            try:
+                shardSaves[shardNum].append({"id": id, "user": userDB.users[id].toDictNoId()})
+            except Exception as e:
+                bbLogger.log("UserDBShards", "buildShardSaves", "Error serialising bbUser: " + e.__class__.__name__, trace=traceback.format_exc(), eventType="USERERR")
+    return shardSaves
+
+
+def writeShardManifest(shardDir : str, shardCount : int, saveGeneration : int, writtenShards : List[int]):
+    """Record the current layout of a sharded users database in its manifest, atomically, and delete any shard files not in the layout.
+    Shards are only listed in the manifest once they have been written, so a manifest never refers to a missing shard.
+
+    :param str shardDir: Path to the sharded users database directory
+    :param int shardCount: The number of shards the database is split into
+    :param int saveGeneration: The saveGeneration of the save that has just been written
+    :param list[int] writtenShards: The numbers of the shards written by this save
+    """
+    manifestPath = os.path.join(shardDir, manifestFileName)
+    oldShardFiles = bbUtil.readJSON(manifestPath)["shards"] if os.path.exists(manifestPath) else []
+    shardFiles = [shardFileName(shardNum) for shardNum in range(shardCount)
+                    if shardNum in writtenShards or (shardFileName(shardNum) in oldShardFiles and os.path.exists(os.path.join(shardDir, shardFileName(shardNum))))]
+    bbUtil.writeJSON(manifestPath, {"saveGeneration": saveGeneration, "shardCount": shardCount, "shards": shardFiles})
+    # Remove shards left over from a different shardCount
+    for fileName in oldShardFiles:
+        if fileName not in shardFiles and os.path.exists(os.path.join(shardDir, fileName)):
+            os.remove(os.path.join(shardDir, fileName))
+
+
+async def writeShardsAsync(shardDir : str, shardCount : int, saveGeneration : int, shardSaves : Dict[int, List[dict]]):
+    """Write the given shards of a users database concurrently in the event loop's default worker thread pool, and then update the manifest.
+    Each shard is replaced atomically. If any shard fails to write, the manifest is not updated and the exception is raised.
+
+    :param str shardDir: Path to the sharded users database directory. The directory is created if it does not exist.
+    :param int shardCount: The number of shards the database is split into
+    :param int saveGeneration: The saveGeneration of the users database save
+    :param dict[int, list[dict]] shardSaves: The shards to write, as given by buildShardSaves. These must not be mutated until this coroutine has completed.
+    """
+    os.makedirs(shardDir, exist_ok=True)
+    await asyncio.gather(*(bbUtil.writeJSONLinesAsync(os.path.join(shardDir, shardFileName(shardNum)), shardSaves[shardNum]) for shardNum in shardSaves))
+    await asyncio.get_event_loop().run_in_executor(None, writeShardManifest, shardDir, shardCount, saveGeneration, list(shardSaves.keys()))
+
+
+def iterShardRecords(saveGeneration : int, shards : Iterable[Tuple[List[dict], List[str]]]) -> Iterator[dict]:
+    """Combine the records of every shard of a sharded users database into the records of a single newline-delimited JSON users database save.
+    Any errors encountered while reading the shards are logged.
+
+    :param int saveGeneration: The saveGeneration recorded in the sharded database's manifest
+    :param shards: The records of each shard and the errors encountered reading it, as given by bbUserDBLoader.readNDJSONChunk
+    :type shards: Iterable[tuple[list[dict], list[str]]]
+    :return: An iterator over the records of a single save containing every shard's users, readable by bbUserDB.fromNDJSONRecords
+    :rtype: Iterator[dict]
+    """
+    yield {"format": bbUserDB.ndjsonSaveFormat, "saveGeneration": saveGeneration}
+    for shardRecords, errors in shards:
+        for error in errors:
+            bbLogger.log("UserDBShards", "iterShardRecords", error, category="usersDB", eventType="USER_LOAD_ERR")
+        # Skip each shard's header
+        yield from shardRecords[1:]
+
+
+def loadShardedUsersDB(shardDir : str, shardCount : int, journalRecords=[], numProcesses=0) -> bbUserDB.bbUserDB:
+    """Build a bbUserDB from the sharded users database in the given directory.
+    Shards are read and validated concurrently, by a pool of worker processes if numProcesses is given, or by threads otherwise.
+    Users are built in this process, one shard at a time in shard order, as each shard becomes available.
+
+    :param str shardDir: Path to the sharded users database directory
+    :param int shardCount: The number of shards the database should be split into. If the database was saved with a different number of shards, it must be rewritten.
+    :param list[dict] journalRecords: users journal records to merge on top of the shards, as for bbUserDB.fromNDJSONRecords (Default [])
+    :param int numProcesses: The number of worker processes to read shards with. Give 0 to read shards with threads in this process. (Default 0)
+    :return: the new bbUserDB. If the database was saved with a different number of shards, its fullSaveRequired is set.
+    :rtype: bbUserDB
+    """
+    manifest = bbUtil.readJSON(os.path.join(shardDir, manifestFileName))
+    shardPaths = [os.path.join(shardDir, fileName) for fileName in manifest["shards"]]
+
+    executor = ProcessPoolExecutor(max_workers=numProcesses) if numProcesses > 0 else ThreadPoolExecutor(max_workers=min(len(shardPaths), 8) or 1)
+    with executor:
+        shards = executor.map(bbUserDBLoader.readNDJSONChunk, shardPaths, [0] * len(shardPaths), [os.path.getsize(shardPath) for shardPath in shardPaths])
+        newDB = bbUserDB.fromNDJSONRecords(iterShardRecords(manifest["saveGeneration"], shards), journalRecords=journalRecords)
+    newDB.fullSaveRequired = manifest["shardCount"] != shardCount
+    return newDB
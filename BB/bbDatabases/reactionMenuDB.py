@@ -1,4 +1,8 @@
+from typing import Tuple
+
 from ..reactionMenus import ReactionMenu, ReactionRolePicker, ReactionInventoryPicker, ReactionDuelChallengeMenu, ReactionPollMenu
+from .. import bbUtil, bbGlobals
+from discord import PartialEmoji
 
 # ReactionMenu subclasses that cannot be saved to dictionary
 # TODO: change to a class-variable reference e.g menu.__class__.SAVEABLE
@@ -6,8 +10,41 @@ unsaveableMenuTypes = ["ReactionDuelChallengeMenu"]
 
 
 class ReactionMenuDB(dict):
-    """A database of ReactionMenu instances.
-    Currently just an extension of dict to add toDict()."""
+    """A database of ReactionMenu instances, by menu message ID.
+    An extension of dict to add toDict(), and to match reaction events to menus without any HTTP requests.
+    Each menu keeps its own message and its options by emoji, so a reaction is matched with a lookup of its message ID here, and of its emoji in the menu's options.
+
+    :var numFetchesAvoided: The number of reaction events with an emoji usable by the bot, each of which used to fetch the reacted message before checking for a menu
+    :vartype numFetchesAvoided: int
+    :var numMenuReactions: The number of reaction events which matched a menu option
+    :vartype numMenuReactions: int
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.numFetchesAvoided = 0
+        self.numMenuReactions = 0
+
+
+    def getMenuForReaction(self, messageID : int, partialEmoji : PartialEmoji) -> Tuple[ReactionMenu.ReactionMenu, bbUtil.dumbEmoji]:
+        """Find the menu and option emoji that a reaction event applies to, without making any HTTP requests.
+        Reactions with custom emojis that the bot cannot see, such as emojis from servers the bot is not in, cannot be menu options, so they are ignored
+        and not counted in numFetchesAvoided. dumbEmoji.sendable is the string "None" for such emojis, so the client is asked directly.
+
+        :param int messageID: The ID of the message that was reacted to
+        :param discord.PartialEmoji partialEmoji: The emoji of the reaction
+        :return: The menu and the emoji of the menu option reacted with, or None and None if the reaction is not on a menu option
+        :rtype: tuple[ReactionMenu, bbUtil.dumbEmoji]
+        """
+        emoji = bbUtil.dumbEmojiFromPartial(partialEmoji)
+        if emoji.isID and bbGlobals.client.get_emoji(emoji.id) is None:
+            return None, None
+        self.numFetchesAvoided += 1
+        if messageID not in self or not self[messageID].hasEmojiRegistered(emoji):
+            return None, None
+        self.numMenuReactions += 1
+        return self[messageID], emoji
+
 
     def toDict(self) -> str:
         """Serialise all saveable ReactionMenus in this DB into a single dictionary.
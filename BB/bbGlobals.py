@@ -7,17 +7,45 @@ botLoggedIn = False
 usersDB = None
 bountiesDB = None
 guildsDB = None
+# The SQLite store holding the above databases, if bbConfig.databaseBackend is "sqlite"
+sqliteStore = None
+
+# Journal of user balance changes made since the last save. None if disabled
+economyJournal = None
+
+# Prevents overlapping saves. Created on first save, as it must belong to the running event loop
+dbSaveLock = None
+# Time in seconds that the event loop was blocked for during the most recent save, and the longest such block recorded
+lastSaveLoopBlockedSeconds = 0.0
+maxSaveLoopBlockedSeconds = 0.0
 
 
 # Timed tasks
+# Owns every timed task below, and the duel request and reaction menu task groups. Created in on_ready, as its wakeEvent must belong to the running event loop
+taskScheduler = None
+
 newBountyTT = None
 
 shopRefreshTT = None
 dbSaveTT = None
+economyJournalFlushTT = None
 
 duelRequestTTDB = None
 
 
+# Sends announcements to every guild concurrently, within discord's rate limits. Created in on_ready, as its semaphore must belong to the running event loop
+messageFanOut = None
+
+# Sends messages to each channel in order, merging consecutive plain text. Created in on_ready, as its queues must belong to the running event loop
+outboundQueue = None
+
+# Tells every guild about checks made in other guilds, in periodic digest messages. Created in on_ready, as it schedules its digests with taskScheduler
+checkDigest = None
+
+# Batches edits to BountyBoardChannel listings. Created in on_ready, as it schedules its edits with taskScheduler
+bountyBoardSync = None
+
+
 # Reaction Menus
 reactionMenusDB = None
 reactionMenusTTDB = None
@@ -3,6 +3,7 @@ from ...bbConfig import bbConfig
 from discord import Embed, User, Message
 from .. import bbUser
 from ...scheduling import TimedTask
+from ...bbDatabases import bbEconomyJournal
 from .. import bbGuild
 
 
@@ -72,11 +73,10 @@ async def fightDuel(sourceUser : User, targetUser : User, duelReq : DuelRequest,
     :return: A dictionary containing statistics about the duel, as well as references to the winning and losing bbUsers
     :rtype: dict
     """
-    for menu in duelReq.menus:
-        await menu.delete()
-
     sourceBBUser = duelReq.targetBBUser
     targetBBUser = duelReq.sourceBBUser
+    # Close the challenge before any awaits, so that it cannot be accepted again while this duel is being announced
+    targetBBUser.removeDuelChallengeObj(duelReq)
 
     # fight = ShipFight.ShipFight(sourceBBUser.activeShip, targetBBUser.activeShip)
     # duelResults = fight.fightShips(bbConfig.duelVariancePercent)
@@ -94,29 +94,38 @@ async def fightDuel(sourceUser : User, targetUser : User, duelReq : DuelRequest,
         winningBBUser = None
         losingBBUser = None
 
+    # Settle the duel before any awaits, so that the participants' balances cannot change between the callers' stakes checks and this
+    if winningBBUser is not None:
+        winningBBUser.duelWins += 1
+        losingBBUser.duelLosses += 1
+        winningBBUser.duelCreditsWins += duelReq.stakes
+        losingBBUser.duelCreditsLosses += duelReq.stakes
+
+        winningBBUser.credits += duelReq.stakes
+        losingBBUser.credits -= duelReq.stakes
+        bbEconomyJournal.recordUserCredits(winningBBUser, "duel")
+        bbEconomyJournal.recordUserCredits(losingBBUser, "duel")
+
+    await duelReq.duelTimeoutTask.forceExpire(callExpiryFunc=False)
+    for menu in duelReq.menus:
+        await menu.delete()
+
     # battleMsg =
 
     # winningBBUser = sourceBBUser if winningShip is sourceBBUser.activeShip else (targetBBUser if winningShip is targetBBUser.activeShip else None)
     # losingBBUser = None if winningBBUser is None else (sourceBBUser if winningBBUser is targetBBUser else targetBBUser)
 
     if winningBBUser is None:
-        await acceptMsg.channel.send(":crossed_swords: **Stalemate!** " + str(targetUser) + " and " + sourceUser.mention + " drew in a duel!")
+        await bbGlobals.outboundQueue.send(acceptMsg.channel, ":crossed_swords: **Stalemate!** " + str(targetUser) + " and " + sourceUser.mention + " drew in a duel!")
         if acceptMsg.guild.get_member(targetUser.id) is None:
             targetDCGuild = bbUtil.findBBUserDCGuild(targetBBUser)
             if targetDCGuild is not None:
                 targetBBGuild = bbGlobals.guildsDB.getGuild(targetDCGuild.id)
                 if targetBBGuild.hasPlayChannel():
-                    await bbGlobals.client.get_channel(targetBBGuild.getPlayChannelId()).send(":crossed_swords: **Stalemate!** " + targetDCGuild.get_member(targetUser.id).mention + " and " + str(sourceUser) + " drew in a duel!")
+                    await bbGlobals.outboundQueue.post(bbGlobals.client.get_channel(targetBBGuild.getPlayChannelId()), ":crossed_swords: **Stalemate!** " + targetDCGuild.get_member(targetUser.id).mention + " and " + str(sourceUser) + " drew in a duel!")
         else:
-            await acceptMsg.channel.send(":crossed_swords: **Stalemate!** " + targetUser.mention + " and " + sourceUser.mention + " drew in a duel!")
+            await bbGlobals.outboundQueue.send(acceptMsg.channel, ":crossed_swords: **Stalemate!** " + targetUser.mention + " and " + sourceUser.mention + " drew in a duel!")
     else:
-        winningBBUser.duelWins += 1
-        losingBBUser.duelLosses += 1
-        winningBBUser.duelCreditsWins += duelReq.stakes
-        losingBBUser.duelCreditsLosses += duelReq.stakes
-
-        winningBBUser.credits += duelReq.stakes
-        losingBBUser.credits -= duelReq.stakes
         creditsMsg = "The stakes were **" + \
             str(duelReq.stakes) + "** credit" + \
             ("s" if duelReq.stakes != 1 else "") + ":"
@@ -135,25 +144,23 @@ async def fightDuel(sourceUser : User, targetUser : User, duelReq : DuelRequest,
         statsEmbed = makeDuelStatsEmbed(duelResults, sourceUser, targetUser)
 
         if acceptMsg.guild.get_member(winningBBUser.id) is None:
-            await acceptMsg.channel.send(":crossed_swords: **Fight!** " + str(bbGlobals.client.get_user(winningBBUser.id)) + " beat " + bbGlobals.client.get_user(losingBBUser.id).mention + " in a duel!\n" + creditsMsg, embed=statsEmbed)
+            await bbGlobals.outboundQueue.send(acceptMsg.channel, ":crossed_swords: **Fight!** " + str(bbGlobals.client.get_user(winningBBUser.id)) + " beat " + bbGlobals.client.get_user(losingBBUser.id).mention + " in a duel!\n" + creditsMsg, embed=statsEmbed)
             winnerDCGuild = bbUtil.findBBUserDCGuild(winningBBUser)
             if winnerDCGuild is not None:
                 winnerBBGuild = bbGlobals.guildsDB.getGuild(winnerDCGuild.id)
                 if winnerBBGuild.hasPlayChannel():
-                    await bbGlobals.client.get_channel(winnerBBGuild.getPlayChannelId()).send(":crossed_swords: **Fight!** " + winnerDCGuild.get_member(winningBBUser.id).mention + " beat " + str(bbGlobals.client.get_user(losingBBUser.id)) + " in a duel!\n" + creditsMsg, embed=statsEmbed)
+                    await bbGlobals.outboundQueue.post(bbGlobals.client.get_channel(winnerBBGuild.getPlayChannelId()), ":crossed_swords: **Fight!** " + winnerDCGuild.get_member(winningBBUser.id).mention + " beat " + str(bbGlobals.client.get_user(losingBBUser.id)) + " in a duel!\n" + creditsMsg, embed=statsEmbed)
         else:
             if acceptMsg.guild.get_member(losingBBUser.id) is None:
-                await acceptMsg.channel.send(":crossed_swords: **Fight!** " + bbGlobals.client.get_user(winningBBUser.id).mention + " beat " + str(bbGlobals.client.get_user(losingBBUser.id)) + " in a duel!\n" + creditsMsg, embed=statsEmbed)
+                await bbGlobals.outboundQueue.send(acceptMsg.channel, ":crossed_swords: **Fight!** " + bbGlobals.client.get_user(winningBBUser.id).mention + " beat " + str(bbGlobals.client.get_user(losingBBUser.id)) + " in a duel!\n" + creditsMsg, embed=statsEmbed)
                 loserDCGuild = bbUtil.findBBUserDCGuild(losingBBUser)
                 if loserDCGuild is not None:
                     loserBBGuild = bbGlobals.guildsDB.getGuild(loserDCGuild.id)
                     if loserBBGuild.hasPlayChannel():
-                        await bbGlobals.client.get_channel(loserBBGuild.getPlayChannelId()).send(":crossed_swords: **Fight!** " + str(bbGlobals.client.get_user(winningBBUser.id)) + " beat " + loserDCGuild.get_member(losingBBUser.id).mention + " in a duel!\n" + creditsMsg, embed=statsEmbed)
+                        await bbGlobals.outboundQueue.post(bbGlobals.client.get_channel(loserBBGuild.getPlayChannelId()), ":crossed_swords: **Fight!** " + str(bbGlobals.client.get_user(winningBBUser.id)) + " beat " + loserDCGuild.get_member(losingBBUser.id).mention + " in a duel!\n" + creditsMsg, embed=statsEmbed)
             else:
-                await acceptMsg.channel.send(":crossed_swords: **Fight!** " + bbGlobals.client.get_user(winningBBUser.id).mention + " beat " + bbGlobals.client.get_user(losingBBUser.id).mention + " in a duel!\n" + creditsMsg, embed=statsEmbed)
+                await bbGlobals.outboundQueue.send(acceptMsg.channel, ":crossed_swords: **Fight!** " + bbGlobals.client.get_user(winningBBUser.id).mention + " beat " + bbGlobals.client.get_user(losingBBUser.id).mention + " in a duel!\n" + creditsMsg, embed=statsEmbed)
 
-    await targetBBUser.duelRequests[sourceBBUser].duelTimeoutTask.forceExpire(callExpiryFunc=False)
-    targetBBUser.removeDuelChallengeObj(duelReq)
     # logStr = ""
     # for s in duelResults["battleLog"]:
     #     logStr += s.replace("{PILOT1NAME}",sourceUser.name).replace("{PILOT2NAME}",targetUser.name) + "\n"
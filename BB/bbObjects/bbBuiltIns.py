@@ -0,0 +1,51 @@
+from ..bbConfig import bbData
+from .bounties import bbCriminal, bbSystem
+from .items import bbModuleFactory, bbShipUpgrade, bbTurret, bbWeapon
+from .. import bbUtil
+
+
+def spawnBuiltInObjects():
+    """Generate the builtIn criminal, system, item and ship emoji objects in bbData, from the data dictionaries in bbData.
+    This must be done before any users, bounties or shops are loaded, as their fromDict functions read builtIn objects from bbData.
+    Custom ship emojis are looked up with bbGlobals.client, which must be set. It does not need to be logged in.
+    """
+    # generate bbCriminal objects from data in bbData
+    for criminalDict in bbData.builtInCriminalData.values():
+        bbData.builtInCriminalObjs[criminalDict["name"]] = bbCriminal.fromDict(criminalDict)
+        bbData.builtInCriminalObjs[criminalDict["name"]].builtIn = True
+        bbData.builtInCriminalData[criminalDict["name"]]["builtIn"] = True
+
+    # generate bbSystem objects from data in bbData
+    for systemDict in bbData.builtInSystemData.values():
+        bbData.builtInSystemObjs[systemDict["name"]] = bbSystem.fromDict(systemDict)
+        bbData.builtInSystemData[systemDict["name"]]["builtIn"] = True
+        bbData.builtInSystemObjs[systemDict["name"]].builtIn = True
+
+    # generate bbModule objects from data in bbData
+    for moduleDict in bbData.builtInModuleData.values():
+        bbData.builtInModuleObjs[moduleDict["name"]] = bbModuleFactory.fromDict(moduleDict)
+        bbData.builtInModuleData[moduleDict["name"]]["builtIn"] = True
+        bbData.builtInModuleObjs[moduleDict["name"]].builtIn = True
+
+    # generate bbWeapon objects from data in bbData
+    for weaponDict in bbData.builtInWeaponData.values():
+        bbData.builtInWeaponObjs[weaponDict["name"]] = bbWeapon.fromDict(weaponDict)
+        bbData.builtInWeaponData[weaponDict["name"]]["builtIn"] = True
+        bbData.builtInWeaponObjs[weaponDict["name"]].builtIn = True
+
+    # generate bbUpgrade objects from data in bbData
+    for upgradeDict in bbData.builtInUpgradeData.values():
+        bbData.builtInUpgradeObjs[upgradeDict["name"]] = bbShipUpgrade.fromDict(upgradeDict)
+        bbData.builtInUpgradeData[upgradeDict["name"]]["builtIn"] = True
+        bbData.builtInUpgradeObjs[upgradeDict["name"]].builtIn = True
+
+    # generate bbTurret objects from data in bbData
+    for turretDict in bbData.builtInTurretData.values():
+        bbData.builtInTurretObjs[turretDict["name"]] = bbTurret.fromDict(turretDict)
+        bbData.builtInTurretData[turretDict["name"]]["builtIn"] = True
+        bbData.builtInTurretObjs[turretDict["name"]].builtIn = True
+
+    # generate the dumbEmoji objects shared by builtIn ships
+    for shipDict in bbData.builtInShipData.values():
+        if "emoji" in shipDict:
+            bbData.builtInShipEmojis[shipDict["name"]] = bbUtil.dumbEmojiFromStr(shipDict["emoji"])
@@ -224,7 +224,7 @@ class bbGuild:
         """
         return {"announceChannel":self.announceChannel, "playChannel":self.playChannel, 
                 "bountyBoardChannel": self.bountyBoardChannel.toDict() if self.hasBountyBoardChannel else None,
-                "alertRoles": self.alertRoles,
+                "alertRoles": dict(self.alertRoles),
                 "shop": self.shop.toDict(),
                 "ownedRoleMenus": self.ownedRoleMenus
                 }
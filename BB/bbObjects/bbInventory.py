@@ -12,6 +12,8 @@ class bbInventory:
     :vartype totalItems: int
     :var numKeys: The number of item types stored; the length of self.keys
     :vartype numKeys: int
+    :var dirty: Whether or not the contents of the inventory have changed since the owner of the inventory last saved it
+    :vartype dirty: bool
     """
     def __init__(self):
         # The actual item listings
@@ -22,6 +24,8 @@ class bbInventory:
         self.totalItems = 0
         # The number of item types stored; the length of self.keys
         self.numKeys = 0
+        # Whether or not the contents have changed since the owner last saved the inventory
+        self.dirty = False
 
     
     
@@ -37,6 +41,7 @@ class bbInventory:
         if quantity < 0:
             raise ValueError("Quantity must be at least 1")
         
+        self.dirty = True
         # increment totalItems tracker
         self.totalItems += quantity
         # increment count for existing bbItemListing
@@ -62,6 +67,7 @@ class bbInventory:
         """
         # Ensure enough of item is stored to remove quantity of it
         if item in self.items and self.items[item].count >= quantity:
+            self.dirty = True
             # Update item's count and inventory's totalItems tracker
             self.items[item].count -= quantity
             self.totalItems -= quantity
@@ -156,6 +162,7 @@ class bbInventory:
         self.keys = []
         self.totalItems = 0
         self.numKeys = 0
+        self.dirty = True
 
 
     
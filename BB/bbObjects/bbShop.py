@@ -10,6 +10,7 @@ from .items.modules import bbModule
 from . import bbInventory, bbInventoryListing
 import random
 from ..logging import bbLogger
+from ..bbDatabases import bbEconomyJournal
 
 class bbShop:
     """A shop containing a random selection of items which players can buy.
@@ -208,6 +209,7 @@ class bbShop:
             self.shipsStock.removeItem(requestedShip)
             user.credits -= requestedShip.getValue()
             user.inactiveShips.addItem(requestedShip)
+            bbEconomyJournal.recordUserCredits(user, "shopBuy", wholeUser=True)
         else:
             raise RuntimeError("user " + str(user.id) + " attempted to buy ship " + requestedShip.name + " but can't afford it: " + str(user.credits) + " < " + str(requestedShip.getValue()))
 
@@ -222,6 +224,7 @@ class bbShop:
         user.credits += ship.getValue()
         self.shipsStock.addItem(ship)
         user.inactiveShips.removeItem(ship)
+        bbEconomyJournal.recordUserCredits(user, "shopSell", wholeUser=True)
     
 
     def userSellShipIndex(self, user : bbUser.bbUser, index : int):
@@ -269,6 +272,7 @@ class bbShop:
             self.weaponsStock.removeItem(requestedWeapon)
             user.credits -= requestedWeapon.getValue()
             user.inactiveShips.addItem(requestedWeapon)
+            bbEconomyJournal.recordUserCredits(user, "shopBuy", wholeUser=True)
         else:
             raise RuntimeError("user " + str(user.id) + " attempted to buy weapon " + requestedWeapon.name + " but can't afford it: " + str(user.credits) + " < " + str(requestedWeapon.getValue()))
 
@@ -283,6 +287,7 @@ class bbShop:
         user.credits += weapon.getValue()
         self.weaponsStock.addItem(weapon)
         user.inactiveWeapons.removeItem(weapon)
+        bbEconomyJournal.recordUserCredits(user, "shopSell", wholeUser=True)
     
 
     def userSellWeaponIndex(self, user : bbUser.bbUser, index : int):
@@ -330,6 +335,7 @@ class bbShop:
             self.modulesStock.removeItem(requestedModule)
             user.credits -= requestedModule.getValue()
             user.inactiveShips.addItem(requestedModule)
+            bbEconomyJournal.recordUserCredits(user, "shopBuy", wholeUser=True)
         else:
             raise RuntimeError("user " + str(user.id) + " attempted to buy module " + requestedModule.name + " but can't afford it: " + str(user.credits) + " < " + str(requestedModule.getValue()))
 
@@ -344,6 +350,7 @@ class bbShop:
         user.credits += module.getValue()
         self.modulesStock.addItem(module)
         user.inactiveModules.removeItem(module)
+        bbEconomyJournal.recordUserCredits(user, "shopSell", wholeUser=True)
     
 
     def userSellModuleIndex(self, user : bbUser.bbUser, index : int):
@@ -391,6 +398,7 @@ class bbShop:
             self.turretsStock.removeItem(requestedTurret)
             user.credits -= requestedTurret.getValue()
             user.inactiveShips.addItem(requestedTurret)
+            bbEconomyJournal.recordUserCredits(user, "shopBuy", wholeUser=True)
         else:
             raise RuntimeError("user " + str(user.id) + " attempted to buy turret " + requestedTurret.name + " but can't afford it: " + str(user.credits) + " < " + str(requestedTurret.getValue()))
 
@@ -405,6 +413,7 @@ class bbShop:
         user.credits += turret.getValue()
         self.turretsStock.addItem(turret)
         user.inactiveTurrets.removeItem(turret)
+        bbEconomyJournal.recordUserCredits(user, "shopSell", wholeUser=True)
     
 
     def userSellTurretIndex(self, user : bbUser.bbUser, index : int):
@@ -25,6 +25,12 @@ defaultUserDict = {"credits":0, "bountyCooldownEnd":0, "lifetimeCredits":0, "sys
 # Reference value not pre-calculated from defaultUserDict. This is not used in the game's code, but provides a reference for game design.
 defaultUserValue = 28970
 
+# Names of the bbUser attributes that are saved to file. Assigning to any of these marks the user as dirty.
+savedAttributeNames = {"credits", "lifetimeCredits", "bountyCooldownEnd", "systemsChecked", "bountyWins", "activeShip",
+                        "inactiveShips", "inactiveModules", "inactiveWeapons", "inactiveTurrets", "lastSeenGuildId",
+                        "duelWins", "duelLosses", "duelCreditsWins", "duelCreditsLosses", "userAlerts",
+                        "bountyWinsToday", "dailyBountyWinsReset", "pollOwned"}
+
 
 class bbUser:
     """A user of the bot. There is currently no guarantee that user still shares any guilds with the bot, though this is planned to change in the future.
@@ -73,6 +79,8 @@ class bbUser:
     :vartype dailyBountyWinsReset: datetime.datetime
     :var pollOwned: Whether or not this user has a running ReactionPollMenu
     :vartype pollOwned: bool
+    :var dirty: Whether or not any of the user's saved attributes have been reassigned since the user was last saved. Use isDirty to also account for changes to the user's inventories and ships.
+    :vartype dirty: bool
     """
 
     def __init__(self, id : int, credits=0, lifetimeCredits=0, 
@@ -185,6 +193,56 @@ class bbUser:
 
         self.pollOwned = pollOwned
 
+        # New users have never been saved
+        self.dirty = True
+
+
+    def __setattr__(self, name : str, value):
+        """Set an attribute of this user. If the attribute is saved to file, the user is marked as dirty.
+
+        :param str name: The name of the attribute to set
+        :param value: The new value for the attribute
+        """
+        object.__setattr__(self, name, value)
+        if name in savedAttributeNames:
+            object.__setattr__(self, "dirty", True)
+
+
+    def markDirty(self):
+        """Mark this user as changed since it was last saved, for changes that do not reassign a saved attribute.
+        """
+        self.dirty = True
+
+
+    def isDirty(self) -> bool:
+        """Decide whether or not this user has changed since it was last saved.
+        This includes changes to the user's saved attributes, inventories, and the loadouts of the user's ships.
+
+        :return: True if the user has changed since it was last saved, False otherwise
+        :rtype: bool
+        """
+        if self.dirty or (self.activeShip is not None and self.activeShip.dirty):
+            return True
+        for inventory in (self.inactiveShips, self.inactiveModules, self.inactiveWeapons, self.inactiveTurrets):
+            if inventory.dirty:
+                return True
+        for ship in self.inactiveShips.keys:
+            if ship.dirty:
+                return True
+        return False
+
+
+    def clearDirty(self):
+        """Mark this user, its inventories and its ships as unchanged since the user was last saved.
+        """
+        self.dirty = False
+        if self.activeShip is not None:
+            self.activeShip.dirty = False
+        for inventory in (self.inactiveShips, self.inactiveModules, self.inactiveWeapons, self.inactiveTurrets):
+            inventory.dirty = False
+        for ship in self.inactiveShips.keys:
+            ship.dirty = False
+
     
     def resetUser(self):
         """Reset the user's attributes back to their default values.
@@ -518,6 +576,7 @@ class bbUser:
         :param bool newState: The new desired of the alert
         """
         await self.userAlerts[alertType].setState(dcGuild, bbGuild, dcMember, newState)
+        self.markDirty()
         return newState
 
 
@@ -541,7 +600,9 @@ class bbUser:
         :param bbGuild bbGuild: The bbGuild in which to toggle the alert state (currently only relevent for role-based alerts, as the role must be looked up) 
         :param discord.Member dcMember: This user's member object in dcGuild (TODO: Just grab dcMember from dcGuild in here)
         """
-        return await self.userAlerts[alertType].toggle(dcGuild, bbGuild, dcMember)
+        newState = await self.userAlerts[alertType].toggle(dcGuild, bbGuild, dcMember)
+        self.markDirty()
+        return newState
 
     
     async def toggleAlertID(self, alertID : str, dcGuild : Guild, bbGuild : bbGuild.bbGuild, dcMember : Member) -> bool:
@@ -616,9 +677,13 @@ def fromDict(id : int, userDict : dict) -> bbUser:
         for turretListingDict in userDict["inactiveTurrets"]:
             inactiveTurrets.addItem(bbTurret.fromDict(turretListingDict["item"]), quantity=turretListingDict["count"])
 
-    return bbUser(id, credits=userDict["credits"], lifetimeCredits=userDict["lifetimeCredits"],
+    newUser = bbUser(id, credits=userDict["credits"], lifetimeCredits=userDict["lifetimeCredits"],
                     bountyCooldownEnd=userDict["bountyCooldownEnd"], systemsChecked=userDict["systemsChecked"],
                     bountyWins=userDict["bountyWins"], activeShip=activeShip, inactiveShips=inactiveShips,
                     inactiveModules=inactiveModules, inactiveWeapons=inactiveWeapons, inactiveTurrets=inactiveTurrets, lastSeenGuildId=userDict["lastSeenGuildId"] if "lastSeenGuildId" in userDict else -1,
                     duelWins=userDict["duelWins"] if "duelWins" in userDict else 0, duelLosses=userDict["duelLosses"] if "duelLosses" in userDict else 0, duelCreditsWins=userDict["duelCreditsWins"] if "duelCreditsWins" in userDict else 0, duelCreditsLosses=userDict["duelCreditsLosses"] if "duelCreditsLosses" in userDict else 0,
                     alerts=userDict["alerts"] if "alerts" in userDict else {}, bountyWinsToday=userDict["bountyWinsToday"] if "bountyWinsToday" in userDict else 0, dailyBountyWinsReset=datetime.utcfromtimestamp(userDict["dailyBountyWinsReset"]) if "dailyBountyWinsReset" in userDict else datetime.utcnow(), pollOwned=userDict["pollOwned"] if "pollOwned" in userDict else False)
+
+    # The user has just been loaded, so has not changed since it was last saved
+    newUser.clearDirty()
+    return newUser
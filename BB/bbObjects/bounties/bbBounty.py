@@ -25,6 +25,8 @@ class Bounty:
     :vartype checked: dict[str, int]
     :var answer: The name of the system where the criminal is located
     :vartype answer: str
+    :var version: Incremented whenever checked changes, so that anything made from the bounty's state can tell when it is out of date
+    :vartype version: int
     """
 
     def __init__(self, criminalObj=None, config=None, bountyDB=None, dbReload=False):
@@ -70,6 +72,7 @@ class Bounty:
         self.reward = config.reward
         self.checked = config.checked
         self.answer = config.answer
+        self.version = 0
 
         
     # return 0 => system not in route
@@ -90,6 +93,7 @@ class Bounty:
             return 1
         else:
             self.checked[system] = userID
+            self.version += 1
             if self.answer == system:
                 return 3
             return 2
@@ -135,7 +139,7 @@ class Bounty:
         :return: A dictionary representation of this bounty.
         :rtype: dict
         """
-        return {"faction": self.faction, "route": self.route, "answer": self.answer, "checked": self.checked, "reward": self.reward, "issueTime": self.issueTime, "endTime": self.endTime, "criminal": self.criminal.toDict()}
+        return {"faction": self.faction, "route": list(self.route), "answer": self.answer, "checked": dict(self.checked), "reward": self.reward, "issueTime": self.issueTime, "endTime": self.endTime, "criminal": self.criminal.toDict()}
 
 
 def fromDict(bounty : dict, dbReload=False) -> bbBounty:
@@ -1,12 +1,14 @@
 import discord
-from discord import Embed, HTTPException, Forbidden, NotFound, Client, Message
+from discord import Embed, HTTPException, Forbidden, NotFound, Client, Message, Object
 from ....bbConfig import bbData, bbConfig
 from .... import bbUtil
 from .. import bbCriminal
 from ....logging import bbLogger
 import asyncio
+import functools
+import weakref
 from .. import bbBounty
-from typing import Dict, Union, List
+from typing import Dict, Union, List, Set, Callable, Awaitable
 
 def makeBountyEmbed(bounty : bbBounty.Bounty) -> Embed:
     """Construct a discord.Embed for listing in a BountyBoardChannel
@@ -38,6 +40,46 @@ def makeBountyEmbed(bounty : bbBounty.Bounty) -> Embed:
     # embed.add_field(name="**See the culprit's loadout with:**", value="`" + bbConfig.commandPrefix + "loadout criminal " + bounty.criminal.name + "`")
     return embed
 
+# The latest listing embed made for each bounty, with the version of the bounty it was made from.
+# Bounties are held weakly, so that the embeds of bounties which no longer exist are freed.
+bountyEmbedCache = weakref.WeakKeyDictionary()
+
+
+def getBountyEmbed(bounty : bbBounty.Bounty) -> Embed:
+    """Get the listing embed for the given bounty, which is shared by every BBC.
+    The embed is only rebuilt when the bounty has changed since the embed was made. The returned embed must not be modified.
+
+    :param Bounty bounty: The bounty to describe
+    :return: A discord.Embed describing statistics about the passed bounty, as made by makeBountyEmbed
+    :rtype: discord.Embed
+    """
+    cached = bountyEmbedCache.get(bounty)
+    if cached is None or cached[0] != bounty.version:
+        cached = (bounty.version, makeBountyEmbed(bounty))
+        bountyEmbedCache[bounty] = cached
+    return cached[1]
+
+
+async def retryHTTPErrors(makeRequest : Callable[[], Awaitable]):
+    """Make a discord request, retrying it if it raises a HTTPException.
+    The request is retried up to bbConfig.bbcHTTPErrRetries times, waiting bbConfig.bbcHTTPErrRetryDelaySeconds before the first retry, and doubling the wait for each following retry.
+    Forbidden and NotFound are raised straight away, as retrying them would not succeed.
+
+    :param makeRequest: A function returning a new coroutine that makes the request. It is called again for every retry.
+    :type makeRequest: Callable[[], Awaitable]
+    :return: The result of the request
+    :raise HTTPException: If the request failed on every try
+    """
+    for tryNum in range(bbConfig.bbcHTTPErrRetries + 1):
+        try:
+            return await makeRequest()
+        except (Forbidden, NotFound):
+            raise
+        except HTTPException:
+            if tryNum == bbConfig.bbcHTTPErrRetries:
+                raise
+            await asyncio.sleep(bbConfig.bbcHTTPErrRetryDelaySeconds * 2 ** tryNum)
+
 noBountiesEmbed = Embed(description='> Please check back later, or use the `$notify bounties` command to be notified when they spawn!', colour=discord.Colour.dark_orange())
 noBountiesEmbed.set_author(name='No Bounties Available', icon_url='https://emojipedia-us.s3.dualstack.us-west-1.amazonaws.com/thumbs/120/twitter/259/stopwatch_23f1.png')
 
@@ -60,6 +102,8 @@ class BountyBoardChannel:
     :vartype noBountiesMessage: discord.message or None
     :var channel: The channel where this BBC's listings are to be posted
     :vartype channel: discord.TextChannel
+    :var listingVersions: The version of each listed bounty that its listing currently shows, by the bounty's criminal. Listings not yet updated since startup are not included.
+    :vartype listingVersions: dict[bbCriminal, int]
     """
 
     def __init__(self, channelIDToBeLoaded : int, messagesToBeLoaded : Dict[int, dict], noBountiesMsgToBeLoaded : Union[int, None]):
@@ -79,11 +123,41 @@ class BountyBoardChannel:
         self.noBountiesMessage = None
         # discord channel object
         self.channel = None
+        # dict of criminal: version of the criminal's bounty shown in its listing
+        self.listingVersions = {}
+
+
+    async def scanHistory(self, messageIDs : Set[int], foundMessages : Dict[int, Message]) -> bool:
+        """Look for the given messages in a single scan of the BBC's channel history, rather than fetching them one at a time.
+        The scan starts just before the oldest message that has not yet been found, and reads at most bbConfig.bbcHistoryScanLimit messages.
+        Messages that are found are added to foundMessages, so that if the scan fails part way through, a retried scan can start from the first message not yet found.
+
+        :param set[int] messageIDs: The IDs of the messages to look for
+        :param foundMessages: The messages found so far, by ID. Newly found messages are added to this dictionary.
+        :type foundMessages: dict[int, discord.Message]
+        :return: True if the scan reached the end of the channel's history, so any messages not found no longer exist. False otherwise.
+        :rtype: bool
+        """
+        remaining = messageIDs - foundMessages.keys()
+        if not remaining:
+            return True
+        numRead = 0
+        # Message IDs increase with time, so no message before the oldest remaining message needs to be read
+        async for msg in self.channel.history(limit=bbConfig.bbcHistoryScanLimit, after=Object(id=min(remaining) - 1), oldest_first=True):
+            numRead += 1
+            if msg.id in remaining:
+                foundMessages[msg.id] = msg
+                remaining.discard(msg.id)
+                if not remaining:
+                    return True
+        return numRead < bbConfig.bbcHistoryScanLimit
 
 
     async def init(self, client : Client, factions : List[str]):
         """Initialise the BBC's attributes to allow it to function.
         Initialisation is done here rather than in the constructor as initialisation can only be done asynchronously.
+        Listing messages are found with a single scan of the channel's history where possible, and fetched individually otherwise.
+        HTTP errors are retried with exponential backoff, as defined in bbConfig.
 
         :param discord.Client client: A logged in client instance used to fetch the BBC's message and channel instances
         :param list[str] factions: A list of faction names with which bounties can be associated
@@ -93,74 +167,66 @@ class BountyBoardChannel:
 
         self.channel = client.get_channel(self.channelIDToBeLoaded)
 
-        for id in self.messagesToBeLoaded:
-            criminal = bbCriminal.fromDict(self.messagesToBeLoaded[id])
+        # IDs are loaded from JSON as strings
+        listingIDs = {int(id): id for id in self.messagesToBeLoaded}
+        messageIDs = set(listingIDs)
+        if self.noBountiesMsgToBeLoaded != -1:
+            messageIDs.add(int(self.noBountiesMsgToBeLoaded))
+
+        foundMessages = {}
+        scanComplete = False
+        try:
+            scanComplete = await retryHTTPErrors(functools.partial(self.scanHistory, messageIDs, foundMessages))
+        except HTTPException:
+            bbLogger.log("BBC", "init", "HTTPException thrown when scanning channel history for listings, fetching individually instead", category='bountyBoards', eventType="HISTORY_SCAN-HTTPERR")
+
+        for id in listingIDs:
+            criminal = bbCriminal.fromDict(self.messagesToBeLoaded[listingIDs[id]])
+            if id in foundMessages:
+                self.bountyMessages[criminal.faction][criminal] = foundMessages[id]
+                continue
+            if scanComplete:
+                bbLogger.log("BBC", "init", "Listing message for criminal no longer exists: " + criminal.name, category='bountyBoards', eventType="LISTING_LOAD-NOT_FOUND")
+                continue
 
+            # The listing was not in the scanned history, so fetch it individually
             try:
-                msg = await self.channel.fetch_message(id)
-                self.bountyMessages[criminal.faction][criminal] = msg
-            except HTTPException:
-                succeeded = False
-                for tryNum in range(bbConfig.bbcHTTPErrRetries):
-                    try:
-                        msg = await self.channel.fetch_message(id)
-                        self.bountyMessages[criminal.faction][criminal] = msg
-                        succeeded = True
-                    except HTTPException:
-                        await asyncio.sleep(bbConfig.bbcHTTPErrRetryDelaySeconds)
-                        continue
-                    break
-                if not succeeded:
-                    bbLogger.log("BBC", "init", "HTTPException thrown when fetching listing for criminal: " + criminal.name, category='bountyBoards', eventType="LISTING_LOAD-HTTPERR")
+                self.bountyMessages[criminal.faction][criminal] = await retryHTTPErrors(functools.partial(self.channel.fetch_message, id))
             except Forbidden:
                 bbLogger.log("BBC", "init", "Forbidden exception thrown when fetching listing for criminal: " + criminal.name, category='bountyBoards', eventType="LISTING_LOAD-FORBIDDENERR")
             except NotFound:
                 bbLogger.log("BBC", "init", "Listing message for criminal no longer exists: " + criminal.name, category='bountyBoards', eventType="LISTING_LOAD-NOT_FOUND")
+            except HTTPException:
+                bbLogger.log("BBC", "init", "HTTPException thrown when fetching listing for criminal: " + criminal.name, category='bountyBoards', eventType="LISTING_LOAD-HTTPERR")
 
         if self.noBountiesMsgToBeLoaded == -1:
             self.noBountiesMessage = None
             if self.isEmpty():
                 try:
                     # self.noBountiesMessage = await self.channel.send(bbConfig.bbcNoBountiesMsg)
-                    self.noBountiesMessage = await self.channel.send(embed=noBountiesEmbed)
-
-                except HTTPException:
-                    succeeded = False
-                    for tryNum in range(bbConfig.bbcHTTPErrRetries):
-                        try:
-                            self.noBountiesMessage = await self.channel.send(embed=noBountiesEmbed)
-                            succeeded = True
-                        except HTTPException:
-                            await asyncio.sleep(bbConfig.bbcHTTPErrRetryDelaySeconds)
-                            continue
-                        break
-                    if not succeeded:
-                        bbLogger.log("BBC", "init", "HTTPException thrown when sending no bounties message", category='bountyBoards', eventType="NOBTYMSG_LOAD-HTTPERR")
-                    self.noBountiesMessage = None
+                    self.noBountiesMessage = await retryHTTPErrors(functools.partial(self.channel.send, embed=noBountiesEmbed))
                 except Forbidden:
                     bbLogger.log("BBC", "init", "Forbidden exception thrown when sending no bounties message", category='bountyBoards', eventType="NOBTYMSG_LOAD-FORBIDDENERR")
-                    self.noBountiesMessage = None
-            
+                except HTTPException:
+                    bbLogger.log("BBC", "init", "HTTPException thrown when sending no bounties message", category='bountyBoards', eventType="NOBTYMSG_LOAD-HTTPERR")
+
+        elif int(self.noBountiesMsgToBeLoaded) in foundMessages:
+            self.noBountiesMessage = foundMessages[int(self.noBountiesMsgToBeLoaded)]
+
+        elif scanComplete:
+            bbLogger.log("BBC", "init", "No bounties message no longer exists", category='bountyBoards', eventType="NOBTYMSG_LOAD-NOT_FOUND")
+            self.noBountiesMessage = None
+
         else:
             try:
-                self.noBountiesMessage = await self.channel.fetch_message(self.noBountiesMsgToBeLoaded)
-            except HTTPException:
-                succeeded = False
-                for tryNum in range(bbConfig.bbcHTTPErrRetries):
-                    try:
-                        self.noBountiesMessage = await self.channel.fetch_message(self.noBountiesMsgToBeLoaded)
-                        succeeded = True
-                    except HTTPException:
-                        await asyncio.sleep(bbConfig.bbcHTTPErrRetryDelaySeconds)
-                        continue
-                    break
-                if not succeeded:
-                    bbLogger.log("BBC", "init", "HTTPException thrown when fetching no bounties message", category='bountyBoards', eventType="NOBTYMSG_LOAD-HTTPERR")
+                self.noBountiesMessage = await retryHTTPErrors(functools.partial(self.channel.fetch_message, self.noBountiesMsgToBeLoaded))
             except Forbidden:
                 bbLogger.log("BBC", "init", "Forbidden exception thrown when fetching no bounties message", category='bountyBoards', eventType="NOBTYMSG_LOAD-FORBIDDENERR")
             except NotFound:
                 bbLogger.log("BBC", "init", "No bounties message no longer exists", category='bountyBoards', eventType="NOBTYMSG_LOAD-NOT_FOUND")
                 self.noBountiesMessage = None
+            except HTTPException:
+                bbLogger.log("BBC", "init", "HTTPException thrown when fetching no bounties message", category='bountyBoards', eventType="NOBTYMSG_LOAD-HTTPERR")
         # del self.messagesToBeLoaded
         # del self.channelIDToBeLoaded
         # del self.noBountiesMsgToBeLoaded
@@ -214,6 +280,7 @@ class BountyBoardChannel:
             raise KeyError("BNTY_BRD_CH-ADD-BNTY_EXSTS: Attempted to add a bounty to a bountyboardchannel, but the bounty is already listed")
             bbLogger.log("BBC", "addBty", "Attempted to add a bounty to a bountyboardchannel, but the bounty is already listed: " + bounty.criminal.name, category='bountyBoards', eventType="LISTING_ADD-EXSTS")
         self.bountyMessages[bounty.criminal.faction][bounty.criminal] = message
+        self.listingVersions.pop(bounty.criminal, None)
 
         if removeMsg:
             try:
@@ -248,6 +315,7 @@ class BountyBoardChannel:
             raise KeyError("BNTY_BRD_CH-REM-BNTY_NOT_EXST: Attempted to remove a bounty from a bountyboardchannel, but the bounty is not listed")
             bbLogger.log("BBC", "remBty", "Attempted to remove a bounty from a bountyboardchannel, but the bounty is not listed: " + bounty.criminal.name, category='bountyBoards', eventType="LISTING_REM-NO_EXST")
         del self.bountyMessages[bounty.criminal.faction][bounty.criminal]
+        self.listingVersions.pop(bounty.criminal, None)
 
         if self.isEmpty():
             try:
@@ -274,6 +342,7 @@ class BountyBoardChannel:
 
     async def updateBountyMessage(self, bounty : bbBounty.Bounty):
         """Update the embed for the listing associated with the given bounty. This includes newly checked and near-correct systems along the route.
+        If the listing already shows the bounty's current version, it is not edited.
         If a HTTP error is thrown when updating the listing, wait and retry the edit for the number of times defined in bbConfig
         
         :param Bounty bounty: The bounty whose listing should be updated
@@ -283,14 +352,22 @@ class BountyBoardChannel:
             raise KeyError("BNTY_BRD_CH-UPD-BNTY_NOT_EXST: Attempted to update a BBC message for a criminal that is not listed")
             bbLogger.log("BBC", "remBty", "Attempted to update a BBC message for a criminal that is not listed: " + bounty.criminal.name, category='bountyBoards', eventType="LISTING_UPD-NO_EXST")
 
+        if self.listingVersions.get(bounty.criminal) == bounty.version:
+            return
+
         content = self.bountyMessages[bounty.criminal.faction][bounty.criminal].content
+        # The bounty may be checked again while editing, so record the version that the embed was made from
+        version = bounty.version
+        embed = getBountyEmbed(bounty)
         try:
-            await self.bountyMessages[bounty.criminal.faction][bounty.criminal].edit(content=content, embed=makeBountyEmbed(bounty))
+            await self.bountyMessages[bounty.criminal.faction][bounty.criminal].edit(content=content, embed=embed)
+            self.listingVersions[bounty.criminal] = version
         except HTTPException:
             succeeded = False
             for tryNum in range(bbConfig.bbcHTTPErrRetries):
                 try:
-                    await self.bountyMessages[bounty.criminal.faction][bounty.criminal].edit(content=content, embed=makeBountyEmbed(bounty))
+                    await self.bountyMessages[bounty.criminal.faction][bounty.criminal].edit(content=content, embed=embed)
+                    self.listingVersions[bounty.criminal] = version
                     succeeded = True
                 except HTTPException:
                     await asyncio.sleep(bbConfig.bbcHTTPErrRetryDelaySeconds)
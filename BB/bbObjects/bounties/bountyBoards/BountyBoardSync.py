@@ -0,0 +1,111 @@
+from .... import bbGlobals
+from ....scheduling import TimedTask
+from ... import bbGuild
+from .. import bbBounty
+from datetime import timedelta
+import asyncio
+
+
+class BountyBoardSync:
+    """Keeps BountyBoardChannel listings up to date with their bounties, without editing every listing on every check.
+    Bounties are marked as dirty when they are checked, and the listings of all dirty bounties are edited together once flushIntervalSeconds
+    have passed since the first of them was marked. However many times a bounty is checked, each of its listings is edited at most once per interval,
+    always showing the bounty as it is at the time of the edit. The listings in different guilds are edited concurrently.
+
+    Creating and removing listings is not delayed - see bountybot.updateAllBountyBoardChannels.
+
+    :var flushIntervalSeconds: How long to wait after a bounty is marked as dirty before editing its listings
+    :vartype flushIntervalSeconds: float
+    :var maxConcurrentEdits: The maximum number of listing edits in flight at once
+    :vartype maxConcurrentEdits: int
+    :var dirtyBounties: The bounties whose listings need editing, in the order they were first marked. Stored as a dict with no values, to act as an ordered set.
+    :vartype dirtyBounties: dict[Bounty, None]
+    :var flushTT: The TimedTask that will edit the listings of dirtyBounties, or None if no edit is waiting
+    :vartype flushTT: TimedTask
+    :var numMarked: The total number of times that bounties have been marked as dirty
+    :vartype numMarked: int
+    :var numEdits: The total number of listing edits made
+    :vartype numEdits: int
+    """
+
+    def __init__(self, flushIntervalSeconds=5, maxConcurrentEdits=8):
+        """
+        :param float flushIntervalSeconds: How long to wait after a bounty is marked as dirty before editing its listings (Default 5)
+        :param int maxConcurrentEdits: The maximum number of listing edits in flight at once (Default 8)
+        """
+        self.flushIntervalSeconds = flushIntervalSeconds
+        self.maxConcurrentEdits = maxConcurrentEdits
+        self.dirtyBounties = {}
+        self.flushTT = None
+        self.numMarked = 0
+        self.numEdits = 0
+
+
+    def scheduleFlush(self):
+        """Schedule the listings of dirtyBounties to be edited in flushIntervalSeconds, if a flush is not already scheduled.
+        """
+        if self.flushTT is None:
+            self.flushTT = TimedTask.TimedTask(expiryDelta=timedelta(seconds=self.flushIntervalSeconds), expiryFunction=self.flush)
+            bbGlobals.taskScheduler.scheduleTask(self.flushTT)
+
+
+    def markDirty(self, bounty : bbBounty.Bounty):
+        """Mark the given bounty's listings as needing an edit, and schedule a flush if one is not already waiting.
+
+        :param Bounty bounty: The bounty which has changed
+        """
+        self.dirtyBounties[bounty] = None
+        self.numMarked += 1
+        self.scheduleFlush()
+
+
+    def discardBounty(self, bounty : bbBounty.Bounty):
+        """Stop waiting to edit the given bounty's listings, for example because they are being removed.
+        Discarding a bounty which is not dirty has no effect.
+
+        :param Bounty bounty: The bounty whose listings should not be edited
+        """
+        self.dirtyBounties.pop(bounty, None)
+
+
+    async def editListing(self, guild : bbGuild.bbGuild, bounty : bbBounty.Bounty, semaphore : asyncio.Semaphore):
+        """Edit guild's BountyBoardChannel listing for the given bounty, if it still has one.
+
+        :param bbGuild guild: The guild owning the listing
+        :param Bounty bounty: The bounty whose listing should be edited
+        :param asyncio.Semaphore semaphore: Limits the number of edits in flight at once
+        """
+        async with semaphore:
+            # The listing may have been removed while waiting for the semaphore
+            if guild.hasBountyBoardChannel and guild.bountyBoardChannel.hasMessageForBounty(bounty):
+                await guild.bountyBoardChannel.updateBountyMessage(bounty)
+                self.numEdits += 1
+
+
+    async def flush(self):
+        """Edit every listing of every dirty bounty concurrently, and wait for all of the edits to finish.
+        Bounties marked as dirty during the flush are edited by the next flush.
+        If the flush is cancelled, for example for running past the scheduler's expiry timeout, all of its bounties are marked as dirty again
+        and another flush is scheduled. Listings that were already edited are skipped by that flush, as BountyBoardChannel does not repeat unchanged edits.
+        """
+        bounties = list(self.dirtyBounties)
+        self.dirtyBounties = {}
+        self.flushTT = None
+        semaphore = asyncio.Semaphore(self.maxConcurrentEdits)
+        try:
+            await asyncio.gather(*(self.editListing(guild, bounty, semaphore) for bounty in bounties for guild in bbGlobals.guildsDB.getGuilds()
+                                    if guild.hasBountyBoardChannel and guild.bountyBoardChannel.hasMessageForBounty(bounty)))
+        except asyncio.CancelledError:
+            for bounty in bounties:
+                self.dirtyBounties.setdefault(bounty, None)
+            self.scheduleFlush()
+            raise
+
+
+    def __len__(self) -> int:
+        """Get the number of bounties waiting for their listings to be edited.
+
+        :return: The number of dirty bounties
+        :rtype: int
+        """
+        return len(self.dirtyBounties)
@@ -36,6 +36,8 @@ class bbShip(bbItem):
     :vartype turrets: list[bbTurret]
     :var upgradesApplied: A list containing references to all bbShipUpgrades objects applied to this ship. May contain duplicate references to save on memory.
     :vartype upgradesApplied: list[bbShipUpgrade]
+    :var dirty: Whether or not the ship's loadout, upgrades or nickname have changed since the owning user was last saved
+    :vartype dirty: bool
     """
 
     def __init__(self, name : str, maxPrimaries : int, maxTurrets : int, maxModules : int, manufacturer="", armour=0.0, cargo=0, numSecondaries=0, handling=0, value=0, aliases=[], weapons=[], modules=[], turrets=[], wiki="", upgradesApplied=[], nickname="", icon="", emoji=bbUtil.EMPTY_DUMBEMOJI, techLevel=-1, shopSpawnRate=0, builtIn=False):
@@ -100,6 +102,8 @@ class bbShip(bbItem):
 
         self.shopSpawnRate = shopSpawnRate
 
+        self.dirty = False
+
 
     def getNumWeaponsEquipped(self) -> int:
         """Fetch the number of weapons this ship currently has equipped
@@ -191,6 +195,7 @@ class bbShip(bbItem):
         if not self.canEquipMoreWeapons():
             raise OverflowError("Attempted to equip a weapon but all weapon slots are full")
         self.weapons.append(weapon)
+        self.dirty = True
     
 
     def unequipWeaponObj(self, weapon : bbWeapon):
@@ -199,6 +204,7 @@ class bbShip(bbItem):
         :param bbWeapon weapon: The weapon object to unequip 
         """
         self.weapons.remove(weapon)
+        self.dirty = True
 
 
     def unequipWeaponIndex(self, index : int):
@@ -207,6 +213,7 @@ class bbShip(bbItem):
         :param int index: The index of the weapon to unequip from the ship
         """
         self.weapons.pop(index)
+        self.dirty = True
 
 
     def getWeaponAtIndex(self, index : int) -> bbWeapon:
@@ -250,6 +257,7 @@ class bbShip(bbItem):
             raise ValueError("Attempted to equip a module of a type that is already at its maximum capacity: " + str(module))
 
         self.modules.append(module)
+        self.dirty = True
     
 
     def unequipModuleObj(self, module : bbModule):
@@ -258,6 +266,7 @@ class bbShip(bbItem):
         :param bbModule module: The module to unequip
         """
         self.modules.remove(module)
+        self.dirty = True
 
 
     def unequipModuleIndex(self, index : ind):
@@ -266,6 +275,7 @@ class bbShip(bbItem):
         :param int index: The index of the module to unequip
         """
         self.modules.pop(index)
+        self.dirty = True
 
 
     def getModuleAtIndex(self, index : int) -> bbModule:
@@ -287,6 +297,7 @@ class bbShip(bbItem):
         if not self.canEquipMoreTurrets():
             raise OverflowError("Attempted to equip a turret but all turret slots are full")
         self.turrets.append(turret)
+        self.dirty = True
     
 
     def unequipTurretObj(self, turret : bbTurret):
@@ -295,6 +306,7 @@ class bbShip(bbItem):
         :param bbTurret turret: The turret object to unequip 
         """
         self.turrets.remove(turret)
+        self.dirty = True
 
 
     def unequipTurretIndex(self, index : int):
@@ -303,6 +315,7 @@ class bbShip(bbItem):
         :param int index: The index of the turret to unequip from the ship
         """
         self.turrets.pop(index)
+        self.dirty = True
 
 
     def getTurretAtIndex(self, index : int) -> bbTurret:
@@ -533,6 +546,7 @@ class bbShip(bbItem):
         :param bbShipUpgrade upgrade: the upgrade to apply
         """
         self.upgradesApplied.append(upgrade)
+        self.dirty = True
 
     
     def changeNickname(self, nickname : str):
@@ -544,6 +558,7 @@ class bbShip(bbItem):
         self.nickname = nickname
         if nickname != "":
             self.hasNickname = True
+        self.dirty = True
 
     
     def removeNickname(self):
@@ -552,6 +567,7 @@ class bbShip(bbItem):
         if self.hasNickname:
             self.nickname = ""
             self.hasNickname = False
+            self.dirty = True
 
         
     def getNameOrNick(self) -> str:
@@ -598,6 +614,8 @@ class bbShip(bbItem):
         while self.hasTurretsEquipped() and other.canEquipMoreTurrets():
             other.equipTurret(self.turrets.pop(0))
 
+        self.dirty = True
+
 
     def getActivesByName(self, item : str) -> Union[bbWeapon.bbWeapon, bbModule.bbModule, bbTurret.bbTurret]:
         """Return a requested array of equipped items, specified by string name.
@@ -624,18 +642,21 @@ class bbShip(bbItem):
         """Delete all weapons equipped on the ship, without saving them.
         """
         self.weapons = []
+        self.dirty = True
 
 
     def clearModules(self):
         """Delete all modules equipped on the ship, without saving them.
         """
         self.modules = []
+        self.dirty = True
 
 
     def clearTurrets(self):
         """Delete all turrets equipped on the ship, without saving them.
         """
         self.turrets = []
+        self.dirty = True
 
 
     def statsStringShort(self) -> str:
@@ -776,32 +797,18 @@ def fromDict(shipDict : dict) -> bbShip:
     if shipDict["builtIn"]:
         builtInDict = bbData.builtInShipData[shipDict["name"]]
 
-        builtInWeapons = []
-        if "weapons" in shipDict:
-            for weapon in shipDict["weapons"]:
-                builtInWeapons.append(bbWeapon.fromDict(weapon))
-
-        builtInModules = []
-        if "modules" in shipDict:
-            for module in shipDict["modules"]:
-                builtInModules.append(bbModuleFactory.fromDict(module))
-
-        builtInTurrets = []
-        if "turrets" in shipDict:
-            for turret in shipDict["turrets"]:
-                builtInTurrets.append(bbTurret.fromDict(turret))
-
-        builtInShipUpgrades = []
-        if "shipUpgrades" in shipDict:
-            for shipUpgrade in shipDict["shipUpgrades"]:
-                builtInShipUpgrades.append(bbShipUpgrade.fromDict(shipUpgrade))
+        # builtIn ships share one emoji object per ship type
+        if shipDict["name"] in bbData.builtInShipEmojis:
+            emoji = bbData.builtInShipEmojis[shipDict["name"]]
+        else:
+            emoji = bbUtil.dumbEmojiFromStr(builtInDict["emoji"]) if "emoji" in builtInDict else bbUtil.EMPTY_DUMBEMOJI
 
         newShip = bbShip(builtInDict["name"], builtInDict["maxPrimaries"], builtInDict["maxTurrets"], builtInDict["maxModules"], manufacturer=builtInDict["manufacturer"] if "manufacturer" in builtInDict else "",
                     armour=builtInDict["armour"] if "armour" in builtInDict else 0, cargo=builtInDict["cargo"] if "cargo" in builtInDict else 0,
                     numSecondaries=builtInDict["numSecondaries"] if "numSecondaries" in builtInDict else 0, handling=builtInDict["handling"] if "handling" in builtInDict else 0,
                     value=builtInDict["value"] if "value" in builtInDict else 0, aliases=builtInDict["aliases"] if "aliases" in builtInDict else [],
-                    weapons=weapons if "weapons" in shipDict else builtInWeapons, modules=modules if "modules" in shipDict else builtInModules, turrets=turrets if "turrets" in shipDict else builtInTurrets, wiki=builtInDict["wiki"] if "wiki" in builtInDict else "0",
-                    upgradesApplied=shipUpgrades if "shipUpgrades" in shipDict else builtInShipUpgrades, nickname=shipDict["nickname"] if "nickname" in shipDict else (builtInDict["nickname"] if "nickname" in builtInDict else ""), icon=builtInDict["icon"] if "icon" in builtInDict else bbData.rocketIcon, emoji=bbUtil.dumbEmojiFromStr(builtInDict["emoji"]) if "emoji" in builtInDict else bbUtil.EMPTY_DUMBEMOJI, techLevel=builtInDict["techLevel"] if "techLevel" in builtInDict else -1, shopSpawnRate=builtInDict["shopSpawnRate"] if "shopSpawnRate" in builtInDict else 0,
+                    weapons=weapons, modules=modules, turrets=turrets, wiki=builtInDict["wiki"] if "wiki" in builtInDict else "0",
+                    upgradesApplied=shipUpgrades, nickname=shipDict["nickname"] if "nickname" in shipDict else (builtInDict["nickname"] if "nickname" in builtInDict else ""), icon=builtInDict["icon"] if "icon" in builtInDict else bbData.rocketIcon, emoji=emoji, techLevel=builtInDict["techLevel"] if "techLevel" in builtInDict else -1, shopSpawnRate=builtInDict["shopSpawnRate"] if "shopSpawnRate" in builtInDict else 0,
                     builtIn=True)
         return newShip
 
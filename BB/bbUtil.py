@@ -1,15 +1,18 @@
 # Typing imports
 from __future__ import annotations
-from typing import Union, List, Dict, TYPE_CHECKING
+from typing import Union, List, Dict, Iterable, Iterator, TYPE_CHECKING
 if TYPE_CHECKING:
     from .bbObjects.items import bbShip
-    from discord import PartialEmoji, Guild, User
+    from discord import PartialEmoji, Emoji, Guild, User
     from datetime import timedelta
     from .bbObjects import bbUser
 
 from .bbObjects.bounties import bbSystem
 
 import json
+import os
+import tempfile
+import asyncio
 import math
 import random
 import inspect
@@ -33,15 +36,132 @@ def readJSON(dbFile : str) -> dict:
 
 def writeJSON(dbFile : str, db : dict):
     """Write the given json-serializable dictionary to the given file path. All objects in the dictionary must be JSON-serializable.
-    TODO: Check this makes the file if it doesnt exist
+    The dictionary is first written to a temporary file in the same directory, which is then moved into place over dbFile.
+    This means that a crash mid-write will never leave a truncated file at dbFile.
 
     :param str dbFile: Path to the file which db should be written to
     :param dict db: The json-serializable dictionary to write
     """
     txt = json.dumps(db)
-    f = open(dbFile, "w")
-    txt = f.write(txt)
-    f.close()
+    dbDir, dbName = os.path.split(dbFile)
+    tempFD, tempPath = tempfile.mkstemp(prefix=dbName + ".", suffix=".tmp", dir=dbDir if dbDir != "" else ".")
+    try:
+        with os.fdopen(tempFD, "w") as f:
+            f.write(txt)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tempPath, dbFile)
+    except BaseException:
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+        raise
+
+
+async def writeJSONAsync(dbFile : str, db : dict):
+    """Write the given json-serializable dictionary to the given file path, in the event loop's default worker thread pool.
+    JSON encoding and file writing both happen in the worker thread, so db must not be mutated until this coroutine has completed.
+    As with writeJSON, the file is written atomically.
+
+    :param str dbFile: Path to the file which db should be written to
+    :param dict db: The json-serializable dictionary to write
+    """
+    await asyncio.get_event_loop().run_in_executor(None, writeJSON, dbFile, db)
+
+
+def emptyFile(filePath : str):
+    """Truncate the file with the given path to zero length, if it exists. If it does not exist, nothing happens.
+
+    :param str filePath: Path to the file to empty
+    """
+    if os.path.exists(filePath):
+        open(filePath, "w").close()
+
+
+def iterJSONLines(dbFile : str) -> Iterator[dict]:
+    """Read the JSON lines file with the given path one line at a time, where each line of the file is a separate JSON object.
+    Only one line of the file is held in memory at a time.
+    Lines that cannot be decoded, for example a final line that was only partially written before a crash, are logged and skipped.
+
+    :param str dbFile: Path to the file to read
+    :return: An iterator over the JSON objects in the file, parsed into python dictionaries, in file order
+    :rtype: Iterator[dict]
+    """
+    with open(dbFile, "r") as f:
+        for lineNum, line in enumerate(f):
+            if line.strip() == "":
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                bbLogger.log("bbUtil", "readJSONLines", "Skipped undecodable line " + str(lineNum + 1) + " of " + dbFile, eventType="JSONL_DECODE")
+
+
+def readJSONLines(dbFile : str) -> List[dict]:
+    """Read the JSON lines file with the given path, where each line of the file is a separate JSON object.
+    Lines that cannot be decoded, for example a final line that was only partially written before a crash, are logged and skipped.
+
+    :param str dbFile: Path to the file to read
+    :return: A list of the JSON objects in the file, parsed into python dictionaries, in file order
+    :rtype: list[dict]
+    """
+    return list(iterJSONLines(dbFile))
+
+
+def appendJSONLines(dbFile : str, records : List[dict]):
+    """Append the given json-serializable dictionaries to the given file, one per line.
+    The file is created if it does not exist, and flushed to disk before returning.
+
+    :param str dbFile: Path to the file which records should be appended to
+    :param list[dict] records: The json-serializable dictionaries to append
+    """
+    txt = "".join(json.dumps(record) + "\n" for record in records)
+    with open(dbFile, "a") as f:
+        f.write(txt)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def writeJSONLines(dbFile : str, records : Iterable[dict]):
+    """Write the given json-serializable dictionaries over the given file, one per line.
+    Records are encoded one at a time as they are written, so the encoded file is never held in memory all at once.
+    As with writeJSON, the file is replaced atomically, so a crash mid-write will never leave a truncated file at dbFile.
+
+    :param str dbFile: Path to the file which records should be written to
+    :param Iterable[dict] records: The json-serializable dictionaries to write
+    """
+    dbDir, dbName = os.path.split(dbFile)
+    tempFD, tempPath = tempfile.mkstemp(prefix=dbName + ".", suffix=".tmp", dir=dbDir if dbDir != "" else ".")
+    try:
+        with os.fdopen(tempFD, "w") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tempPath, dbFile)
+    except BaseException:
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+        raise
+
+
+async def appendJSONLinesAsync(dbFile : str, records : List[dict]):
+    """Append the given json-serializable dictionaries to the given file, one per line, in the event loop's default worker thread pool.
+    records must not be mutated until this coroutine has completed.
+
+    :param str dbFile: Path to the file which records should be appended to
+    :param list[dict] records: The json-serializable dictionaries to append
+    """
+    await asyncio.get_event_loop().run_in_executor(None, appendJSONLines, dbFile, records)
+
+
+async def writeJSONLinesAsync(dbFile : str, records : List[dict]):
+    """Write the given json-serializable dictionaries over the given file, one per line, in the event loop's default worker thread pool.
+    As with writeJSONLines, the file is replaced atomically. records must not be mutated until this coroutine has completed.
+
+    :param str dbFile: Path to the file which records should be written to
+    :param list[dict] records: The json-serializable dictionaries to write
+    """
+    await asyncio.get_event_loop().run_in_executor(None, writeJSONLines, dbFile, records)
 
 
 class AStarNode(bbSystem.System):
@@ -481,6 +601,19 @@ def dumbEmojiFromPartial(e : PartialEmoji) -> dumbEmoji:
         return dumbEmoji(id=e.id)
 
 
+def dumbEmojiFromReaction(e : Union[str, Emoji, PartialEmoji]) -> dumbEmoji:
+    """Construct a new dumbEmoji object from the emoji of a discord.Reaction, which may be a unicode str, a discord.Emoji or a discord.PartialEmoji.
+
+    :return: A dumbEmoji representing e
+    :rtype: dumbEmoji
+    """
+    if type(e) == str:
+        return dumbEmoji(unicode=e)
+    if getattr(e, "id", None) is None:
+        return dumbEmoji(unicode=e.name)
+    return dumbEmoji(id=e.id)
+
+
 def td_format_noYM(td_object : timedelta) -> str:
     """Create a string describing the attributes of a given datetime.timedelta object, in a
     human reader-friendly format.
@@ -1,6 +1,6 @@
 # Typing imports
 from __future__ import annotations
-from typing import List, Dict, Union
+from typing import List, Dict, Union, Tuple, Set
 
 # Discord Imports
 
@@ -17,6 +17,10 @@ import operator
 # used for spawning items from dict in dev_cmd_give
 import json
 import traceback
+# used for measuring save snapshot times
+import time
+# used for building retryable message sends
+import functools
 from os import path
 from aiohttp import client_exceptions
 
@@ -24,29 +28,42 @@ from aiohttp import client_exceptions
 
 # may replace these imports with a from . import * at some point
 from .bbConfig import bbConfig, bbData, bbPRIVATE
-from .bbObjects import bbUser, bbInventory
+from .bbObjects import bbUser, bbInventory, bbBuiltIns
 from .bbObjects.bounties import bbBounty, bbBountyConfig, bbCriminal, bbSystem
+from .bbObjects.bounties.bountyBoards import BountyBoardSync
 from .bbObjects.items import bbShip, bbModuleFactory, bbShipUpgrade, bbTurret, bbWeapon
 from .bbObjects.battles import ShipFight, DuelRequest
 from .scheduling import TimedTask
-from .bbDatabases import bbBountyDB, bbGuildDB, bbUserDB, HeirarchicalCommandsDB, reactionMenuDB
-from .scheduling import TimedTaskHeap
+from .bbDatabases import bbBountyDB, bbGuildDB, bbUserDB, HeirarchicalCommandsDB, reactionMenuDB, bbEconomyJournal, bbSQLiteDB, bbUserDBLoader, bbUserDBShards, bbUserDBBinary
+from .scheduling import TimedTaskScheduler
 from . import bbUtil, bbGlobals
 from .userAlerts import UserAlerts
 from .logging import bbLogger
 from .reactionMenus import ReactionMenu, ReactionInventoryPicker, ReactionRolePicker, ReactionDuelChallengeMenu, ReactionPollMenu
+from .messaging import FanOut, OutboundQueue, CheckDigest
 
 
 ####### DATABASE METHODS #######
 
 
-def loadUsersDB(filePath : str) -> bbUserDB.bbUserDB:
+def loadUsersDB(filePath : str, journalPath="", numProcesses=0) -> bbUserDB.bbUserDB:
     """Build a bbUserDB from the specified JSON file.
+    If a users journal is given and exists, the changes recorded in the journal are merged on top of the file's contents.
+    Saves in the newline-delimited JSON and binary formats are streamed from file, building one user at a time.
+    Newline-delimited JSON saves may also be decoded and validated by a pool of worker processes, while users are built in this process.
 
     :param str filePath: path to the JSON file to load. Theoretically, this can be absolute or relative.
+    :param str journalPath: path to the JSON lines users journal to merge on top of the file at filePath. Give "" to skip the journal. (Default "")
+    :param int numProcesses: The number of worker processes to read newline-delimited JSON saves with. Give 0 to read in this process. (Default 0)
     :return: a bbUserDB as described by the dictionary-serialized representation stored in the file located in filePath.
     """
-    return bbUserDB.fromDict(bbUtil.readJSON(filePath))
+    journalRecords = bbUtil.readJSONLines(journalPath) if journalPath != "" and path.exists(journalPath) else []
+    if bbUserDBBinary.isBinarySave(filePath):
+        return bbUserDB.fromNDJSONRecords(bbUserDBBinary.iterBinarySave(filePath), journalRecords=journalRecords)
+    if bbUserDB.isNDJSONSave(filePath):
+        records = bbUserDBLoader.iterNDJSONRecordsParallel(filePath, numProcesses) if numProcesses > 0 else bbUtil.iterJSONLines(filePath)
+        return bbUserDB.fromNDJSONRecords(records, journalRecords=journalRecords)
+    return bbUserDB.fromDict(bbUserDB.applyJournal(bbUtil.readJSON(filePath), journalRecords))
 
 
 def loadGuildsDB(filePath : str) -> bbGuildDB.bbGuildDB:
@@ -187,9 +204,19 @@ async def makeBountyBoardChannelMessage(guild : bbGuild.bbGuild, bounty : bbBoun
     if not guild.hasBountyBoardChannel:
         raise ValueError("The requested bbGuild has no bountyBoardChannel")
     bountyListing = await guild.bountyBoardChannel.channel.send(msg, embed=embed)
+    await addBountyBoardChannelListing(guild, bounty, bountyListing)
+    return bountyListing
+
+
+async def addBountyBoardChannelListing(guild : bbGuild.bbGuild, bounty : bbBounty.Bounty, bountyListing : Message):
+    """Record an already sent message as guild's BountyBoardChannel listing for the given bounty, and fill it with the bounty's details.
+
+    :param bbGuild guild: The guild owning the BountyBoardChannel that bountyListing was sent in
+    :param bbBounty.Bounty bounty: The bounty that bountyListing lists
+    :param discord.Message bountyListing: The listing message
+    """
     await guild.bountyBoardChannel.addBounty(bounty, bountyListing)
     await guild.bountyBoardChannel.updateBountyMessage(bounty)
-    return bountyListing
 
 
 async def removeBountyBoardChannelMessage(guild : bbGuild.bbGuild, bounty : bbBounty.Bounty):
@@ -219,6 +246,16 @@ async def removeBountyBoardChannelMessage(guild : bbGuild.bbGuild, bounty : bbBo
         raise KeyError("The requested bbGuild (" + str(guild.id) + ") does not have a BountyBoardChannel listing for the given bounty: " + bounty.criminal.name)
 
 
+async def initBountyBoardChannel(guild : bbGuild.bbGuild, semaphore : asyncio.Semaphore):
+    """Initialise guild's BountyBoardChannel, once the given semaphore allows it.
+
+    :param bbGuild guild: The guild whose BBC should be initialised. Must own a BountyBoardChannel.
+    :param asyncio.Semaphore semaphore: Limits the number of BBCs initialising at once
+    """
+    async with semaphore:
+        await guild.bountyBoardChannel.init(bbGlobals.client, bbData.bountyFactions)
+
+
 async def announceNewBounty(newBounty : bbBounty.Bounty):
     """Announce the creation of a new bounty across all joined servers
     Messages will be sent to the announceChannels of all guilds in the bbGlobals.guildsDB, if they have one
@@ -237,39 +274,71 @@ async def announceNewBounty(newBounty : bbBounty.Bounty):
     msg = "A new bounty is now available from **" + \
         newBounty.faction.title() + "** central command:"
 
-    # Loop over all guilds in the database
+    # Build a job for every guild with somewhere to announce to
+    announceJobs = []
     for currentGuild in bbGlobals.guildsDB.getGuilds():
-        if currentGuild.hasBountyBoardChannel:
-            try:
-                if currentGuild.hasUserAlertRoleID("bounties_new"):
-                    msg = "<@&" + \
-                        str(currentGuild.getUserAlertRoleID(
-                            "bounties_new")) + "> " + msg
-                # announce to the given channel
-                await makeBountyBoardChannelMessage(currentGuild, newBounty, msg)
+        guildMsg = ("<@&" + str(currentGuild.getUserAlertRoleID("bounties_new")) + "> " + msg) if currentGuild.hasUserAlertRoleID("bounties_new") else msg
+        guildObj = bbGlobals.client.get_guild(currentGuild.id)
+        guildLabel = ("unknown guild" if guildObj is None else guildObj.name) + "#" + str(currentGuild.id)
 
-            except discord.Forbidden:
-                bbLogger.log("Main", "anncBnty", "Failed to post BBCh listing to guild " + bbGlobals.client.get_guild(
-                    currentGuild.id).name + "#" + str(currentGuild.id) + " in channel " + currentGuild.bountyBoardChannel.channel.name + "#" + str(currentGuild.bountyBoardChannel.channel.id), category="bountyBoards", eventType="BBC_NW_FRBDN")
+        if currentGuild.hasBountyBoardChannel:
+            # BBC listings are filled in by addBountyBoardChannelListing once sent, so the listing itself can be safely retried
+            bbcChannel = currentGuild.bountyBoardChannel.channel
+            announceJobs.append(FanOut.FanOutJob(guildLabel + " BBC", bbcChannel.id, functools.partial(bbcChannel.send, guildMsg),
+                                                    followUp=functools.partial(addBountyBoardChannelListing, currentGuild, newBounty)))
 
         # If the guild has an announceChannel
         elif currentGuild.hasAnnounceChannel():
             # ensure the announceChannel is valid
-            currentChannel = bbGlobals.client.get_channel(
-                currentGuild.getAnnounceChannelId())
+            currentChannel = bbGlobals.client.get_channel(currentGuild.getAnnounceChannelId())
             if currentChannel is not None:
-                try:
-                    if currentGuild.hasUserAlertRoleID("bounties_new"):
-                        # announce to the given channel
-                        await currentChannel.send("<@&" + str(currentGuild.getUserAlertRoleID("bounties_new")) + "> " + msg, embed=bountyEmbed)
-                    else:
-                        await currentChannel.send(msg, embed=bountyEmbed)
-                except discord.Forbidden:
-                    bbLogger.log("Main", "anncBnty", "Failed to post announce-channel bounty listing to guild " + bbGlobals.client.get_guild(
-                        currentGuild.id).name + "#" + str(currentGuild.id) + " in channel " + currentChannel.name + "#" + str(currentChannel.id), eventType="ANNCCH_SND_FRBDN")
+                announceJobs.append(FanOut.FanOutJob(guildLabel + " announce channel", currentChannel.id, functools.partial(currentChannel.send, guildMsg, embed=bountyEmbed)))
 
             # TODO: may wish to add handling for invalid announceChannels - e.g remove them from the bbGuild object
 
+    # Announce to all guilds concurrently, and log all failures together
+    report = await bbGlobals.messageFanOut.send(announceJobs)
+    bbLogger.log("Main", "anncBnty", "Announced new bounty for " + newBounty.criminal.name + ". " + str(report), category="newBounties",
+                    eventType="ANNC_FANOUT_ERR" if report.failures else "ANNC_FANOUT", noPrint=not report.failures)
+
+
+def makeBountyWonFields(rewards : Dict[int, Dict[str, Union[int, bool]]], winningUserId : int) -> List[Tuple[int, str, str]]:
+    """Build the text of the fields of a bounty won announcement, without the names of the contributing users.
+    The winning user's field is first, followed by the other contributing users in the order of rewards.
+
+    :param dict rewards: the rewards dictionary as defined by bbBounty.calculateRewards
+    :param int winningUserId: the user ID of the discord user that won the bounty
+    :return: The user ID, field name, and the end of the field value following the user's name, for each contributing user
+    :rtype: list[tuple[int, str, str]]
+    """
+    fields = []
+    # The index of the current user in the embed
+    place = 1
+    for userID in [winningUserId] + [userID for userID in rewards if not rewards[userID]["won"]]:
+        checked = int(rewards[userID]["checked"])
+        fields.append((userID, str(place) + ". " + ("🏆 " if place == 1 else "") + str(rewards[userID]["reward"]) + " credits:",
+                        " checked " + str(checked) + " system" + ("s" if checked != 1 else "")))
+        place += 1
+    return fields
+
+
+def makeBountyWonEmbed(bounty : bbBounty.Bounty, rewardFields : List[Tuple[int, str, str]], userNames : Dict[int, str], mentionIDs : Set[int]) -> discord.Embed:
+    """Build the embed announcing the completion of a bounty to a guild.
+    Contributing users who are members of the guild are mentioned, and all other contributing users are named.
+
+    :param bbBounty bounty: the bounty to announce
+    :param list rewardFields: The fields of the embed, as given by makeBountyWonFields
+    :param dict[int, str] userNames: The name and discriminator of every contributing user, by user ID
+    :param set[int] mentionIDs: The IDs of the contributing users to mention
+    :return: The announcement embed
+    :rtype: discord.Embed
+    """
+    rewardsEmbed = makeEmbed(titleTxt="Bounty Complete!", authorName=criminalNameOrDiscrim(bounty.criminal) + " Arrested",
+                                icon=bounty.criminal.icon, col=bbData.factionColours[bounty.faction], desc="`Suspect located in '" + bounty.answer + "'`")
+    for userID, fieldName, checkedStr in rewardFields:
+        rewardsEmbed.add_field(name=fieldName, value=("<@" + str(userID) + ">" if userID in mentionIDs else userNames[userID]) + checkedStr, inline=False)
+    return rewardsEmbed
+
 
 async def announceBountyWon(bounty : bbBounty.Bounty, rewards : Dict[int, Dict[str, Union[int, bool]]], winningGuildObj : discord.Guild, winningUserId : int):
     """Announce the completion of a bounty across all joined servers
@@ -280,69 +349,59 @@ async def announceBountyWon(bounty : bbBounty.Bounty, rewards : Dict[int, Dict[s
     :param discord.Guild winningGuildObj: the discord Guild object of the guild containing the winning user
     :param int winningUserId: the user ID of the discord user that won the bounty
     """
+    # Build the text of the announcement and look up the contributing users' names once, rather than for every guild
+    rewardFields = makeBountyWonFields(rewards, winningUserId)
+    userNames = {userID: str(bbGlobals.client.get_user(userID)) for userID in rewards}
+    # Guilds containing the same contributing users share an embed. Most guilds contain none of them.
+    rewardsEmbeds = {}
+
     # Loop over all guilds in the database that have playChannels
     for currentGuild in bbGlobals.guildsDB.getGuilds():
-        if bbGlobals.client.get_guild(currentGuild.id) is not None:
+        currentDCGuild = bbGlobals.client.get_guild(currentGuild.id)
+        if currentDCGuild is not None:
             if currentGuild.hasPlayChannel():
-                # Create the announcement embed
-                rewardsEmbed = makeEmbed(titleTxt="Bounty Complete!", authorName=criminalNameOrDiscrim(bounty.criminal) + " Arrested",
-                                         icon=bounty.criminal.icon, col=bbData.factionColours[bounty.faction], desc="`Suspect located in '" + bounty.answer + "'`")
-
-                # Add the winning user to the embed
-                # If the winning user is not in the current guild, use the user's name and discriminator
-                if bbGlobals.client.get_guild(currentGuild.id).get_member(winningUserId) is None:
-                    rewardsEmbed.add_field(name="1. 🏆 " + str(rewards[winningUserId]["reward"]) + " credits:", value=str(bbGlobals.client.get_user(winningUserId)) + " checked " + str(
-                        int(rewards[winningUserId]["checked"])) + " system" + ("s" if int(rewards[winningUserId]["checked"]) != 1 else ""), inline=False)
-                # If the winning user is in the current guild, use the user's mention
-                else:
-                    rewardsEmbed.add_field(name="1. 🏆 " + str(rewards[winningUserId]["reward"]) + " credits:", value="<@" + str(winningUserId) + "> checked " + str(
-                        int(rewards[winningUserId]["checked"])) + " system" + ("s" if int(rewards[winningUserId]["checked"]) != 1 else ""), inline=False)
-
-                # The index of the current user in the embed
-                place = 2
-                # Loop over all non-winning users in the rewards dictionary
-                for userID in rewards:
-                    if not rewards[userID]["won"]:
-                        # If the current user is not in the current guild, use the user's name and discriminator
-                        if bbGlobals.client.get_guild(currentGuild.id).get_member(userID) is None:
-                            rewardsEmbed.add_field(name=str(place) + ". " + str(rewards[userID]["reward"]) + " credits:", value=str(bbGlobals.client.get_user(
-                                userID)) + " checked " + str(int(rewards[userID]["checked"])) + " system" + ("s" if int(rewards[userID]["checked"]) != 1 else ""), inline=False)
-                        # Otherwise, use the user's mention
-                        else:
-                            rewardsEmbed.add_field(name=str(place) + ". " + str(rewards[userID]["reward"]) + " credits:", value="<@" + str(userID) + "> checked " + str(
-                                int(rewards[userID]["checked"])) + " system" + ("s" if int(rewards[userID]["checked"]) != 1 else ""), inline=False)
-                        place += 1
+                # Mention the contributing users who are in the current guild, and use the name and discriminator of everyone else
+                mentionIDs = frozenset(userID for userID in rewards if currentDCGuild.get_member(userID) is not None)
+                if mentionIDs not in rewardsEmbeds:
+                    rewardsEmbeds[mentionIDs] = makeBountyWonEmbed(bounty, rewardFields, userNames, mentionIDs)
+                rewardsEmbed = rewardsEmbeds[mentionIDs]
 
                 # Send the announcement to the current guild's playChannel
                 # If this is the winning guild, send a special message!
-                if bbGlobals.client.get_channel(currentGuild.getPlayChannelId()) is not None:
+                playCh = bbGlobals.client.get_channel(currentGuild.getPlayChannelId())
+                if playCh is not None:
                     if currentGuild.id == winningGuildObj.id:
-                        await bbGlobals.client.get_channel(currentGuild.getPlayChannelId()).send(":trophy: **You win!**\n**" + winningGuildObj.get_member(winningUserId).display_name + "** located and EMP'd **" + bounty.criminal.name + "**, who has been arrested by local security forces. :chains:", embed=rewardsEmbed)
+                        await bbGlobals.outboundQueue.post(playCh, ":trophy: **You win!**\n**" + winningGuildObj.get_member(winningUserId).display_name + "** located and EMP'd **" + bounty.criminal.name + "**, who has been arrested by local security forces. :chains:", embed=rewardsEmbed)
                     else:
-                        await bbGlobals.client.get_channel(currentGuild.getPlayChannelId()).send(":trophy: Another server has located **" + bounty.criminal.name + "**!", embed=rewardsEmbed)
+                        await bbGlobals.outboundQueue.post(playCh, ":trophy: Another server has located **" + bounty.criminal.name + "**!", embed=rewardsEmbed)
 
                 else:
-                    bbLogger.log("Main", "AnncBtyWn", "None playchannel received when posting bounty won to guild " + bbGlobals.client.get_guild(
-                        currentGuild.id).name + "#" + str(currentGuild.id) + " in channel ?#" + str(currentGuild.getPlayChannelId()), eventType="PLCH_NONE")
+                    bbLogger.log("Main", "AnncBtyWn", "None playchannel received when posting bounty won to guild " + currentDCGuild.name + "#" + str(currentGuild.id)
+                                    + " in channel ?#" + str(currentGuild.getPlayChannelId()), eventType="PLCH_NONE")
 
 
 async def updateAllBountyBoardChannels(bounty : bbBounty.Bounty, bountyComplete=False):
     """Update BBC listings for the given bounty across all joined servers.
+    Missing listings are created, and the listings of completed bounties are removed, immediately.
+    Existing listings are edited later by bbGlobals.bountyBoardSync, together with any other changes made to the bounty in the meantime.
 
     :param bbBounty bounty: The bounty whose listings should be updated
     :param bool bountyComplete: Whether or not the bounty has now been completed. When True, bounty listings will be removed rather than updated. (Default False)
     """
     newBountyMsg = "A new bounty is now available from **" + \
         bounty.faction.title() + "** central command:"
+    # Completed bounties are removed from listings straight away, so there is no need to edit them first
+    if bountyComplete:
+        bbGlobals.bountyBoardSync.discardBounty(bounty)
     for guild in bbGlobals.guildsDB.getGuilds():
         if guild.hasBountyBoardChannel:
             if bountyComplete and guild.bountyBoardChannel.hasMessageForBounty(bounty):
                 await removeBountyBoardChannelMessage(guild, bounty)
-            else:
-                if not guild.bountyBoardChannel.hasMessageForBounty(bounty):
-                    await makeBountyBoardChannelMessage(guild, bounty, newBountyMsg)
-                else:
-                    await guild.bountyBoardChannel.updateBountyMessage(bounty)
+            elif not guild.bountyBoardChannel.hasMessageForBounty(bounty):
+                await makeBountyBoardChannelMessage(guild, bounty, newBountyMsg)
+    # Edits to existing listings are batched, and made at most once per bbcEditIntervalSeconds
+    if not bountyComplete:
+        bbGlobals.bountyBoardSync.markDirty(bounty)
 
 
 async def announceNewShopStock(guildID=-1):
@@ -360,15 +419,12 @@ async def announceNewShopStock(guildID=-1):
                 if playCh is not None:
                     msg = "The shop stock has been refreshed!\n**        **Now at tech level: **" + \
                         str(guild.shop.currentTechLevel) + "**"
-                    try:
-                        if guild.hasUserAlertRoleID("shop_refresh"):
-                            # announce to the given channel
-                            await playCh.send(":arrows_counterclockwise: <@&" + str(guild.getUserAlertRoleID("shop_refresh")) + "> " + msg)
-                        else:
-                            await playCh.send(":arrows_counterclockwise: " + msg)
-                    except discord.Forbidden:
-                        bbLogger.log("Main", "anncNwShp", "Failed to post shop stock announcement to guild " + bbGlobals.client.get_guild(
-                            guild.id).name + "#" + str(guild.id) + " in channel " + playCh.name + "#" + str(playCh.id), category="shop", eventType="PLCH_SND_FRBDN")
+                    # Queue the announcement without waiting for it, so that every guild's announcement is sent concurrently. Failures are logged by the queue.
+                    if guild.hasUserAlertRoleID("shop_refresh"):
+                        # announce to the given channel
+                        await bbGlobals.outboundQueue.post(playCh, ":arrows_counterclockwise: <@&" + str(guild.getUserAlertRoleID("shop_refresh")) + "> " + msg)
+                    else:
+                        await bbGlobals.outboundQueue.post(playCh, ":arrows_counterclockwise: " + msg)
     else:
         guild = bbGlobals.guildsDB.getGuild(guildID)
         # ensure guild has a valid playChannel
@@ -380,9 +436,9 @@ async def announceNewShopStock(guildID=-1):
                 try:
                     if guild.hasUserAlertRoleID("shop_refresh"):
                         # announce to the given channel
-                        await playCh.send(":arrows_counterclockwise: <@&" + str(guild.getUserAlertRoleID("shop_refresh")) + "> " + msg)
+                        await bbGlobals.outboundQueue.send(playCh, ":arrows_counterclockwise: <@&" + str(guild.getUserAlertRoleID("shop_refresh")) + "> " + msg)
                     else:
-                        await playCh.send(":arrows_counterclockwise: " + msg)
+                        await bbGlobals.outboundQueue.send(playCh, ":arrows_counterclockwise: " + msg)
                 except discord.Forbidden:
                     bbLogger.log("Main", "anncNwShp", "Failed to post shop stock announcement to guild " + bbGlobals.client.get_guild(
                         guild.id).name + "#" + str(guild.id) + " in channel " + playCh.name + "#" + str(playCh.id), category="shop", eventType="PLCH_NONE")
@@ -517,20 +573,151 @@ async def spawnAndAnnounceRandomBounty():
         await announceNewBounty(newBounty)
 
 
-def saveAllDBs():
+def writeFullUsersSave(usersSave : Union[dict, List[dict]]):
+    """Write a full save of the users database over bbConfig.userDBPath, and then empty the users journal, since the save includes every change in it.
+    This blocks until both are done, so should be run in a worker thread. The journal is only emptied if the save was written successfully.
+
+    :param usersSave: A snapshot of the users database, serialized with toNDJSONRecords if bbConfig.userDBFormat is "ndjson" or "binary", or toDict otherwise
+    :type usersSave: dict or list[dict]
+    """
+    if bbConfig.userDBFormat == "binary":
+        bbUserDBBinary.writeBinarySave(bbConfig.userDBPath, usersSave)
+    elif bbConfig.userDBFormat == "ndjson":
+        bbUtil.writeJSONLines(bbConfig.userDBPath, usersSave)
+    else:
+        bbUtil.writeJSON(bbConfig.userDBPath, usersSave)
+    bbUtil.emptyFile(bbConfig.userDBJournalPath)
+
+
+async def saveUsersDB(usersSave : Union[dict, List[dict]], fullSave : bool):
+    """Write a save of the users database, as prepared by saveAllDBs, to file in a worker thread.
+    Full saves are written over bbConfig.userDBPath, after which the users journal is emptied.
+    Incremental saves are appended to the users journal at bbConfig.userDBJournalPath.
+    If writing fails, the next save of the users database is forced to be a full save.
+
+    :param usersSave: A snapshot of the users database if fullSave is True - serialized with toNDJSONRecords if bbConfig.userDBFormat is "ndjson" or "binary", or toDict otherwise - or a list of journal records if fullSave is False
+    :type usersSave: dict or list[dict]
+    :param bool fullSave: Whether usersSave is a full snapshot or a list of journal records
+    """
+    try:
+        if fullSave:
+            await asyncio.get_event_loop().run_in_executor(None, writeFullUsersSave, usersSave)
+        elif len(usersSave) > 0:
+            await bbUtil.appendJSONLinesAsync(bbConfig.userDBJournalPath, usersSave)
+    except Exception:
+        bbGlobals.usersDB.fullSaveRequired = True
+        raise
+
+
+async def saveUserShards(shardSaves : Dict[int, List[dict]], usersSaveGeneration : int, fullSave : bool):
+    """Write the changed shards of the users database, as prepared by saveAllDBs, to bbConfig.userDBShardDir in worker threads.
+    After a full save, the users journal is emptied. If writing fails, the next save of the users database is forced to rewrite every shard.
+
+    :param dict[int, list[dict]] shardSaves: The shards to write, as given by bbUserDBShards.buildShardSaves
+    :param int usersSaveGeneration: The saveGeneration of the users database save
+    :param bool fullSave: Whether shardSaves contains every shard of the database
+    """
+    try:
+        await bbUserDBShards.writeShardsAsync(bbConfig.userDBShardDir, bbConfig.userDBShardCount, usersSaveGeneration, shardSaves)
+        # The shards include every change in the journal
+        if fullSave:
+            await asyncio.get_event_loop().run_in_executor(None, bbUtil.emptyFile, bbConfig.userDBJournalPath)
+    except Exception:
+        bbGlobals.usersDB.fullSaveRequired = True
+        raise
+
+
+async def saveSQLiteStore(userRecords : List[dict], removedIDs : List[int], usersSaveGeneration : int, guildsDict : dict, bountiesDict : dict):
+    """Write a save of the users, guilds and bounties databases, as prepared by saveAllDBs, to bbGlobals.sqliteStore in a worker thread.
+    If writing fails, the next save of the users database is forced to rewrite every user, and removedIDs are recorded as removed again
+    so that the next save still deletes them. Users added back with the same ID since the save began are not recorded as removed.
+
+    :param list[dict] userRecords: Records of changed and removed users, as given by bbUserDB.toJournalRecords
+    :param list[int] removedIDs: The IDs of the users removed by this save, as given by bbUserDB.startSave
+    :param int usersSaveGeneration: The saveGeneration of the users database save
+    :param dict guildsDict: The guilds database serialized with toDict
+    :param dict bountiesDict: The bounties database serialized with toDict
+    """
+    try:
+        await bbGlobals.sqliteStore.writeSaveAsync(userRecords, usersSaveGeneration, guildsDict, bountiesDict)
+    except Exception:
+        bbGlobals.usersDB.fullSaveRequired = True
+        # A full save only rewrites the users still in the database, so it would not delete these
+        bbGlobals.usersDB.removedUserIDs.update(id for id in removedIDs if not bbGlobals.usersDB.userIDExists(id))
+        raise
+
+
+async def saveAllDBs():
     """Save all of the bot's savedata to file.
     This currently saves:
     - the users database
     - the bounties database
     - the guilds database
     - the reaction menus database
+
+    A snapshot of each database is taken with its toDict method on the event loop. The snapshots are then
+    JSON encoded and written to file in worker threads, so the bot is only blocked for the duration of the snapshot.
+    The time the event loop was blocked for is recorded in bbGlobals.lastSaveLoopBlockedSeconds.
+
+    If bbConfig.databaseBackend is "sqlite", the users, guilds and bounties databases are written to bbGlobals.sqliteStore
+    in a single transaction, rewriting only the rows of users that have changed since the last save.
+    If bbConfig.lazyUserLoading is also enabled, least recently used users are then evicted from memory.
+    Otherwise, if bbConfig.userDBSaveMode is "incremental", only the users that have changed since the last save are
+    serialized and appended to the users journal, with a full snapshot of the users database taken every bbConfig.userDBSnapshotPeriod saves.
+    If bbConfig.userDBSaveMode is "sharded", only the shards of the users database containing changed users are serialized and rewritten.
+    Once the users database has been written, all economy journal entries included in the save are compacted out of the economy journal.
     """
-    saveDB(bbConfig.userDBPath, bbGlobals.usersDB)
-    saveDB(bbConfig.bountyDBPath, bbGlobals.bountiesDB)
-    saveDB(bbConfig.guildDBPath, bbGlobals.guildsDB)
-    saveDB(bbConfig.reactionMenusDBPath, bbGlobals.reactionMenusDB)
+    if bbGlobals.dbSaveLock is None:
+        bbGlobals.dbSaveLock = asyncio.Lock()
+
+    async with bbGlobals.dbSaveLock:
+        snapshotStart = time.perf_counter()
+        dirtyIDs, removedIDs = bbGlobals.usersDB.startSave()
+        usersSaveGeneration = bbGlobals.usersDB.saveGeneration
+
+        if bbConfig.databaseBackend == "sqlite":
+            # Users are stored in separate rows, so a full save just rewrites every user's row
+            fullUsersSave = bbGlobals.usersDB.fullSaveRequired
+            bbGlobals.usersDB.fullSaveRequired = False
+            usersSave = bbGlobals.usersDB.toJournalRecords(bbGlobals.usersDB.getLoadedIds() if fullUsersSave else dirtyIDs, removedIDs, includeStats=True)
+            storeSave = saveSQLiteStore(usersSave, removedIDs, usersSaveGeneration, bbGlobals.guildsDB.toDict(), bbGlobals.bountiesDB.toDict())
+            snapshots = {bbConfig.reactionMenusDBPath: bbGlobals.reactionMenusDB.toDict()}
+        elif bbConfig.userDBSaveMode == "sharded":
+            fullUsersSave = bbGlobals.usersDB.fullSaveRequired
+            bbGlobals.usersDB.fullSaveRequired = False
+            usersSave = bbUserDBShards.buildShardSaves(bbGlobals.usersDB, dirtyIDs, removedIDs, bbConfig.userDBShardCount, fullUsersSave)
+            storeSave = saveUserShards(usersSave, usersSaveGeneration, fullUsersSave)
+            snapshots = {bbConfig.bountyDBPath: bbGlobals.bountiesDB.toDict(),
+                            bbConfig.guildDBPath: bbGlobals.guildsDB.toDict(),
+                            bbConfig.reactionMenusDBPath: bbGlobals.reactionMenusDB.toDict()}
+        else:
+            fullUsersSave = bbConfig.userDBSaveMode != "incremental" or bbGlobals.usersDB.fullSaveRequired \
+                            or bbGlobals.usersDB.saveGeneration % bbConfig.userDBSnapshotPeriod == 0
+            if fullUsersSave:
+                bbGlobals.usersDB.fullSaveRequired = False
+                usersSave = bbGlobals.usersDB.toNDJSONRecords() if bbConfig.userDBFormat in ["ndjson", "binary"] else bbGlobals.usersDB.toDict()
+            else:
+                usersSave = bbGlobals.usersDB.toJournalRecords(dirtyIDs, removedIDs)
+            storeSave = saveUsersDB(usersSave, fullUsersSave)
+            snapshots = {bbConfig.bountyDBPath: bbGlobals.bountiesDB.toDict(),
+                            bbConfig.guildDBPath: bbGlobals.guildsDB.toDict(),
+                            bbConfig.reactionMenusDBPath: bbGlobals.reactionMenusDB.toDict()}
+        bbGlobals.lastSaveLoopBlockedSeconds = time.perf_counter() - snapshotStart
+        bbGlobals.maxSaveLoopBlockedSeconds = max(bbGlobals.maxSaveLoopBlockedSeconds, bbGlobals.lastSaveLoopBlockedSeconds)
+
+        await asyncio.gather(storeSave, *(bbUtil.writeJSONAsync(dbPath, snapshots[dbPath]) for dbPath in snapshots))
+
+        # Every user that has not changed since the save began is now written back to the store
+        if bbConfig.lazyUserLoading:
+            bbGlobals.usersDB.evictColdUsers()
+
+        # The users save now includes all balance changes made before it was taken
+        if bbGlobals.economyJournal is not None:
+            await bbGlobals.economyJournal.compact(usersSaveGeneration)
+
     bbLogger.save()
-    print(datetime.now().strftime("%H:%M:%S: Data saved!"))
+    print(datetime.now().strftime("%H:%M:%S: Data saved!") + " Event loop blocked for " + str(round(bbGlobals.lastSaveLoopBlockedSeconds * 1000, 2)) + "ms. "
+            + ("Full users save." if fullUsersSave else (str(len(dirtyIDs)) + " changed users saved.")))
 
 
 async def expireAndAnnounceDuelReq(duelReqDict : DuelRequest.DuelRequest):
@@ -677,16 +864,18 @@ async def shutdown():
 
     This currently:
     - expires all non-saveable reaction menus
-    - logs out of discord
     - saves all savedata to file
+    - logs out of discord
+
+    Savedata is written before logging out, as logging out stops the event loop that the save's worker threads report back to.
     """
     menus = list(bbGlobals.reactionMenusDB.values())
     for menu in menus:
         if not menu.saveable:
             await menu.delete()
+    await saveAllDBs()
     botLoggedIn = False
     await bbGlobals.client.logout()
-    saveAllDBs()
     print(datetime.now().strftime("%H:%M:%S: Data saved!"))
 
 
@@ -1094,7 +1283,7 @@ async def cmd_check(message : discord.Message, args : str, isDM : bool):
     """
     # verify a system was given
     if args == "":
-        await message.channel.send(":x: Please provide a system to check! E.g: `" + bbConfig.commandPrefix + "check Pescal Inartu`")
+        await bbGlobals.outboundQueue.send(message.channel, ":x: Please provide a system to check! E.g: `" + bbConfig.commandPrefix + "check Pescal Inartu`")
         return
 
     requestedSystem = args.title()
@@ -1108,9 +1297,9 @@ async def cmd_check(message : discord.Message, args : str, isDM : bool):
     # reject if the requested system is not in the database
     if systObj is None:
         if len(requestedSystem) < 20:
-            await message.channel.send(":x: The **" + requestedSystem + "** system is not on my star map! :map:")
+            await bbGlobals.outboundQueue.send(message.channel, ":x: The **" + requestedSystem + "** system is not on my star map! :map:")
         else:
-            await message.channel.send(":x: The **" + requestedSystem[0:15] + "**... system is not on my star map! :map:")
+            await bbGlobals.outboundQueue.send(message.channel, ":x: The **" + requestedSystem[0:15] + "**... system is not on my star map! :map:")
         return
 
     requestedSystem = systObj.name
@@ -1119,7 +1308,7 @@ async def cmd_check(message : discord.Message, args : str, isDM : bool):
     requestedBBUser = bbGlobals.usersDB.getOrAddID(message.author.id)
 
     if not requestedBBUser.activeShip.hasWeaponsEquipped() and not requestedBBUser.activeShip.hasTurretsEquipped():
-        await message.channel.send(":x: Your ship has no weapons equipped!")
+        await bbGlobals.outboundQueue.send(message.channel, ":x: Your ship has no weapons equipped!")
         return
 
     # Restrict the number of bounties a player may win in a single day
@@ -1129,7 +1318,7 @@ async def cmd_check(message : discord.Message, args : str, isDM : bool):
                             hour=0, minute=0, second=0, microsecond=0) + timeDeltaFromDict({"hours": 24})
 
     if requestedBBUser.bountyWinsToday >= bbConfig.maxDailyBountyWins:
-        await message.channel.send(":x: You have reached the maximum number of bounty wins allowed for today! Check back tomorrow.")
+        await bbGlobals.outboundQueue.send(message.channel, ":x: You have reached the maximum number of bounty wins allowed for today! Check back tomorrow.")
         return
 
     # ensure the calling user is not on checking cooldown
@@ -1147,6 +1336,15 @@ async def cmd_check(message : discord.Message, args : str, isDM : bool):
                 # Check the passed system in current bounty
                 # If current bounty resides in the requested system
                 checkResult = bounty.check(requestedSystem, message.author.id)
+                # Only put the calling user on checking cooldown and increment systemsChecked stat if the system checked is on an active bounty's route.
+                # This is done before any awaits, so that the user cannot check again while this check is being announced.
+                if checkResult != 0 and not systemInBountyRoute:
+                    systemInBountyRoute = True
+                    requestedBBUser.systemsChecked += 1
+                    # Put the calling user on checking cooldown
+                    requestedBBUser.bountyCooldownEnd = (datetime.utcnow() +
+                                                         timedelta(minutes=bbConfig.checkCooldown["minutes"])).timestamp()
+
                 if checkResult == 3:
                     requestedBBUser.bountyWinsToday += 1
                     if not dailyBountiesMaxReached and requestedBBUser.bountyWinsToday >= bbConfig.maxDailyBountyWins:
@@ -1162,13 +1360,13 @@ async def cmd_check(message : discord.Message, args : str, isDM : bool):
                             userID).credits += rewards[userID]["reward"]
                         bbGlobals.usersDB.getUser(
                             userID).lifetimeCredits += rewards[userID]["reward"]
+                        bbEconomyJournal.recordUserCredits(bbGlobals.usersDB.getUser(userID), "bountyReward")
                     # add this bounty to the list of bounties to be removed
                     toPop += [bounty]
                     # Announce the bounty has ben completed
                     await announceBountyWon(bounty, rewards, message.guild, message.author.id)
 
                 if checkResult != 0:
-                    systemInBountyRoute = True
                     await updateAllBountyBoardChannels(bounty, bountyComplete=checkResult == 3)
 
             # remove all completed bounties
@@ -1190,37 +1388,17 @@ async def cmd_check(message : discord.Message, args : str, isDM : bool):
         # If a bounty was won, print a congratulatory message
         if bountyWon:
             requestedBBUser.bountyWins += 1
-            await message.channel.send(sightedCriminalsStr + "\n" + ":moneybag: **" + message.author.display_name + "**, you now have **" + str(requestedBBUser.credits) + " Credits!**\n" +
+            await bbGlobals.outboundQueue.send(message.channel, sightedCriminalsStr + "\n" + ":moneybag: **" + message.author.display_name + "**, you now have **" + str(requestedBBUser.credits) + " Credits!**\n" +
                                        ("You have now reached the maximum number of bounty wins allowed for today! Please check back tomorrow." if dailyBountiesMaxReached else "You have **" + str(bbConfig.maxDailyBountyWins - requestedBBUser.bountyWinsToday) + "** remaining bounty wins today!"))
 
-            if sightedCriminalsStr != "":
-                for currentGuild in bbGlobals.guildsDB.getGuilds():
-                    if currentGuild.id != message.guild.id and currentGuild.hasPlayChannel():
-                        currentCh = bbGlobals.client.get_channel(
-                            currentGuild.getPlayChannelId())
-                        if currentCh is not None:
-                            await currentCh.send(sightedCriminalsStr)
+            # Tell other guilds about the sightings in the next check digest
+            bbGlobals.checkDigest.addSightings(message.guild.id, sightedCriminalsStr)
         # If no bounty was won, print an error message
         else:
-            await message.channel.send(":telescope: **" + message.author.display_name + "**, you did not find any criminals in **" + requestedSystem.title() + "**!\n" + sightedCriminalsStr)
-
-            for currentGuild in bbGlobals.guildsDB.getGuilds():
-                if bbGlobals.client.get_guild(currentGuild.id) is not None:
-                    if currentGuild.id != message.guild.id and currentGuild.hasPlayChannel():
-                        currentCh = bbGlobals.client.get_channel(
-                            currentGuild.getPlayChannelId())
-                        if currentCh is not None:
-                            await currentCh.send(":telescope: **" + str(message.author) + "** checked **" + requestedSystem.title() + "**!\n" + sightedCriminalsStr)
-                        else:
-                            bbLogger.log("Main", "cmd_chk", "None playchannel received when posting global failed check to guild " + bbGlobals.client.get_guild(
-                                currentGuild.id).name + "#" + str(currentGuild.id) + " in channel ?#" + str(currentGuild.getPlayChannelId()), eventType="PLCH_NONE")
-
-        # Only put the calling user on checking cooldown and increment systemsChecked stat if the system checked is on an active bounty's route.
-        if systemInBountyRoute:
-            requestedBBUser.systemsChecked += 1
-            # Put the calling user on checking cooldown
-            requestedBBUser.bountyCooldownEnd = (datetime.utcnow() +
-                                                 timedelta(minutes=bbConfig.checkCooldown["minutes"])).timestamp()
+            await bbGlobals.outboundQueue.send(message.channel, ":telescope: **" + message.author.display_name + "**, you did not find any criminals in **" + requestedSystem.title() + "**!\n" + sightedCriminalsStr)
+
+            # Tell other guilds about the check in the next check digest, rather than sending a message to every guild for every check
+            bbGlobals.checkDigest.addCheck(message.guild.id, str(message.author), requestedSystem.title(), sightedCriminalsStr)
 
     # If the calling user is on checking cooldown
     else:
@@ -1229,7 +1407,7 @@ async def cmd_check(message : discord.Message, args : str, isDM : bool):
             message.author.id).bountyCooldownEnd) - datetime.utcnow()
         minutes = int(diff.total_seconds() / 60)
         seconds = int(diff.total_seconds() % 60)
-        await message.channel.send(":stopwatch: **" + message.author.display_name + "**, your *Khador Drive* is still charging! please wait **" + str(minutes) + "m " + str(seconds) + "s.**")
+        await bbGlobals.outboundQueue.send(message.channel, ":stopwatch: **" + message.author.display_name + "**, your *Khador Drive* is still charging! please wait **" + str(minutes) + "m " + str(seconds) + "s.**")
 
 bbCommands.register("check", cmd_check)
 bbCommands.register("search", cmd_check)
@@ -1932,9 +2110,9 @@ async def cmd_leaderboard(message : discord.Message, args : str, isDM : bool):
 
     # get the requested stats and sort users by the stat
     inputDict = {}
-    for user in bbGlobals.usersDB.getUsers():
-        if (globalBoard and bbGlobals.client.get_user(user.id) is not None) or (not globalBoard and message.guild.get_member(user.id) is not None):
-            inputDict[user.id] = user.getStatByName(stat)
+    for userID in bbGlobals.usersDB.getIds():
+        if (globalBoard and bbGlobals.client.get_user(userID) is not None) or (not globalBoard and message.guild.get_member(userID) is not None):
+            inputDict[userID] = bbGlobals.usersDB.getUserStat(userID, stat)
     sortedUsers = sorted(inputDict.items(), key=operator.itemgetter(1))[::-1]
 
     # build the leaderboard embed
@@ -2505,6 +2683,7 @@ async def cmd_shop_buy(message : discord.Message, args : str, isDM : bool):
         requestedBBUser.equipShipObj(requestedItem, noSaveActive=sellOldShip)
         requestedBBUser.credits -= newShipValue
         shopItemStock.removeItem(requestedItem)
+        bbEconomyJournal.recordUserCredits(requestedBBUser, "shopBuy", wholeUser=True)
 
         outStr = ":moneybag: Congratulations on your new **" + requestedItem.name + "**!"
         if sellOldShip:
@@ -2528,6 +2707,7 @@ async def cmd_shop_buy(message : discord.Message, args : str, isDM : bool):
         requestedBBUser.credits -= requestedItem.value
         requestedBBUser.getInactivesByName(item).addItem(requestedItem)
         shopItemStock.removeItem(requestedItem)
+        bbEconomyJournal.recordUserCredits(requestedBBUser, "shopBuy", wholeUser=True)
 
         await message.channel.send(":moneybag: Congratulations on your new **" + requestedItem.name + "**! \n\nYour balance is now: **" + str(requestedBBUser.credits) + " credits**.")
     else:
@@ -2597,6 +2777,7 @@ async def cmd_shop_sell(message : discord.Message, args : str, isDM : bool):
         requestedBBUser.credits += requestedItem.getValue()
         userItemInactives.removeItem(requestedItem)
         shopItemStock.addItem(requestedItem)
+        bbEconomyJournal.recordUserCredits(requestedBBUser, "shopSell", wholeUser=True)
 
         outStr = ":moneybag: You sold your **" + requestedItem.getNameOrNick() + \
             "** for **" + str(requestedItem.getValue()) + " credits**!"
@@ -2607,6 +2788,7 @@ async def cmd_shop_sell(message : discord.Message, args : str, isDM : bool):
     elif item in ["weapon", "module", "turret"]:
         requestedBBUser.credits += requestedItem.getValue()
         userItemInactives.removeItem(requestedItem)
+        bbEconomyJournal.recordUserCredits(requestedBBUser, "shopSell", wholeUser=True)
 
         if requestedItem is None:
             raise ValueError("selling NoneType Item")
@@ -2929,6 +3111,8 @@ async def cmd_pay(message : discord.Message, args : str, isDM : bool):
 
     sourceBBUser.credits -= amount
     targetBBUser.credits += amount
+    bbEconomyJournal.recordUserCredits(sourceBBUser, "pay")
+    bbEconomyJournal.recordUserCredits(targetBBUser, "pay")
 
     await message.channel.send(":moneybag: You paid " + bbUtil.userOrMemberName(requestedUser, message.guild) + " **" + str(amount) + "** credits!")
 
@@ -3759,19 +3943,59 @@ async def dev_cmd_save(message : discord.Message, args : str, isDM : bool):
     :param bool isDM: Whether or not the command is being called from a DM channel
     """
     try:
-        saveAllDBs()
+        await saveAllDBs()
     except Exception as e:
         print("SAVING ERROR", e.__class__.__name__)
         print(traceback.format_exc())
         await message.channel.send("failed!")
         return
     print(datetime.now().strftime("%H:%M:%S: Data saved manually!"))
-    await message.channel.send("saved!")
+    await message.channel.send("saved! Event loop blocked for " + str(round(bbGlobals.lastSaveLoopBlockedSeconds * 1000, 2)) + "ms (max " + str(round(bbGlobals.maxSaveLoopBlockedSeconds * 1000, 2)) + "ms).")
 
 bbCommands.register("save", dev_cmd_save, isDev=True)
 dmCommands.register("save", dev_cmd_save, isDev=True)
 
 
+async def dev_cmd_scheduler_stats(message : discord.Message, args : str, isDM : bool):
+    """developer command printing percentiles of the lateness, duration and queue depth of each type of timed task's expiries
+
+    :param discord.Message message: the discord message calling the command
+    :param str args: ignored
+    :param bool isDM: Whether or not the command is being called from a DM channel
+    """
+    scheduler = bbGlobals.taskScheduler
+    uptimeMinutes = max((datetime.utcnow() - scheduler.startTime).total_seconds() / 60, 1 / 60)
+    outStr = str(len(scheduler)) + " tasks scheduled, " + str(len(scheduler.runningExpiries)) + " expiries queued or running.\n" \
+                + "Lateness and duration in ms, as p50/p90/p99/max.```"
+    for taskType, stats in sorted(scheduler.typeStats.items()):
+        outStr += "\n" + taskType + ": " + str(stats.numExpiries) + " runs (" + str(round(stats.numExpiries / uptimeMinutes, 2)) + "/min), " \
+                    + str(stats.numTimeouts) + " timeouts, " + str(stats.numErrors) + " errors" \
+                    + "\n  late " + "/".join(str(round(stats.lateness.percentile(p) * 1000, 1)) for p in (50, 90, 99)) + "/" + str(round(stats.lateness.maxValue * 1000, 1)) \
+                    + "\n  took " + "/".join(str(round(stats.duration.percentile(p) * 1000, 1)) for p in (50, 90, 99)) + "/" + str(round(stats.duration.maxValue * 1000, 1)) \
+                    + "\n  queue " + "/".join(str(stats.queueDepth.percentile(p)) for p in (50, 90, 99)) + "/" + str(stats.queueDepth.maxValue)
+    if len(scheduler.typeStats) == 0:
+        outStr += "\nNo timed tasks have expired yet."
+    await message.channel.send(outStr + "```")
+
+bbCommands.register("scheduler-stats", dev_cmd_scheduler_stats, isDev=True)
+dmCommands.register("scheduler-stats", dev_cmd_scheduler_stats, isDev=True)
+
+
+async def dev_cmd_reaction_stats(message : discord.Message, args : str, isDM : bool):
+    """developer command printing how many reaction events have been handled, and how many of them were on reaction menus
+
+    :param discord.Message message: the discord message calling the command
+    :param str args: ignored
+    :param bool isDM: Whether or not the command is being called from a DM channel
+    """
+    await message.channel.send(str(bbGlobals.reactionMenusDB.numFetchesAvoided) + " reaction events handled without fetching the message, "
+                                + str(bbGlobals.reactionMenusDB.numMenuReactions) + " of which were on menu options. "
+                                + str(len(bbGlobals.reactionMenusDB)) + " menus active.")
+
+bbCommands.register("reaction-stats", dev_cmd_reaction_stats, isDev=True)
+dmCommands.register("reaction-stats", dev_cmd_reaction_stats, isDev=True)
+
+
 async def dev_cmd_has_announce(message : discord.Message, args : str, isDM : bool):
     """developer command printing whether or not the current guild has an announcements channel set
 
@@ -4249,6 +4473,8 @@ async def dev_cmd_resetnewbountycool(message : discord.Message, args : str, isDM
     :param bool isDM: Whether or not the command is being called from a DM channel
     """
     bbGlobals.newBountyDelayReset = True
+    if bbGlobals.taskScheduler is not None:
+        bbGlobals.taskScheduler.wakeEvent.set()
     await message.channel.send(":ballot_box_with_check: New bounty cooldown reset!")
 
 bbCommands.register("resetnewbountycool",
@@ -4833,6 +5059,7 @@ async def dev_cmd_setbalance(message : discord.Message, args : str, isDM : bool)
         requestedBBUser = bbGlobals.usersDB.getUser(requestedUser.id)
     # update the balance
     requestedBBUser.credits = int(argsSplit[1])
+    bbEconomyJournal.recordUserCredits(requestedBBUser, "devSetBalance")
     await message.channel.send("Done!")
 
 bbCommands.register("setbalance", dev_cmd_setbalance, isDev=True)
@@ -4927,6 +5154,7 @@ dmCommands.register("debug-hangar", dev_cmd_debug_hangar, isDev=True)
 ####### MAIN FUNCTIONS #######
 
 
+
 @bbGlobals.client.event
 async def on_guild_join(guild : discord.Guild):
     """Create a database entry for new guilds when one is joined.
@@ -4966,47 +5194,10 @@ async def on_ready():
     - regular database saving to JSON
 
     TODO: Add bounty expiry and reaction menu (e.g duel challenges) expiry
-    TODO: Implement dynamic timedtask checking period
-    TODO: Move item initialization to separate method
     """
     ##### OBJECT SPAWNING #####
 
-    # generate bbCriminal objects from data in bbData
-    for criminalDict in bbData.builtInCriminalData.values():
-        bbData.builtInCriminalObjs[criminalDict["name"]] = bbCriminal.fromDict(criminalDict)
-        bbData.builtInCriminalObjs[criminalDict["name"]].builtIn = True
-        bbData.builtInCriminalData[criminalDict["name"]]["builtIn"] = True
-
-    # generate bbSystem objects from data in bbData
-    for systemDict in bbData.builtInSystemData.values():
-        bbData.builtInSystemObjs[systemDict["name"]] = bbSystem.fromDict(systemDict)
-        bbData.builtInSystemData[systemDict["name"]]["builtIn"] = True
-        bbData.builtInSystemObjs[systemDict["name"]].builtIn = True
-
-    # generate bbModule objects from data in bbData
-    for moduleDict in bbData.builtInModuleData.values():
-        bbData.builtInModuleObjs[moduleDict["name"]] = bbModuleFactory.fromDict(moduleDict)
-        bbData.builtInModuleData[moduleDict["name"]]["builtIn"] = True
-        bbData.builtInModuleObjs[moduleDict["name"]].builtIn = True
-
-    # generate bbWeapon objects from data in bbData
-    for weaponDict in bbData.builtInWeaponData.values():
-        bbData.builtInWeaponObjs[weaponDict["name"]] = bbWeapon.fromDict(weaponDict)
-        bbData.builtInWeaponData[weaponDict["name"]]["builtIn"] = True
-        bbData.builtInWeaponObjs[weaponDict["name"]].builtIn = True
-
-    # generate bbUpgrade objects from data in bbData
-    for upgradeDict in bbData.builtInUpgradeData.values():
-        bbData.builtInUpgradeObjs[upgradeDict["name"]] = bbShipUpgrade.fromDict(upgradeDict)
-        bbData.builtInUpgradeData[upgradeDict["name"]]["builtIn"] = True
-        bbData.builtInUpgradeObjs[upgradeDict["name"]].builtIn = True
-
-    # generate bbTurret objects from data in bbData
-    for turretDict in bbData.builtInTurretData.values():
-        bbData.builtInTurretObjs[turretDict["name"]] = bbTurret.fromDict(turretDict)
-        bbData.builtInTurretData[turretDict["name"]]["builtIn"] = True
-        bbData.builtInTurretObjs[turretDict["name"]].builtIn = True
-
+    bbBuiltIns.spawnBuiltInObjects()
 
 
     ##### ITEM TECHLEVEL AUTO-GENERATION #####
@@ -5071,13 +5262,41 @@ async def on_ready():
 
 
     # Databases
-    bbGlobals.usersDB = loadUsersDB(bbConfig.userDBPath)
-    bbGlobals.bountiesDB = loadBountiesDB(bbConfig.bountyDBPath)
-    bbGlobals.guildsDB = loadGuildsDB(bbConfig.guildDBPath)
+    dbLoadStart = time.perf_counter()
+    if bbConfig.databaseBackend == "sqlite":
+        bbGlobals.sqliteStore = bbSQLiteDB.bbSQLiteStore(bbConfig.sqliteDBPath)
+        if bbConfig.lazyUserLoading:
+            bbGlobals.usersDB = bbGlobals.sqliteStore.loadLazyUsersDB(bbConfig.userCacheSize)
+        else:
+            bbGlobals.usersDB = bbGlobals.sqliteStore.loadUsersDB()
+        bbGlobals.bountiesDB = bbGlobals.sqliteStore.loadBountiesDB(bbConfig.maxBountiesPerFaction, dbReload=True)
+        bbGlobals.guildsDB = bbGlobals.sqliteStore.loadGuildsDB()
+    elif bbConfig.lazyUserLoading:
+        raise ValueError("bbConfig: lazyUserLoading requires the 'sqlite' databaseBackend")
+    elif bbConfig.userDBFormat not in ["json", "ndjson", "binary"]:
+        raise ValueError("bbConfig: Unrecognised userDBFormat '" + bbConfig.userDBFormat + "'")
+    elif bbConfig.databaseBackend == "json":
+        if bbConfig.userDBSaveMode == "sharded" and bbUserDBShards.manifestExists(bbConfig.userDBShardDir):
+            journalRecords = bbUtil.readJSONLines(bbConfig.userDBJournalPath) if path.exists(bbConfig.userDBJournalPath) else []
+            bbGlobals.usersDB = bbUserDBShards.loadShardedUsersDB(bbConfig.userDBShardDir, bbConfig.userDBShardCount, journalRecords=journalRecords, numProcesses=bbConfig.userDBLoadProcesses)
+        else:
+            bbGlobals.usersDB = loadUsersDB(bbConfig.userDBPath, journalPath=bbConfig.userDBJournalPath, numProcesses=bbConfig.userDBLoadProcesses)
+            # Move the users database into shards on the first save
+            bbGlobals.usersDB.fullSaveRequired = bbConfig.userDBSaveMode == "sharded"
+        bbGlobals.bountiesDB = loadBountiesDB(bbConfig.bountyDBPath)
+        bbGlobals.guildsDB = loadGuildsDB(bbConfig.guildDBPath)
+    else:
+        raise ValueError("bbConfig: Unrecognised databaseBackend '" + bbConfig.databaseBackend + "'")
+    print("[on_ready] Loaded " + str(len(bbGlobals.usersDB.getIds())) + " users from " + bbConfig.databaseBackend + " in " + str(round(time.perf_counter() - dbLoadStart, 2)) + "s.")
 
-    for guild in bbGlobals.guildsDB.getGuilds():
-        if guild.hasBountyBoardChannel:
-            await guild.bountyBoardChannel.init(bbGlobals.client, bbData.bountyFactions)
+    if bbConfig.useEconomyJournal:
+        economyJournalEntries = bbUtil.readJSONLines(bbConfig.economyJournalPath) if path.exists(bbConfig.economyJournalPath) else []
+        print("[on_ready] Replayed " + str(bbGlobals.usersDB.applyEconomyJournal(economyJournalEntries)) + " economy journal entries.")
+        bbGlobals.economyJournal = bbEconomyJournal.bbEconomyJournal(bbConfig.economyJournalPath, writtenEntries=economyJournalEntries)
+
+    # Load all BBCs concurrently, as each may need several requests to find its listings
+    bbcInitSemaphore = asyncio.Semaphore(bbConfig.bbcMaxConcurrentInits)
+    await asyncio.gather(*(initBountyBoardChannel(guild, bbcInitSemaphore) for guild in bbGlobals.guildsDB.getGuilds() if guild.hasBountyBoardChannel))
 
     print("shop stocks are shared." if bbGlobals.guildsDB.getGuild(699744305274945650).shop.shipsStock is bbGlobals.guildsDB.getGuild(
         711548456019296289).shop.shipsStock else "shop stocks are not shared.")
@@ -5109,15 +5328,37 @@ async def on_ready():
     
     bbGlobals.shopRefreshTT = TimedTask.TimedTask(expiryDelta=timeDeltaFromDict(bbConfig.shopRefreshStockPeriod), autoReschedule=True, expiryFunction=refreshAndAnnounceAllShopStocks)
     bbGlobals.dbSaveTT = TimedTask.TimedTask(expiryDelta=timeDeltaFromDict(bbConfig.savePeriod), autoReschedule=True, expiryFunction=saveAllDBs)
-
-    bbGlobals.duelRequestTTDB = TimedTaskHeap.TimedTaskHeap()
+    if bbGlobals.economyJournal is not None:
+        bbGlobals.economyJournalFlushTT = TimedTask.TimedTask(expiryDelta=timeDeltaFromDict(bbConfig.economyJournalFlushPeriod), autoReschedule=True, expiryFunction=bbGlobals.economyJournal.flush)
 
     if bbConfig.timedTaskCheckingType not in ["fixed", "dynamic"]:
         raise ValueError("bbConfig: Invalid timedTaskCheckingType '" +
                          bbConfig.timedTaskCheckingType + "'")
-
-
-    bbGlobals.reactionMenusTTDB = TimedTaskHeap.TimedTaskHeap()
+    if bbConfig.timedTaskGroupBackend not in ["heap", "wheel"]:
+        raise ValueError("bbConfig: Invalid timedTaskGroupBackend '" + bbConfig.timedTaskGroupBackend + "'")
+
+    bbGlobals.taskScheduler = TimedTaskScheduler.TimedTaskScheduler(groupNames=["duelRequests", "reactionMenus"],
+                                                                    maxConcurrentExpiries=bbConfig.timedTaskMaxConcurrentExpiries,
+                                                                    expiryTimeoutSeconds=bbConfig.timedTaskExpiryTimeoutSeconds,
+                                                                    groupBackend=bbConfig.timedTaskGroupBackend,
+                                                                    wheelTickSeconds=bbConfig.timedTaskWheelTickSeconds,
+                                                                    wheelSlots=bbConfig.timedTaskWheelSlots)
+    bbGlobals.taskScheduler.scheduleTask(bbGlobals.shopRefreshTT)
+    bbGlobals.taskScheduler.scheduleTask(bbGlobals.newBountyTT)
+    # Cancelling a save part way through could leave save files half-written
+    bbGlobals.taskScheduler.scheduleTask(bbGlobals.dbSaveTT, timeBoxed=False)
+    if bbGlobals.economyJournalFlushTT is not None:
+        bbGlobals.taskScheduler.scheduleTask(bbGlobals.economyJournalFlushTT, timeBoxed=False)
+    bbGlobals.duelRequestTTDB = bbGlobals.taskScheduler.getGroup("duelRequests")
+    bbGlobals.messageFanOut = FanOut.MessageFanOut(maxConcurrent=bbConfig.fanOutMaxConcurrent,
+                                                    globalRatePerSecond=bbConfig.fanOutGlobalRatePerSecond, globalBurst=bbConfig.fanOutGlobalBurst,
+                                                    channelRatePerSecond=bbConfig.fanOutChannelRatePerSecond, channelBurst=bbConfig.fanOutChannelBurst,
+                                                    maxRetries=bbConfig.fanOutMaxRetries, retryBaseDelaySeconds=bbConfig.fanOutRetryBaseDelaySeconds)
+    bbGlobals.outboundQueue = OutboundQueue.OutboundQueue(coalesceWindowSeconds=bbConfig.outboundCoalesceWindowSeconds,
+                                                            maxPendingPerChannel=bbConfig.outboundMaxPendingPerChannel)
+    bbGlobals.checkDigest = CheckDigest.CheckDigest(windowSeconds=bbConfig.checkDigestWindowSeconds)
+    bbGlobals.bountyBoardSync = BountyBoardSync.BountyBoardSync(flushIntervalSeconds=bbConfig.bbcEditIntervalSeconds, maxConcurrentEdits=bbConfig.bbcMaxConcurrentEdits)
+    bbGlobals.reactionMenusTTDB = bbGlobals.taskScheduler.getGroup("reactionMenus")
 
     if not path.exists(bbConfig.reactionMenusDBPath):
         try:
@@ -5129,29 +5370,18 @@ async def on_ready():
 
     bbGlobals.reactionMenusDB = await loadReactionMenusDB(bbConfig.reactionMenusDBPath)
 
-    # TODO: find next closest task with min over heap[0] for all task DBs and delay by that amount
-    # newTaskAdded = False
-    # nextTask
-
     # execute regular tasks while the bot is logged in
     while botLoggedIn:
         if bbConfig.timedTaskCheckingType == "fixed":
             await asyncio.sleep(bbConfig.timedTaskLatenessThresholdSeconds)
-        # elif bbConfig.timedTaskCheckingType == "dynamic":
-
-        await bbGlobals.shopRefreshTT.doExpiryCheck()
+        elif bbConfig.timedTaskCheckingType == "dynamic":
+            await bbGlobals.taskScheduler.waitForNextTask()
 
         if bbGlobals.newBountyDelayReset:
-            await bbGlobals.newBountyTT.forceExpire()
+            await bbGlobals.taskScheduler.forceExpireTask(bbGlobals.newBountyTT)
             bbGlobals.newBountyDelayReset = False
-        else:
-            await bbGlobals.newBountyTT.doExpiryCheck()
-
-        await bbGlobals.dbSaveTT.doExpiryCheck()
 
-        await bbGlobals.duelRequestTTDB.doTaskChecking()
-
-        await bbGlobals.reactionMenusTTDB.doTaskChecking()
+        bbGlobals.taskScheduler.doTaskChecking()
 
 
 @bbGlobals.client.event
@@ -5243,6 +5473,8 @@ async def on_message(message : discord.Message):
             isDM = message.channel.type in [
                 discord.ChannelType.private, discord.ChannelType.group]
 
+            # Users held by the command across awaits must stay in the users database until it has finished
+            bbGlobals.usersDB.startCommand()
             try:
                 # Call the requested command
                 if isDM:
@@ -5254,6 +5486,8 @@ async def on_message(message : discord.Message):
                 bbLogger.log("Main", "on_message", "An unexpected error occured when calling command '" +
                              command + "' with args '" + args + "': " + e.__class__.__name__, trace=traceback.format_exc())
                 commandFound = True
+            finally:
+                bbGlobals.usersDB.finishCommand()
 
             # elif message.channel.type == discord.ChannelType.private:
             #     # Call the requested command
@@ -5274,17 +5508,18 @@ async def on_raw_reaction_add(payload : discord.RawReactionActionEvent):
     :param discord.RawReactionActionEvent payload: An event describing the message and the reaction added
     """
     if payload.user_id != bbGlobals.client.user.id:
-        emoji = bbUtil.dumbEmojiFromPartial(payload.emoji)
-        if emoji.sendable is None:
-            return
-
-        message = await bbGlobals.client.get_guild(payload.guild_id).get_channel(payload.channel_id).fetch_message(payload.message_id)
-        member = payload.member
-
-        if message.id in bbGlobals.reactionMenusDB and \
-                bbGlobals.reactionMenusDB[message.id].hasEmojiRegistered(emoji):
-            await bbGlobals.reactionMenusDB[message.id].reactionAdded(emoji, member)
-            # await bbGlobals.reactionMenusDB[message.id].updateMessage()
+        # Menus keep their own message, so there is no need to fetch the reacted message
+        menu, emoji = bbGlobals.reactionMenusDB.getMenuForReaction(payload.message_id, payload.emoji)
+        if menu is not None:
+            bbGlobals.usersDB.startCommand()
+            try:
+                await menu.reactionAdded(emoji, payload.member)
+            finally:
+                bbGlobals.usersDB.finishCommand()
+            # await menu.updateMessage()
+    elif payload.message_id in bbGlobals.reactionMenusDB:
+        # Menus track their own reactions, so that updateMessage only adds the reactions that are missing
+        bbGlobals.reactionMenusDB[payload.message_id].botReactionAdded(bbUtil.dumbEmojiFromPartial(payload.emoji))
 
 
 @bbGlobals.client.event
@@ -5295,17 +5530,40 @@ async def on_raw_reaction_remove(payload : discord.RawReactionActionEvent):
     :param discord.RawReactionActionEvent payload: An event describing the message and the reaction removed
     """
     if payload.user_id != bbGlobals.client.user.id:
-        emoji = bbUtil.dumbEmojiFromPartial(payload.emoji)
-        if emoji.sendable is None:
-            return
+        # Menus keep their own message, so there is no need to fetch the reacted message
+        menu, emoji = bbGlobals.reactionMenusDB.getMenuForReaction(payload.message_id, payload.emoji)
+        if menu is not None:
+            bbGlobals.usersDB.startCommand()
+            try:
+                await menu.reactionRemoved(emoji, menu.msg.guild.get_member(payload.user_id))
+            finally:
+                bbGlobals.usersDB.finishCommand()
+            # await menu.updateMessage()
+    elif payload.message_id in bbGlobals.reactionMenusDB:
+        # The bot's reaction was removed by someone else, so the next updateMessage should add it again
+        bbGlobals.reactionMenusDB[payload.message_id].botReactionRemoved(bbUtil.dumbEmojiFromPartial(payload.emoji))
+
+
+@bbGlobals.client.event
+async def on_raw_reaction_clear(payload : discord.RawReactionClearEvent):
+    """Called every time all reactions are cleared from a message.
+    If the message is a reaction menu, record that the bot's reactions have been removed.
 
-        message = await bbGlobals.client.get_guild(payload.guild_id).get_channel(payload.channel_id).fetch_message(payload.message_id)
-        member = message.guild.get_member(payload.user_id)
+    :param discord.RawReactionClearEvent payload: An event describing the message cleared
+    """
+    if payload.message_id in bbGlobals.reactionMenusDB:
+        bbGlobals.reactionMenusDB[payload.message_id].botReactionsCleared()
 
-        if message.id in bbGlobals.reactionMenusDB and \
-                bbGlobals.reactionMenusDB[message.id].hasEmojiRegistered(emoji):
-            await bbGlobals.reactionMenusDB[message.id].reactionRemoved(emoji, member)
-            # await bbGlobals.reactionMenusDB[message.id].updateMessage()
+
+@bbGlobals.client.event
+async def on_raw_reaction_clear_emoji(payload : discord.RawReactionClearEmojiEvent):
+    """Called every time all reactions with a particular emoji are cleared from a message.
+    If the message is a reaction menu, record that the bot's reaction with that emoji has been removed.
+
+    :param discord.RawReactionClearEmojiEvent payload: An event describing the message and the emoji cleared
+    """
+    if payload.message_id in bbGlobals.reactionMenusDB:
+        bbGlobals.reactionMenusDB[payload.message_id].botReactionRemoved(bbUtil.dumbEmojiFromPartial(payload.emoji))
 
 
 @bbGlobals.client.event
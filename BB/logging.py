@@ -26,7 +26,7 @@ class logger:
         self.logs = {"usersDB":{}, "guildsDB":{}, "bountiesDB":{},
                         "shop":{}, "escapedBounties": {}, "bountyConfig": {}, "duels": {},
                         "hangar": {}, "misc": {}, "bountyBoards": {}, "newBounties": {},
-                        "reactionMenus": {}, "userAlerts": {}}
+                        "reactionMenus": {}, "userAlerts": {}, "scheduling": {}, "messaging": {}}
 
 
     def isEmpty(self) -> bool:
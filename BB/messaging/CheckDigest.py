@@ -0,0 +1,126 @@
+from .. import bbGlobals
+from ..scheduling import TimedTask
+from ..logging import bbLogger
+from datetime import timedelta
+
+
+class CheckDigest:
+    """Gathers the system checks made in every guild, and periodically tells every other guild about them in a single digest message.
+    Previously, every check sent a message to every other guild's play channel, so outbound messages grew with checks multiplied by guilds.
+    Now each guild receives at most one message per windowSeconds, however many checks were made.
+
+    Checks are listed in the order they were made, with repeated checks of the same system by the same user shown once.
+    Criminal sighting lines are shown once each, however many checks reported them. Guilds are not told about checks made in their own guild.
+
+    :var windowSeconds: How long to gather checks for after the first check, before sending a digest
+    :vartype windowSeconds: float
+    :var maxMessageLength: The maximum length of a digest message. Checks that do not fit are counted instead of listed.
+    :vartype maxMessageLength: int
+    :var checks: The user name and system of every check gathered, mapped to the IDs of the guilds the check was made in. Stored as a dict to keep the order checks were made in.
+    :vartype checks: dict[tuple[str, str], set[int]]
+    :var sightings: Every criminal sighting line gathered, mapped to the IDs of the guilds that reported it
+    :vartype sightings: dict[str, set[int]]
+    :var flushTT: The TimedTask that will send the digest, or None if no checks are waiting
+    :vartype flushTT: TimedTask
+    :var numChecks: The total number of checks gathered
+    :vartype numChecks: int
+    :var numDigests: The total number of digest messages sent
+    :vartype numDigests: int
+    """
+
+    def __init__(self, windowSeconds=30, maxMessageLength=2000):
+        """
+        :param float windowSeconds: How long to gather checks for after the first check, before sending a digest (Default 30)
+        :param int maxMessageLength: The maximum length of a digest message (Default 2000)
+        """
+        self.windowSeconds = windowSeconds
+        self.maxMessageLength = maxMessageLength
+        self.checks = {}
+        self.sightings = {}
+        self.flushTT = None
+        self.numChecks = 0
+        self.numDigests = 0
+
+
+    def scheduleFlush(self):
+        """Schedule the digest to be sent in windowSeconds, if it is not already scheduled.
+        """
+        if self.flushTT is None:
+            self.flushTT = TimedTask.TimedTask(expiryDelta=timedelta(seconds=self.windowSeconds), expiryFunction=self.flush)
+            bbGlobals.taskScheduler.scheduleTask(self.flushTT)
+
+
+    def addSightings(self, guildID : int, sightedCriminalsStr : str):
+        """Record the criminal sightings reported by a check, to be shown in the next digest.
+
+        :param int guildID: The ID of the guild where the check was made
+        :param str sightedCriminalsStr: The sighting lines reported by the check, separated by new lines. May be empty.
+        """
+        for line in sightedCriminalsStr.split("\n"):
+            if line != "":
+                self.sightings.setdefault(line, set()).add(guildID)
+        if self.sightings:
+            self.scheduleFlush()
+
+
+    def addCheck(self, guildID : int, userName : str, system : str, sightedCriminalsStr=""):
+        """Record a check which did not win a bounty, to be shown in the next digest.
+
+        :param int guildID: The ID of the guild where the check was made
+        :param str userName: The name of the user who made the check
+        :param str system: The name of the system that was checked
+        :param str sightedCriminalsStr: The sighting lines reported by the check, separated by new lines (Default "")
+        """
+        self.checks.setdefault((userName, system), set()).add(guildID)
+        self.numChecks += 1
+        self.addSightings(guildID, sightedCriminalsStr)
+
+
+    def makeDigest(self, guildID : int) -> str:
+        """Build the digest message to send to the given guild, from the checks and sightings made in all other guilds.
+
+        :param int guildID: The ID of the guild to build a digest for
+        :return: The digest message, or "" if nothing happened in other guilds
+        :rtype: str
+        """
+        checkLines = [":telescope: **" + userName + "** checked **" + system + "**!" for (userName, system), guildIDs in self.checks.items() if guildIDs != {guildID}]
+        sightingLines = [line for line, guildIDs in self.sightings.items() if guildIDs != {guildID}]
+        if not checkLines and not sightingLines:
+            return ""
+
+        sightingsStr = "\n".join(sightingLines)
+        # Sightings are more useful than checks, so checks are left out first if the digest is too long
+        spaceLeft = self.maxMessageLength - len(sightingsStr) - len("\n...and " + str(len(checkLines)) + " more checks.\n")
+        shownLines = []
+        for line in checkLines:
+            spaceLeft -= len(line) + 1
+            if spaceLeft < 0:
+                break
+            shownLines.append(line)
+        if len(shownLines) < len(checkLines):
+            shownLines.append("...and " + str(len(checkLines) - len(shownLines)) + " more checks.")
+        return "\n".join(shownLines + sightingLines)[:self.maxMessageLength]
+
+
+    async def flush(self):
+        """Send a digest of all checks and sightings gathered since the last digest to the play channel of every guild, and start gathering again.
+        """
+        guilds = bbGlobals.guildsDB.getGuilds()
+        digests = []
+        for guild in guilds:
+            if guild.hasPlayChannel() and bbGlobals.client.get_guild(guild.id) is not None:
+                digest = self.makeDigest(guild.id)
+                if digest != "":
+                    digests.append((guild, digest))
+        self.checks = {}
+        self.sightings = {}
+        self.flushTT = None
+
+        for guild, digest in digests:
+            playCh = bbGlobals.client.get_channel(guild.getPlayChannelId())
+            if playCh is not None:
+                await bbGlobals.outboundQueue.post(playCh, digest)
+                self.numDigests += 1
+            else:
+                bbLogger.log("CheckDigest", "flush", "None playchannel received when posting check digest to guild " + bbGlobals.client.get_guild(
+                    guild.id).name + "#" + str(guild.id) + " in channel ?#" + str(guild.getPlayChannelId()), eventType="PLCH_NONE")
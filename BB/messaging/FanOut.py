@@ -0,0 +1,265 @@
+from __future__ import annotations
+from typing import List, Callable, Awaitable, Any
+
+from discord import HTTPException
+import asyncio
+import time
+
+
+class TokenBucket:
+    """A token bucket rate limiter. Tokens are added at a fixed rate up to a maximum, and each request must take a token.
+    This allows short bursts of up to capacity requests, while limiting the long-run rate to ratePerSecond.
+
+    :var ratePerSecond: The number of tokens added to the bucket per second
+    :vartype ratePerSecond: float
+    :var capacity: The maximum number of tokens the bucket can hold
+    :vartype capacity: float
+    :var tokens: The number of tokens in the bucket when it was last updated
+    :vartype tokens: float
+    :var updated: The time.monotonic time at which tokens was last updated
+    :vartype updated: float
+    :var pausedUntil: The time.monotonic time before which no tokens may be taken, e.g after a rate limit response
+    :vartype pausedUntil: float
+    """
+
+    def __init__(self, ratePerSecond : float, capacity : float):
+        """
+        :param float ratePerSecond: The number of tokens added to the bucket per second
+        :param float capacity: The maximum number of tokens the bucket can hold. The bucket starts full.
+        """
+        self.ratePerSecond = ratePerSecond
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.pausedUntil = 0.0
+
+
+    def refill(self):
+        """Add the tokens accumulated since the bucket was last updated.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.ratePerSecond)
+        self.updated = now
+
+
+    def pause(self, seconds : float):
+        """Prevent any tokens from being taken for the given number of seconds.
+
+        :param float seconds: How long to pause the bucket for
+        """
+        self.pausedUntil = max(self.pausedUntil, time.monotonic() + seconds)
+
+
+    async def acquire(self):
+        """Wait until a token is available, and take it.
+        """
+        while True:
+            self.refill()
+            now = time.monotonic()
+            if now < self.pausedUntil:
+                await asyncio.sleep(self.pausedUntil - now)
+            elif self.tokens >= 1:
+                self.tokens -= 1
+                return
+            else:
+                await asyncio.sleep((1 - self.tokens) / self.ratePerSecond)
+
+
+class FanOutJob:
+    """A message to be sent by a MessageFanOut, to a single channel.
+
+    :var label: A description of the job's destination to use in failure reports, e.g the guild's name and ID
+    :vartype label: str
+    :var channelID: The ID of the channel the message is sent to, used to apply the per-channel rate limit
+    :vartype channelID: int
+    :var send: A function returning a new coroutine that sends the message. It is called again for every retry, so it must not have side effects other than sending the message.
+    :vartype send: Callable[[], Awaitable]
+    :var followUp: A coroutine function to call once with the result of send after it succeeds, which is not retried, or None (Default None)
+    :vartype followUp: Callable[[Any], Awaitable]
+    """
+
+    def __init__(self, label : str, channelID : int, send : Callable[[], Awaitable], followUp : Callable[[Any], Awaitable] = None):
+        """
+        :param str label: A description of the job's destination to use in failure reports, e.g the guild's name and ID
+        :param int channelID: The ID of the channel the message is sent to, used to apply the per-channel rate limit
+        :param send: A function returning a new coroutine that sends the message. It is called again for every retry, so it must not have side effects other than sending the message.
+        :type send: Callable[[], Awaitable]
+        :param followUp: A coroutine function to call once with the result of send after it succeeds, which is not retried. (Default None)
+        :type followUp: Callable[[Any], Awaitable]
+        """
+        self.label = label
+        self.channelID = channelID
+        self.send = send
+        self.followUp = followUp
+
+
+class FanOutReport:
+    """The results of sending a batch of FanOutJobs.
+
+    :var numJobs: The number of jobs in the batch
+    :vartype numJobs: int
+    :var numSent: The number of jobs that were sent successfully, including their followUp
+    :vartype numSent: int
+    :var numRetries: The total number of retries made across all jobs
+    :vartype numRetries: int
+    :var failures: A description of the final error of each failed job, by job label
+    :vartype failures: dict[str, str]
+    :var durationSeconds: The time taken to send the whole batch
+    :vartype durationSeconds: float
+    """
+
+    def __init__(self, numJobs : int):
+        """
+        :param int numJobs: The number of jobs in the batch
+        """
+        self.numJobs = numJobs
+        self.numSent = 0
+        self.numRetries = 0
+        self.failures = {}
+        self.durationSeconds = 0.0
+
+
+    def __str__(self) -> str:
+        """Summarise the report in string format, listing every failure.
+
+        :return: A string summarising the batch's results
+        :rtype: str
+        """
+        summary = "Sent " + str(self.numSent) + "/" + str(self.numJobs) + " in " + str(round(self.durationSeconds, 2)) + "s with " \
+                    + str(self.numRetries) + " retries, " + str(len(self.failures)) + " failed."
+        return summary + "".join("\n -- " + label + ": " + error for label, error in self.failures.items())
+
+
+def getRetryAfter(exception : HTTPException) -> float:
+    """Read how long discord asked us to wait before retrying, from a rate limit response.
+
+    :param HTTPException exception: The exception raised by the rate limited request
+    :return: The number of seconds to wait, or None if the response did not say
+    :rtype: float
+    """
+    try:
+        return float(exception.response.headers["Retry-After"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+
+def isGlobalRateLimit(exception : HTTPException) -> bool:
+    """Decide whether a rate limit response applies to every request made by the bot, rather than just one route.
+
+    :param HTTPException exception: The exception raised by the rate limited request
+    :return: True if the response marks the rate limit as global, False otherwise
+    :rtype: bool
+    """
+    try:
+        return exception.response.headers.get("X-RateLimit-Global", "false").lower() == "true"
+    except AttributeError:
+        return False
+
+
+class MessageFanOut:
+    """Sends a message to many channels concurrently, such as a new bounty announcement to every guild.
+    At most maxConcurrent messages are in flight at once. Every send takes a token from a global rate limiter and a per-channel rate limiter first.
+    Rate limited (429) and server error (5xx) responses are retried with exponential backoff, honouring the Retry-After header if one is given.
+    A global rate limit response pauses every send made through this fan-out. Other errors are not retried.
+
+    :var semaphore: Limits the number of messages in flight at once
+    :vartype semaphore: asyncio.Semaphore
+    :var globalBucket: Rate limits every send made through this fan-out
+    :vartype globalBucket: TokenBucket
+    :var channelBuckets: Rate limits sends to each channel, by channel ID
+    :vartype channelBuckets: dict[int, TokenBucket]
+    :var channelRatePerSecond: The rate of each new per-channel rate limiter
+    :vartype channelRatePerSecond: float
+    :var channelBurst: The capacity of each new per-channel rate limiter
+    :vartype channelBurst: float
+    :var maxRetries: The maximum number of times to retry each job
+    :vartype maxRetries: int
+    :var retryBaseDelaySeconds: The delay before the first retry, doubled for each following retry
+    :vartype retryBaseDelaySeconds: float
+    """
+
+    def __init__(self, maxConcurrent=16, globalRatePerSecond=40, globalBurst=40, channelRatePerSecond=1, channelBurst=5, maxRetries=3, retryBaseDelaySeconds=1):
+        """
+        :param int maxConcurrent: The maximum number of messages in flight at once (Default 16)
+        :param float globalRatePerSecond: The maximum long-run rate of sends across all channels (Default 40)
+        :param float globalBurst: The number of sends across all channels that may be made at once before globalRatePerSecond applies (Default 40)
+        :param float channelRatePerSecond: The maximum long-run rate of sends to a single channel (Default 1)
+        :param float channelBurst: The number of sends to a single channel that may be made at once before channelRatePerSecond applies (Default 5)
+        :param int maxRetries: The maximum number of times to retry each job (Default 3)
+        :param float retryBaseDelaySeconds: The delay before the first retry, doubled for each following retry (Default 1)
+        """
+        self.semaphore = asyncio.Semaphore(maxConcurrent)
+        self.globalBucket = TokenBucket(globalRatePerSecond, globalBurst)
+        self.channelBuckets = {}
+        self.channelRatePerSecond = channelRatePerSecond
+        self.channelBurst = channelBurst
+        self.maxRetries = maxRetries
+        self.retryBaseDelaySeconds = retryBaseDelaySeconds
+
+
+    def getChannelBucket(self, channelID : int) -> TokenBucket:
+        """Get the rate limiter for sends to the given channel, creating it if needed.
+
+        :param int channelID: The ID of the channel
+        :return: The channel's rate limiter
+        :rtype: TokenBucket
+        """
+        if channelID not in self.channelBuckets:
+            self.channelBuckets[channelID] = TokenBucket(self.channelRatePerSecond, self.channelBurst)
+        return self.channelBuckets[channelID]
+
+
+    async def runJob(self, job : FanOutJob, report : FanOutReport):
+        """Send a single job, retrying rate limits and server errors, and record the outcome in report.
+
+        :param FanOutJob job: The job to send
+        :param FanOutReport report: The report of the batch the job belongs to
+        """
+        channelBucket = self.getChannelBucket(job.channelID)
+        for attempt in range(self.maxRetries + 1):
+            retryDelay = None
+            async with self.semaphore:
+                await channelBucket.acquire()
+                await self.globalBucket.acquire()
+                try:
+                    result = await job.send()
+                except HTTPException as e:
+                    if (e.status == 429 or e.status >= 500) and attempt < self.maxRetries:
+                        retryDelay = getRetryAfter(e) if e.status == 429 else None
+                        if retryDelay is None:
+                            retryDelay = self.retryBaseDelaySeconds * 2 ** attempt
+                        if e.status == 429:
+                            (self.globalBucket if isGlobalRateLimit(e) else channelBucket).pause(retryDelay)
+                    else:
+                        report.failures[job.label] = e.__class__.__name__ + " " + str(e.status) + ": " + str(e.text)
+                        return
+                except Exception as e:
+                    report.failures[job.label] = e.__class__.__name__ + ": " + str(e)
+                    return
+                else:
+                    break
+            # Wait outside of the semaphore, so that other jobs may be sent in the meantime
+            report.numRetries += 1
+            await asyncio.sleep(retryDelay)
+
+        if job.followUp is not None:
+            try:
+                await job.followUp(result)
+            except Exception as e:
+                report.failures[job.label] = "followUp " + e.__class__.__name__ + ": " + str(e)
+                return
+        report.numSent += 1
+
+
+    async def send(self, jobs : List[FanOutJob]) -> FanOutReport:
+        """Send all of the given jobs concurrently, and wait for every job to succeed or fail.
+
+        :param list[FanOutJob] jobs: The jobs to send
+        :return: A report of the batch's results
+        :rtype: FanOutReport
+        """
+        report = FanOutReport(len(jobs))
+        started = time.perf_counter()
+        await asyncio.gather(*(self.runJob(job, report) for job in jobs))
+        report.durationSeconds = time.perf_counter() - started
+        return report
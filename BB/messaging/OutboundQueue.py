@@ -0,0 +1,180 @@
+from __future__ import annotations
+from typing import List, Tuple
+
+from discord import Embed, Message, abc
+from ..logging import bbLogger
+import asyncio
+import traceback
+
+
+class OutboundMessage:
+    """A message waiting in an OutboundQueue to be sent to a channel.
+
+    :var content: The text of the message, or None to send only the embed
+    :vartype content: str
+    :var embed: The embed to attach to the message, or None to send only the text
+    :vartype embed: discord.Embed
+    :var future: Resolved with the discord.Message that this message was sent in, or with the exception raised when sending it. None if the sender is not waiting for the message to be sent.
+    :vartype future: asyncio.Future
+    """
+
+    def __init__(self, content : str, embed : Embed, future : asyncio.Future):
+        """
+        :param str content: The text of the message, or None to send only the embed
+        :param discord.Embed embed: The embed to attach to the message, or None to send only the text
+        :param asyncio.Future future: Future to resolve once the message has been sent, or None if the sender is not waiting for the message to be sent
+        """
+        self.content = content
+        self.embed = embed
+        self.future = future
+
+
+class OutboundQueue:
+    """A queue of messages to be sent, kept separately for each channel. Each channel's messages are sent one at a time, in the order they were queued.
+    Plain text messages queued to the same channel one after another are merged into a single message, separated by new lines, as long as the merged message fits in
+    maxMessageLength. Before sending plain text, the channel waits coalesceWindowSeconds for more text to merge. Messages with an embed are never merged, so embeds keep their order.
+
+    Each channel holds at most maxPendingPerChannel unsent messages. Queueing a message to a full channel waits until the channel has room,
+    so that a burst of commands slows down to the rate the channel can be sent to, rather than making a burst of requests.
+
+    :var coalesceWindowSeconds: How long to wait for more plain text to merge before sending plain text
+    :vartype coalesceWindowSeconds: float
+    :var maxPendingPerChannel: The maximum number of unsent messages each channel may hold
+    :vartype maxPendingPerChannel: int
+    :var maxMessageLength: The maximum length of a merged message
+    :vartype maxMessageLength: int
+    :var channelQueues: The unsent messages of each channel, by channel ID
+    :vartype channelQueues: dict[int, asyncio.Queue]
+    :var workers: The task sending each channel's messages, by channel ID. Only channels with unsent messages have a worker.
+    :vartype workers: dict[int, asyncio.Future]
+    :var numQueued: The total number of messages queued
+    :vartype numQueued: int
+    :var numSends: The total number of messages sent to discord, after merging
+    :vartype numSends: int
+    """
+
+    def __init__(self, coalesceWindowSeconds=0.25, maxPendingPerChannel=20, maxMessageLength=2000):
+        """
+        :param float coalesceWindowSeconds: How long to wait for more plain text to merge before sending plain text (Default 0.25)
+        :param int maxPendingPerChannel: The maximum number of unsent messages each channel may hold (Default 20)
+        :param int maxMessageLength: The maximum length of a merged message. Messages longer than this on their own are sent unmerged. (Default 2000)
+        """
+        self.coalesceWindowSeconds = coalesceWindowSeconds
+        self.maxPendingPerChannel = maxPendingPerChannel
+        self.maxMessageLength = maxMessageLength
+        self.channelQueues = {}
+        self.workers = {}
+        self.numQueued = 0
+        self.numSends = 0
+
+
+    async def enqueue(self, channel : abc.Messageable, message : OutboundMessage):
+        """Add a message to the given channel's queue, waiting for room if the channel is full, and make sure the channel has a worker to send it.
+
+        :param discord.abc.Messageable channel: The channel to send the message to
+        :param OutboundMessage message: The message to send
+        """
+        if channel.id not in self.channelQueues:
+            self.channelQueues[channel.id] = asyncio.Queue(maxsize=self.maxPendingPerChannel)
+        await self.channelQueues[channel.id].put(message)
+        self.numQueued += 1
+        # The channel's worker may have finished while waiting for room
+        if channel.id not in self.workers:
+            self.workers[channel.id] = asyncio.ensure_future(self.runChannel(channel))
+
+
+    async def post(self, channel : abc.Messageable, content=None, embed=None):
+        """Queue a message to be sent to the given channel, without waiting for it to be sent. Failures to send the message are logged.
+        This waits only if the channel is full.
+
+        :param discord.abc.Messageable channel: The channel to send the message to
+        :param str content: The text of the message, or None to send only the embed (Default None)
+        :param discord.Embed embed: The embed to attach to the message, or None to send only the text (Default None)
+        """
+        await self.enqueue(channel, OutboundMessage(content, embed, None))
+
+
+    async def send(self, channel : abc.Messageable, content=None, embed=None) -> Message:
+        """Queue a message to be sent to the given channel, and wait for it to be sent.
+        Exceptions raised when sending the message, such as discord.Forbidden, are raised here.
+
+        :param discord.abc.Messageable channel: The channel to send the message to
+        :param str content: The text of the message, or None to send only the embed (Default None)
+        :param discord.Embed embed: The embed to attach to the message, or None to send only the text (Default None)
+        :return: The discord message that the message was sent in. If the message was merged, this message also contains other text.
+        :rtype: discord.Message
+        """
+        future = asyncio.get_event_loop().create_future()
+        await self.enqueue(channel, OutboundMessage(content, embed, future))
+        return await future
+
+
+    def takeMergeable(self, pending : asyncio.Queue, first : OutboundMessage) -> Tuple[List[OutboundMessage], OutboundMessage]:
+        """Take the plain text messages from the front of a channel's queue that can be merged with the given plain text message.
+
+        :param asyncio.Queue pending: The channel's queue
+        :param OutboundMessage first: The plain text message to merge into
+        :return: The messages to merge, starting with first, and the message taken from the queue that could not be merged, or None
+        :rtype: tuple[list[OutboundMessage], OutboundMessage]
+        """
+        batch = [first]
+        length = len(first.content)
+        while not pending.empty():
+            message = pending.get_nowait()
+            if message.embed is not None or message.content is None or length + 1 + len(message.content) > self.maxMessageLength:
+                return batch, message
+            batch.append(message)
+            length += 1 + len(message.content)
+        return batch, None
+
+
+    async def runChannel(self, channel : abc.Messageable):
+        """Send all of the given channel's queued messages in order, merging plain text, until the channel's queue is empty.
+        However the worker exits, it is removed from workers. If it is cancelled, for example while sending, every message it has not sent
+        is dropped, and senders waiting for them have their futures cancelled rather than waiting forever.
+
+        :param discord.abc.Messageable channel: The channel to send messages to
+        """
+        pending = self.channelQueues[channel.id]
+        unmerged = None
+        batch = []
+        try:
+            while unmerged is not None or not pending.empty():
+                first = pending.get_nowait() if unmerged is None else unmerged
+                unmerged = None
+                batch = [first]
+                if first.embed is None and first.content is not None:
+                    if self.coalesceWindowSeconds > 0:
+                        await asyncio.sleep(self.coalesceWindowSeconds)
+                    batch, unmerged = self.takeMergeable(pending, first)
+                    sendArgs = {"content": "\n".join(message.content for message in batch)}
+                else:
+                    sendArgs = {"content": first.content, "embed": first.embed}
+
+                try:
+                    sentMessage = await channel.send(**sendArgs)
+                except Exception as e:
+                    bbLogger.log("OutboundQueue", "runChannel", "Failed to send " + str(len(batch)) + " queued message(s) to channel #" + str(channel.id) + ": " + e.__class__.__name__ + " " + str(e),
+                                    category="messaging", eventType="SEND_ERR", trace=traceback.format_exc())
+                    for message in batch:
+                        if message.future is not None and not message.future.done():
+                            message.future.set_exception(e)
+                else:
+                    for message in batch:
+                        if message.future is not None and not message.future.done():
+                            message.future.set_result(sentMessage)
+                batch = []
+                self.numSends += 1
+
+        finally:
+            del self.workers[channel.id]
+            # Messages are only left over if the worker did not finish normally
+            unsent = batch + ([unmerged] if unmerged is not None else [])
+            while not pending.empty():
+                unsent.append(pending.get_nowait())
+            if unsent:
+                bbLogger.log("OutboundQueue", "runChannel", "Worker for channel #" + str(channel.id) + " stopped with " + str(len(unsent)) + " unsent message(s), which were dropped",
+                                category="messaging", eventType="WORKER_STOP")
+                for message in unsent:
+                    if message.future is not None and not message.future.done():
+                        message.future.cancel()
@@ -52,6 +52,26 @@ async def markExpiredMenu(menuID : int):
         del bbGlobals.reactionMenusDB[menuID]
 
 
+def normaliseEmbedDict(embedDict : dict) -> dict:
+    """Strip the parts of a dictionary-serialized discord.Embed that discord adds or drops when sending the embed, so that an embed built
+    locally can be compared with the same embed fetched from discord. Empty values, "type", proxy URLs, image sizes and zero colours are removed.
+
+    :param dict embedDict: An embed serialized with discord.Embed.to_dict
+    :return: A new dictionary describing only the content of the embed
+    :rtype: dict
+    """
+    normalised = {}
+    for key, value in embedDict.items():
+        if key in ["type", "proxy_url", "proxy_icon_url", "width", "height"] or value in ["", None] or (key == "color" and value == 0):
+            continue
+        if isinstance(value, dict):
+            value = normaliseEmbedDict(value)
+            if not value:
+                continue
+        normalised[key] = value
+    return normalised
+
+
 class ReactionMenuOption:
     """An abstract class representing an option in a reaction menu.
     Reaction menu options must have a name and emoji. They may optionally have a function to call when added,
@@ -281,6 +301,10 @@ class ReactionMenu:
     :vartype targetMember: discord.Member
     :var targetRole: In order to interact with this menu, users must possess this role. All other reactions are ignored
     :vartype targetRole: discord.Role
+    :var reactionEmojis: The emojis that the bot has reacted to msg with, used to add and remove only the reactions that have changed when updating msg. Kept up to date by botReactionAdded, botReactionRemoved and botReactionsCleared
+    :vartype reactionEmojis: set[bbUtil.dumbEmoji]
+    :var sentEmbedDict: The dictionary form of the embed last sent in msg, normalised with normaliseEmbedDict, used to skip editing msg when the embed has not changed. None if msg has no embed.
+    :vartype sentEmbedDict: dict
     :var saveable: Class attribute indicating whether or not this type of ReactionMenu can be saved to file. If not, this menu will be forcibly deleted before bot shutdown.
     :vartype saveable: bool
     """
@@ -324,8 +348,34 @@ class ReactionMenu:
         self.timeout = timeout
         self.targetMember = targetMember
         self.targetRole = targetRole
+        # The held message's reactions and embeds are not updated by discord after it was sent or fetched, so the menu tracks them from reaction events
+        self.reactionEmojis = {bbUtil.dumbEmojiFromReaction(reaction.emoji) for reaction in msg.reactions if reaction.me}
+        self.sentEmbedDict = normaliseEmbedDict(Embed.from_dict(msg.embeds[0].to_dict()).to_dict()) if msg.embeds else None
 
     
+    def botReactionAdded(self, emoji : bbUtil.dumbEmoji):
+        """Record that the bot has reacted to the menu message with the given emoji.
+
+        :param bbUtil.dumbEmoji emoji: The emoji that the bot reacted with
+        """
+        self.reactionEmojis.add(emoji)
+
+
+    def botReactionRemoved(self, emoji : bbUtil.dumbEmoji):
+        """Record that the bot's reaction with the given emoji has been removed from the menu message, for example by a moderator.
+        The next updateMessage adds the reaction again if the emoji is still an option.
+
+        :param bbUtil.dumbEmoji emoji: The emoji whose reaction was removed
+        """
+        self.reactionEmojis.discard(emoji)
+
+
+    def botReactionsCleared(self):
+        """Record that every reaction has been cleared from the menu message.
+        """
+        self.reactionEmojis.clear()
+
+
     def hasEmojiRegistered(self, emoji : bbUtil.dumbEmoji) -> bool:
         """Decide whether or not the given emoji is an option in this menu
 
@@ -405,13 +455,24 @@ class ReactionMenu:
     
 
     async def updateMessage(self):
-        """Update the menu message by removing all reactions, replacing any existing embed with
-        up to date embed content, and readd all of the menu's option reactions.
+        """Update the menu message to match the menu, changing only what differs from what was last sent.
+        The embed is replaced with up to date embed content if it has changed. Reactions for emojis which are no longer options are cleared,
+        and the bot reacts with every option it has not yet reacted with. Users' reactions to options which are still in the menu are kept.
         """
-        await self.msg.clear_reactions()
-        await self.msg.edit(embed=self.getMenuEmbed())
+        menuEmbed = self.getMenuEmbed()
+        embedDict = normaliseEmbedDict(menuEmbed.to_dict())
+        if embedDict != self.sentEmbedDict:
+            await self.msg.edit(embed=menuEmbed)
+            self.sentEmbedDict = embedDict
+
+        for emoji in [emoji for emoji in self.reactionEmojis if emoji not in self.options]:
+            await self.msg.clear_reaction(emoji.sendable)
+            self.reactionEmojis.discard(emoji)
+
         for option in self.options:
-            await self.msg.add_reaction(option.sendable)
+            if option not in self.reactionEmojis:
+                await self.msg.add_reaction(option.sendable)
+                self.reactionEmojis.add(option)
 
 
     async def delete(self):
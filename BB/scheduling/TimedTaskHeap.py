@@ -1,13 +1,23 @@
 from . import TimedTask
-from heapq import heappop, heappush
+from datetime import datetime
 import inspect
 
 class TimedTaskHeap:
     """A min-heap of TimedTasks, sorted by task expiration time.
+    The heap is indexed by task, so that any task can be removed or moved to a new expiry time in O(log n) time,
+    without searching the heap or rebuilding it.
+
+    Each task is stored in an entry of [expiryTime, sequence number, task]. Entries hold their own copy of the task's expiryTime,
+    so that changing a task's expiryTime outside of the heap cannot break the heap's ordering - rescheduleTask or updateTask
+    should be used to move a scheduled task. Tasks with the same expiryTime are ordered by when they were scheduled.
     TODO: Return a value from the expiryFunction in case someone wants to use that
 
-    :var tasksHeap: The heap, stored as an array. tasksHeap[0] is always the TimedTask with the closest expiry time.
-    :vartype tasksHeap: list[TimedTask]
+    :var tasksHeap: The heap of task entries, stored as an array. tasksHeap[0] is always the entry of the TimedTask with the closest expiry time.
+    :vartype tasksHeap: list[list]
+    :var positions: The index in tasksHeap of every task's entry
+    :vartype positions: dict[TimedTask, int]
+    :var sequence: The sequence number to give the next entry
+    :vartype sequence: int
     :var expiryFunction: function reference to call upon the expiry of any TimedTask managed by this heap.
     :vartype expiryFunction: function
     :var hasExpiryFunction: Whether or not this heap has an expiry function to call
@@ -17,16 +27,21 @@ class TimedTaskHeap:
     :vartype hasExpiryFunctionArgs: bool
     :var asyncExpiryFunction: whether or not the expiryFunction is a coroutine and needs to be awaited
     :vartype asyncExpiryFunction: bool
+    :var wakeEvent: An event to set whenever a task is scheduled to expire before every other task in the heap, or None to not signal new tasks
+    :vartype wakeEvent: asyncio.Event
     """
 
-    def __init__(self, expiryFunction=None, expiryFunctionArgs={}):
+    def __init__(self, expiryFunction=None, expiryFunctionArgs={}, wakeEvent=None):
         """
         :param function expiryFunction: function reference to call upon the expiry of any TimedTask managed by this heap. (Default None)
         :param expiryFunctionArgs: an object to pass to expiryFunction when calling. There is no type requirement, but a dictionary is recommended as a close representation of KWArgs. (Default {})
+        :param asyncio.Event wakeEvent: An event to set whenever a task is scheduled to expire before every other task in the heap, so that a task checking loop sleeping until the previous head's expiry can wake early. (Default None)
         """
         # self.taskType = taskType
         self.tasksHeap = []
-        
+        self.positions = {}
+        self.sequence = 0
+
         self.expiryFunction = expiryFunction
         self.hasExpiryFunction = expiryFunction is not None
         self.expiryFunctionArgs = expiryFunctionArgs
@@ -35,22 +50,136 @@ class TimedTaskHeap:
         # Track whether or not the expiryFunction is a coroutine and needs to be awaited
         self.asyncExpiryFunction = inspect.iscoroutinefunction(expiryFunction)
 
+        self.wakeEvent = wakeEvent
+
+
+    def moveEntry(self, entry : list, index : int):
+        """Place the given entry at the given index of tasksHeap, and record its new position.
+
+        :param list entry: The entry to move
+        :param int index: The index to move the entry to
+        """
+        self.tasksHeap[index] = entry
+        self.positions[entry[2]] = index
+
+
+    def siftUp(self, index : int):
+        """Move the entry at the given index towards the head of the heap, until its parent expires before it.
+
+        :param int index: The index of the entry to move
+        """
+        entry = self.tasksHeap[index]
+        while index > 0:
+            parentIndex = (index - 1) // 2
+            parent = self.tasksHeap[parentIndex]
+            if not entry < parent:
+                break
+            self.moveEntry(parent, index)
+            index = parentIndex
+        self.moveEntry(entry, index)
+
+
+    def siftDown(self, index : int):
+        """Move the entry at the given index away from the head of the heap, until it expires before both of its children.
+
+        :param int index: The index of the entry to move
+        """
+        entry = self.tasksHeap[index]
+        heapSize = len(self.tasksHeap)
+        while True:
+            childIndex = 2 * index + 1
+            if childIndex >= heapSize:
+                break
+            if childIndex + 1 < heapSize and self.tasksHeap[childIndex + 1] < self.tasksHeap[childIndex]:
+                childIndex += 1
+            if not self.tasksHeap[childIndex] < entry:
+                break
+            self.moveEntry(self.tasksHeap[childIndex], index)
+            index = childIndex
+        self.moveEntry(entry, index)
+
+
+    def removeTask(self, task : TimedTask.TimedTask) -> bool:
+        """Remove a task's entry from the heap without changing the task. Removing a task that is not in the heap has no effect.
+
+        :param TimedTask task: the task to remove from the heap
+        :return: True if the task was in the heap, False otherwise
+        :rtype: bool
+        """
+        index = self.positions.pop(task, None)
+        if index is None:
+            return False
+        lastEntry = self.tasksHeap.pop()
+        # Fill the gap left by the removed entry with the last entry in the heap
+        if index < len(self.tasksHeap):
+            self.moveEntry(lastEntry, index)
+            self.siftUp(index)
+            self.siftDown(self.positions[lastEntry[2]])
+        return True
+
 
     def cleanHead(self):
         """Remove expired tasks from the head of the heap.
         A task's 'gravestone' represents the task no longer being able to be called.
         I.e, it is expired (whether manually or through timeout) and does not auto-reschedule.
+        Tasks at the head of the heap whose expiryTime has been changed outside of the heap are moved to their new expiryTime.
         """
-        while len(self.tasks) > 0 and self.tasksHeap[0].gravestone:
-            heappop(self.tasksHeap)
+        while len(self.tasksHeap) > 0:
+            expiryTime, _, task = self.tasksHeap[0]
+            if task.gravestone:
+                self.removeTask(task)
+            elif task.expiryTime != expiryTime:
+                self.updateTask(task)
+            else:
+                break
 
 
     def scheduleTask(self, task : TimedTask.TimedTask):
-        """Schedule a new task onto this heap.
+        """Schedule a new task onto this heap. If the task is already scheduled, it is moved to its current expiryTime.
+        If the task is the next to expire, wakeEvent is set.
 
         :param TimedTask task: the task to schedule
         """
-        heappush(self.tasksHeap, task)
+        if task in self.positions:
+            self.updateTask(task)
+        else:
+            entry = [task.expiryTime, self.sequence, task]
+            self.sequence += 1
+            self.tasksHeap.append(entry)
+            self.siftUp(len(self.tasksHeap) - 1)
+        if self.wakeEvent is not None and self.positions[task] == 0:
+            self.wakeEvent.set()
+
+
+    def updateTask(self, task : TimedTask.TimedTask):
+        """Move a scheduled task to its current expiryTime, after its expiryTime has been changed outside of the heap.
+
+        :param TimedTask task: the task to move
+        :raise KeyError: If the task is not scheduled on this heap
+        """
+        index = self.positions[task]
+        entry = self.tasksHeap[index]
+        oldExpiryTime = entry[0]
+        entry[0] = task.expiryTime
+        if task.expiryTime < oldExpiryTime:
+            self.siftUp(index)
+        else:
+            self.siftDown(index)
+
+
+    def rescheduleTask(self, task : TimedTask.TimedTask, expiryTime : datetime):
+        """Move a scheduled task to a new expiry time, without calling its expiry function.
+        The task's expiryDelta is unchanged, so auto-rescheduling tasks return to their usual period after this expiry.
+
+        :param TimedTask task: The task to reschedule
+        :param datetime.datetime expiryTime: The new expiry time for the task
+        :raise KeyError: If the task is not scheduled on this heap
+        """
+        if task not in self.positions:
+            raise KeyError("Task is not scheduled: " + str(task))
+        task.expiryTime = expiryTime
+        task.gravestone = False
+        self.scheduleTask(task)
 
 
     def unscheduleTask(self, task : TimedTask.TimedTask):
@@ -60,7 +189,46 @@ class TimedTaskHeap:
         :param TimedTask task: the task to remove from the heap
         """
         task.gravestone = True
+        self.removeTask(task)
+
+
+    def peekTask(self) -> TimedTask.TimedTask:
+        """Get the task that is next due to expire, ignoring tasks that have been removed.
+
+        :return: The task at the head of the heap, or None if the heap is empty
+        :rtype: TimedTask
+        """
+        self.cleanHead()
+        return self.tasksHeap[0][2] if len(self.tasksHeap) > 0 else None
+
+
+    def getNextExpiryTime(self) -> datetime:
+        """Find when the next task in the heap is due to expire, ignoring tasks that have been removed.
+
+        :return: The expiryTime of the task at the head of the heap, or None if the heap is empty
+        :rtype: datetime.datetime
+        """
         self.cleanHead()
+        return self.tasksHeap[0][0] if len(self.tasksHeap) > 0 else None
+
+
+    def __contains__(self, task : TimedTask.TimedTask) -> bool:
+        """Decide whether or not the given task is scheduled on this heap.
+
+        :param TimedTask task: The task to look for
+        :return: True if task is in the heap, False otherwise
+        :rtype: bool
+        """
+        return task in self.positions
+
+
+    def __len__(self) -> int:
+        """Get the number of tasks in the heap.
+
+        :return: The number of tasks in the heap
+        :rtype: int
+        """
+        return len(self.tasksHeap)
 
 
     async def callExpiryFunction(self):
@@ -84,7 +252,7 @@ class TimedTaskHeap:
             else:
                 self.expiryFunction()
 
-    
+
 
     async def doTaskChecking(self):
         """Function to be called regularly (ideally in a main loop), that handles the expiring of tasks.
@@ -93,13 +261,15 @@ class TimedTaskHeap:
         Tasks are rescheduled if they are marked for auto-rescheduling.
         Expired, non-rescheduling tasks are removed from the heap.
         """
+        task = self.peekTask()
         # Is the task at the head of the heap expired?
-        while len(self.tasksHeap) > 0 and (self.tasksHeap[0].gravestone or await self.tasksHeap[0].doExpiryCheck()):
+        while task is not None and await task.doExpiryCheck():
             # Call the heap's expiry function
             if self.hasExpiryFunction:
                 await self.callExpiryFunction()
-            # Remove the expired task from the heap
-            task = heappop(self.tasksHeap)
-            # push autorescheduling tasks back onto the heap
-            if not task.gravestone:
-                heappush(self.tasksHeap, task)
+            # Move autorescheduling tasks to their new expiry time, and remove expired tasks from the heap
+            if task.gravestone:
+                self.removeTask(task)
+            elif task in self.positions:
+                self.updateTask(task)
+            task = self.peekTask()
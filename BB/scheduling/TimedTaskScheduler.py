@@ -0,0 +1,496 @@
+from __future__ import annotations
+from typing import List
+
+from . import TimedTask, TimedTaskHeap, TimedTaskWheel
+from ..logging import bbLogger
+from datetime import datetime
+from bisect import bisect_left
+import asyncio
+import math
+import time
+import traceback
+
+
+# Upper bounds of the histogram buckets used for times in seconds, from 1ms to roughly an hour, with two buckets per doubling
+timeBucketBounds = [0.001 * 2 ** (i / 2) for i in range(44)]
+# Upper bounds of the histogram buckets used for queue depths
+depthBucketBounds = [0, 1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 48, 64, 96, 128, 192, 256, 384, 512, 768, 1024]
+
+
+class TimedTaskHistogram:
+    """A fixed-size histogram of recorded values, from which percentiles can be estimated.
+    Each value is counted in the first bucket whose upper bound is at least the value. Values above every bound are counted in an overflow bucket.
+    Memory use does not grow with the number of recorded values, so histograms can be kept for the whole time the bot is running.
+
+    :var bounds: The upper bound of each bucket, in ascending order
+    :vartype bounds: list[float]
+    :var counts: The number of values counted in each bucket, followed by the overflow bucket
+    :vartype counts: list[int]
+    :var count: The number of values recorded
+    :vartype count: int
+    :var total: The sum of all recorded values
+    :vartype total: float
+    :var maxValue: The largest recorded value
+    :vartype maxValue: float
+    """
+
+    def __init__(self, bounds : List[float]):
+        """
+        :param list[float] bounds: The upper bound of each bucket, in ascending order
+        """
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0
+        self.maxValue = 0
+
+
+    def record(self, value : float):
+        """Count a value in the histogram.
+
+        :param float value: The value to record
+        """
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.maxValue = max(self.maxValue, value)
+
+
+    def percentile(self, percent : float) -> float:
+        """Estimate the value below which the given percentage of recorded values fall.
+        The estimate is the upper bound of the bucket containing that value, so is never lower than the true percentile,
+        and is capped at the largest recorded value.
+
+        :param float percent: The percentile to estimate, between 0 and 100
+        :return: The estimated percentile, or 0 if no values have been recorded
+        :rtype: float
+        """
+        if self.count == 0:
+            return 0
+        rank = max(1, math.ceil(self.count * percent / 100))
+        seen = 0
+        for bucket in range(len(self.bounds)):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self.bounds[bucket], self.maxValue)
+        return self.maxValue
+
+
+    def mean(self) -> float:
+        """Get the mean of all recorded values.
+
+        :return: The mean recorded value, or 0 if no values have been recorded
+        :rtype: float
+        """
+        return self.total / self.count if self.count > 0 else 0
+
+
+class TimedTaskTypeStats:
+    """Records how late, and for how long, the expiry functions of one type of TimedTask have run,
+    and how many other expiries were already queued or running when each task became due.
+    All times are in seconds.
+
+    :var numExpiries: The number of expiry functions run, including those that timed out or raised an exception
+    :vartype numExpiries: int
+    :var numTimeouts: The number of expiry functions cancelled for running longer than the scheduler's expiryTimeoutSeconds
+    :vartype numTimeouts: int
+    :var numErrors: The number of expiry functions that raised an exception
+    :vartype numErrors: int
+    :var lateness: The time between each task's expiry time and its expiry function starting
+    :vartype lateness: TimedTaskHistogram
+    :var duration: The time spent running each expiry function
+    :vartype duration: TimedTaskHistogram
+    :var queueDepth: The number of expiries already waiting or running when each task became due
+    :vartype queueDepth: TimedTaskHistogram
+    """
+
+    def __init__(self):
+        self.numExpiries = 0
+        self.numTimeouts = 0
+        self.numErrors = 0
+        self.lateness = TimedTaskHistogram(timeBucketBounds)
+        self.duration = TimedTaskHistogram(timeBucketBounds)
+        self.queueDepth = TimedTaskHistogram(depthBucketBounds)
+
+
+    def record(self, lateness : float, duration : float, queueDepth : int):
+        """Record a run of an expiry function.
+
+        :param float lateness: The time between the task's expiry time and its expiry function starting
+        :param float duration: The time spent running the expiry function
+        :param int queueDepth: The number of expiries already waiting or running when the task became due
+        """
+        self.numExpiries += 1
+        self.lateness.record(lateness)
+        self.duration.record(duration)
+        self.queueDepth.record(queueDepth)
+
+
+    def __str__(self) -> str:
+        """Get a summary of these stats in string format.
+
+        :return: A string summarising the lateness and duration of this type's expiry functions
+        :rtype: str
+        """
+        return str(self.numExpiries) + " expiries, " + str(self.numTimeouts) + " timeouts, " + str(self.numErrors) + " errors. " \
+                + "Lateness avg " + str(round(self.lateness.mean(), 3)) + "s, max " + str(round(self.lateness.maxValue, 3)) + "s. " \
+                + "Duration avg " + str(round(self.duration.mean(), 3)) + "s, max " + str(round(self.duration.maxValue, 3)) + "s."
+
+
+class TimedTaskGroup:
+    """A named set of TimedTasks owned by a TimedTaskScheduler, such as all duel request timeouts.
+    Provides the scheduleTask and unscheduleTask methods of TimedTaskHeap, so that a group may be used in place of a heap.
+
+    :var scheduler: The scheduler that owns this group's tasks
+    :vartype scheduler: TimedTaskScheduler
+    :var name: The name of this group, unique within its scheduler
+    :vartype name: str
+    :var tasks: The tasks in this group that are currently scheduled
+    :vartype tasks: set[TimedTask]
+    """
+
+    def __init__(self, scheduler : TimedTaskScheduler, name : str):
+        """
+        :param TimedTaskScheduler scheduler: The scheduler that owns this group's tasks
+        :param str name: The name of this group, unique within its scheduler
+        """
+        self.scheduler = scheduler
+        self.name = name
+        self.tasks = set()
+
+
+    def scheduleTask(self, task : TimedTask.TimedTask):
+        """Schedule a new task onto the scheduler, as part of this group.
+
+        :param TimedTask task: the task to schedule
+        """
+        self.scheduler.scheduleTask(task, group=self.name)
+
+
+    def unscheduleTask(self, task : TimedTask.TimedTask):
+        """Forcebly remove a task from the scheduler without 'expiring' it - no expiry functions or auto-rescheduling are called.
+
+        :param TimedTask task: the task to remove
+        """
+        self.scheduler.cancelTask(task)
+
+
+    def __len__(self) -> int:
+        """Get the number of tasks in this group that are currently scheduled.
+
+        :return: The number of scheduled tasks in this group
+        :rtype: int
+        """
+        return len(self.tasks)
+
+
+class TimedTaskScheduler:
+    """Owns every TimedTask checked by the bot's main loop, in a single indexed TimedTaskHeap sorted by task expiration time.
+    Each pass of the main loop only looks at the tasks that are due, so adding more scheduled tasks does not add to the cost of each pass.
+    Scheduling, cancelling and rescheduling a task all take O(log n) time.
+
+    Expiry functions are run in their own asyncio tasks, so that a slow expiry function does not hold up other due tasks.
+    At most maxConcurrentExpiries expiry functions run at once, and expiry functions which run for longer than
+    expiryTimeoutSeconds are cancelled, unless their task was scheduled with timeBoxed=False.
+    While a task's expiry function is running, the task is not in the heap, so it cannot expire again until the function has finished.
+
+    Tasks in groups may instead be kept in a TimedTaskWheel, by giving groupBackend="wheel". This makes scheduling and cancelling
+    grouped tasks O(1), at the cost of grouped tasks expiring up to one wheel tick late.
+
+    :var taskHeap: The heap of scheduled tasks, whose wakeEvent is this scheduler's wakeEvent
+    :vartype taskHeap: TimedTaskHeap
+    :var groupWheel: The timing wheel holding scheduled tasks in groups, or None if grouped tasks are kept in taskHeap
+    :vartype groupWheel: TimedTaskWheel
+    :var taskGroups: The group of every scheduled task that belongs to a group
+    :vartype taskGroups: dict[TimedTask, TimedTaskGroup]
+    :var groups: Every task group in this scheduler, by name
+    :vartype groups: dict[str, TimedTaskGroup]
+    :var wakeEvent: Set whenever a task is scheduled to expire before every other task, so that waitForNextTask can wake early
+    :vartype wakeEvent: asyncio.Event
+    :var wakeTime: The time that waitForNextTask is waiting until, or datetime.max if it is not waiting for a particular time
+    :vartype wakeTime: datetime.datetime
+    :var expirySemaphore: Limits the number of expiry functions running at once
+    :vartype expirySemaphore: asyncio.Semaphore
+    :var expiryTimeoutSeconds: The number of seconds an expiry function may run for before it is cancelled
+    :vartype expiryTimeoutSeconds: float
+    :var untimedTasks: Tasks whose expiry functions are never cancelled, however long they run
+    :vartype untimedTasks: set[TimedTask]
+    :var runningExpiries: The asyncio tasks currently running or waiting to run expiry functions
+    :vartype runningExpiries: set[asyncio.Task]
+    :var typeStats: Lateness, duration and queue depth records for each type of task, as named by getTaskType
+    :vartype typeStats: dict[str, TimedTaskTypeStats]
+    :var startTime: When the scheduler was created, for calculating expiry rates
+    :vartype startTime: datetime.datetime
+    """
+
+    def __init__(self, groupNames : List[str] = [], maxConcurrentExpiries=8, expiryTimeoutSeconds=120, groupBackend="heap", wheelTickSeconds=1.0, wheelSlots=512):
+        """
+        :param list[str] groupNames: The names of the task groups to create (Default [])
+        :param int maxConcurrentExpiries: The maximum number of expiry functions that may run at once (Default 8)
+        :param float expiryTimeoutSeconds: The number of seconds an expiry function may run for before it is cancelled (Default 120)
+        :param str groupBackend: "heap" to keep grouped tasks in taskHeap, or "wheel" to keep them in a TimedTaskWheel (Default "heap")
+        :param float wheelTickSeconds: The tick length of the wheel, if groupBackend is "wheel" (Default 1.0)
+        :param int wheelSlots: The number of slots in the wheel, if groupBackend is "wheel" (Default 512)
+        :raise ValueError: If groupBackend is not recognised
+        """
+        if groupBackend not in ["heap", "wheel"]:
+            raise ValueError("Unknown groupBackend: " + str(groupBackend))
+        self.taskGroups = {}
+        self.groups = {name: TimedTaskGroup(self, name) for name in groupNames}
+        self.wakeEvent = asyncio.Event()
+        self.wakeTime = datetime.max
+        self.taskHeap = TimedTaskHeap.TimedTaskHeap(wakeEvent=self.wakeEvent)
+        self.groupWheel = TimedTaskWheel.TimedTaskWheel(tickSeconds=wheelTickSeconds, numSlots=wheelSlots) if groupBackend == "wheel" else None
+        self.expirySemaphore = asyncio.Semaphore(maxConcurrentExpiries)
+        self.expiryTimeoutSeconds = expiryTimeoutSeconds
+        self.untimedTasks = set()
+        self.runningExpiries = set()
+        self.typeStats = {}
+        self.startTime = datetime.utcnow()
+
+
+    def getGroup(self, name : str) -> TimedTaskGroup:
+        """Get the task group with the given name, creating it if it does not exist.
+
+        :param str name: The name of the group
+        :return: The group with the given name
+        :rtype: TimedTaskGroup
+        """
+        if name not in self.groups:
+            self.groups[name] = TimedTaskGroup(self, name)
+        return self.groups[name]
+
+
+    def isScheduled(self, task : TimedTask.TimedTask) -> bool:
+        """Decide whether or not the given task is currently scheduled.
+
+        :param TimedTask task: The task to look for
+        :return: True if task is scheduled in this scheduler, False otherwise
+        :rtype: bool
+        """
+        return task in self.taskHeap or (self.groupWheel is not None and task in self.groupWheel)
+
+
+    def addToBackend(self, task : TimedTask.TimedTask):
+        """Add a task to the wheel if it is in a group and grouped tasks are kept in a wheel, or to the heap otherwise, at its current expiryTime.
+        If the task is already there, it is moved to its current expiryTime.
+
+        :param TimedTask task: The task to add
+        """
+        if self.groupWheel is not None and task in self.taskGroups:
+            self.groupWheel.scheduleTask(task)
+            if task.expiryTime < self.wakeTime:
+                self.wakeEvent.set()
+        else:
+            self.taskHeap.scheduleTask(task)
+
+
+    def discardTask(self, task : TimedTask.TimedTask):
+        """Remove the given task from the scheduler and from its group, without changing the task.
+
+        :param TimedTask task: The task to remove
+        """
+        self.taskHeap.removeTask(task)
+        if self.groupWheel is not None:
+            self.groupWheel.removeTask(task)
+        self.untimedTasks.discard(task)
+        group = self.taskGroups.pop(task, None)
+        if group is not None:
+            group.tasks.discard(task)
+
+
+    def getTaskType(self, task : TimedTask.TimedTask) -> str:
+        """Get the name under which the given task's expiry stats are recorded.
+        This is the name of the task's group if it has one, and the name of its expiry function otherwise.
+
+        :param TimedTask task: The task to name
+        :return: The type of the task
+        :rtype: str
+        """
+        if task in self.taskGroups:
+            return self.taskGroups[task].name
+        return task.expiryFunction.__name__ if task.hasExpiryFunction else "noExpiryFunction"
+
+
+    def scheduleTask(self, task : TimedTask.TimedTask, group=None, timeBoxed=True):
+        """Schedule a new task, or move an already scheduled task to its current expiryTime.
+
+        :param TimedTask task: the task to schedule
+        :param str group: The name of the task group to add the task to, or None to not add it to a group (Default None)
+        :param bool timeBoxed: Give False to never cancel the task's expiry function, e.g if cancelling it could leave a save half-written (Default True)
+        """
+        if group is not None:
+            self.taskGroups[task] = self.getGroup(group)
+            self.taskGroups[task].tasks.add(task)
+        if not timeBoxed:
+            self.untimedTasks.add(task)
+        self.addToBackend(task)
+
+
+    def rescheduleTask(self, task : TimedTask.TimedTask, expiryTime : datetime):
+        """Move a scheduled task to a new expiry time, without calling its expiry function.
+        The task's expiryDelta is unchanged, so auto-rescheduling tasks return to their usual period after this expiry.
+
+        :param TimedTask task: The task to reschedule
+        :param datetime.datetime expiryTime: The new expiry time for the task
+        :raise KeyError: If the task is not scheduled
+        """
+        if not self.isScheduled(task):
+            raise KeyError("Task is not scheduled: " + str(task))
+        task.expiryTime = expiryTime
+        task.gravestone = False
+        self.addToBackend(task)
+
+
+    def cancelTask(self, task : TimedTask.TimedTask):
+        """Forcebly remove a task from the scheduler without 'expiring' it - no expiry functions or auto-rescheduling are called.
+        Cancelling a task that is not scheduled has no effect.
+
+        :param TimedTask task: the task to remove
+        """
+        task.gravestone = True
+        self.discardTask(task)
+
+
+    async def forceExpireTask(self, task : TimedTask.TimedTask, callExpiryFunc=True):
+        """Force the expiry of a scheduled task now, calling its expiry function and rescheduling it if it auto-reschedules.
+
+        :param TimedTask task: The task to expire
+        :param bool callExpiryFunc: Whether or not to call the task's expiryFunction. Default: True
+        :return: The result of the expiry function, if it is called
+        """
+        result = await task.forceExpire(callExpiryFunc=callExpiryFunc)
+        if task.gravestone:
+            self.discardTask(task)
+        elif self.isScheduled(task):
+            self.addToBackend(task)
+        return result
+
+
+    def cleanHead(self):
+        """Remove cancelled tasks, and tasks expired outside of the scheduler, from the head of the heap.
+        Tasks at the head of the heap whose expiryTime has been changed outside of the scheduler are moved to their new expiryTime.
+        """
+        while len(self.taskHeap) > 0:
+            expiryTime, _, task = self.taskHeap.tasksHeap[0]
+            if task.gravestone:
+                self.discardTask(task)
+            elif task.expiryTime != expiryTime:
+                self.taskHeap.updateTask(task)
+            else:
+                break
+
+
+    def getNextExpiryTime(self) -> datetime:
+        """Find when the next scheduled task is due to expire.
+
+        :return: The expiryTime of the next task due to expire, or None if no tasks are scheduled. If grouped tasks are kept in a wheel, this may be earlier than any task is due.
+        :rtype: datetime.datetime
+        """
+        self.cleanHead()
+        nextExpiry = self.taskHeap.getNextExpiryTime()
+        if self.groupWheel is not None:
+            wheelExpiry = self.groupWheel.getNextExpiryTime()
+            if nextExpiry is None or (wheelExpiry is not None and wheelExpiry < nextExpiry):
+                return wheelExpiry
+        return nextExpiry
+
+
+    async def runExpiry(self, task : TimedTask.TimedTask, taskType : str, queueDepth : int):
+        """Run the expiry check of a due task, waiting for a free expiry slot first, and schedule the task again if it auto-reschedules.
+        The expiry function is cancelled if it runs for longer than expiryTimeoutSeconds, unless the task is untimed.
+        Cancelled auto-rescheduling tasks are still rescheduled. Exceptions raised by the expiry function are logged.
+
+        :param TimedTask task: The due task, which has already been removed from the heap or wheel
+        :param str taskType: The name under which to record the expiry's stats, as given by getTaskType
+        :param int queueDepth: The number of expiries already waiting or running when the task became due
+        """
+        stats = self.typeStats.setdefault(taskType, TimedTaskTypeStats())
+        async with self.expirySemaphore:
+            lateness = max((datetime.utcnow() - task.expiryTime).total_seconds(), 0.0)
+            started = time.perf_counter()
+            try:
+                if task in self.untimedTasks:
+                    await task.doExpiryCheck()
+                else:
+                    await asyncio.wait_for(task.doExpiryCheck(), timeout=self.expiryTimeoutSeconds)
+            except asyncio.TimeoutError:
+                stats.numTimeouts += 1
+                bbLogger.log("TimedTaskScheduler", "runExpiry", "Cancelled '" + taskType + "' expiry function after " + str(self.expiryTimeoutSeconds) + "s",
+                                category="scheduling", eventType="TT_TIMEOUT")
+                if task.autoReschedule:
+                    await task.reschedule()
+            except Exception as e:
+                stats.numErrors += 1
+                bbLogger.log("TimedTaskScheduler", "runExpiry", "Exception in '" + taskType + "' expiry function: " + e.__class__.__name__,
+                                category="scheduling", eventType="TT_EXPIRY_ERR", trace=traceback.format_exc())
+                if task.autoReschedule and task.isExpired():
+                    await task.reschedule()
+            stats.record(lateness, time.perf_counter() - started, queueDepth)
+
+        if task.gravestone:
+            self.discardTask(task)
+        elif not self.isScheduled(task):
+            self.addToBackend(task)
+
+
+    def startExpiry(self, task : TimedTask.TimedTask):
+        """Start running the expiry check of a due task in a new asyncio task. The task must already have been removed from the heap or wheel.
+
+        :param TimedTask task: The due task
+        """
+        expiry = asyncio.ensure_future(self.runExpiry(task, self.getTaskType(task), len(self.runningExpiries)))
+        self.runningExpiries.add(expiry)
+        expiry.add_done_callback(self.runningExpiries.discard)
+
+
+    def doTaskChecking(self):
+        """Function to be called regularly (ideally in a main loop), that handles the expiring of tasks.
+        Only tasks due to expire are checked. Their expiry functions are started in order of expiry, each in its own asyncio task,
+        and this method returns without waiting for them to finish. Auto-rescheduling tasks are scheduled again once their expiry
+        function has finished, and all other expired tasks are removed from the scheduler.
+        """
+        now = datetime.utcnow()
+        self.cleanHead()
+        while len(self.taskHeap) > 0 and self.taskHeap.tasksHeap[0][0] <= now:
+            task = self.taskHeap.tasksHeap[0][2]
+            # Remove the task from the heap while the expiry function runs, which may reschedule or cancel the task
+            self.taskHeap.removeTask(task)
+            self.startExpiry(task)
+            self.cleanHead()
+
+        if self.groupWheel is not None:
+            for task in self.groupWheel.popDueTasks(now):
+                if task.gravestone:
+                    self.discardTask(task)
+                # The task has been moved later outside of the scheduler
+                elif task.expiryTime > now:
+                    self.addToBackend(task)
+                else:
+                    self.startExpiry(task)
+
+
+    async def waitForNextTask(self):
+        """Sleep until the next scheduled task is due to expire.
+        Returns early if wakeEvent is set while waiting, e.g because an earlier task was scheduled.
+        """
+        nextExpiry = self.getNextExpiryTime()
+        if not self.wakeEvent.is_set():
+            delay = None if nextExpiry is None else (nextExpiry - datetime.utcnow()).total_seconds()
+            if delay is None or delay > 0:
+                self.wakeTime = datetime.max if nextExpiry is None else nextExpiry
+                try:
+                    await asyncio.wait_for(self.wakeEvent.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                self.wakeTime = datetime.max
+        self.wakeEvent.clear()
+
+
+    def __len__(self) -> int:
+        """Get the number of tasks currently scheduled.
+
+        :return: The number of scheduled tasks
+        :rtype: int
+        """
+        return len(self.taskHeap) + (len(self.groupWheel) if self.groupWheel is not None else 0)
@@ -0,0 +1,142 @@
+from typing import List
+
+from . import TimedTask
+from datetime import datetime, timedelta
+import math
+
+class TimedTaskWheel:
+    """A hashed timing wheel of TimedTasks, for holding large numbers of timeouts which are often cancelled, such as reaction menu timeouts.
+    Time is split into ticks of tickSeconds, counted from the wheel's creation. Each task is stored under the first tick at or after its expiryTime,
+    in the slot of the wheel for that tick number, modulo the number of slots. Tasks more than one revolution of the wheel away share a slot with
+    nearer tasks, and are skipped until their tick is reached.
+
+    Scheduling and cancelling a task take O(1) time, and tasks are compared by integer tick rather than by datetime.
+    In exchange, tasks expire on the first tick at or after their expiryTime, so may expire up to tickSeconds late.
+
+    :var tickSeconds: The length of a tick, in seconds
+    :vartype tickSeconds: float
+    :var slots: The tasks stored in each slot of the wheel, mapped to the tick they expire on
+    :vartype slots: list[dict[TimedTask, int]]
+    :var taskTicks: The tick that every task in the wheel expires on
+    :vartype taskTicks: dict[TimedTask, int]
+    :var epoch: The time of tick 0
+    :vartype epoch: datetime.datetime
+    :var currentTick: The latest tick whose tasks have been expired
+    :vartype currentTick: int
+    """
+
+    def __init__(self, tickSeconds=1.0, numSlots=512, epoch=None):
+        """
+        :param float tickSeconds: The length of a tick, in seconds. Tasks may expire up to this long after their expiryTime. (Default 1.0)
+        :param int numSlots: The number of slots in the wheel. Tasks up to tickSeconds * numSlots seconds away can be found without skipping over later tasks. (Default 512)
+        :param datetime.datetime epoch: The time of tick 0 (Default now)
+        """
+        self.tickSeconds = tickSeconds
+        self.slots = [{} for _ in range(numSlots)]
+        self.taskTicks = {}
+        self.epoch = datetime.utcnow() if epoch is None else epoch
+        self.currentTick = 0
+
+
+    def tickOf(self, time : datetime) -> int:
+        """Get the number of the first tick at or after the given time.
+
+        :param datetime.datetime time: The time to convert
+        :return: The number of the first tick at or after time
+        :rtype: int
+        """
+        return math.ceil((time - self.epoch).total_seconds() / self.tickSeconds)
+
+
+    def timeOf(self, tick : int) -> datetime:
+        """Get the time of the given tick.
+
+        :param int tick: The tick number to convert
+        :return: The time at which the tick begins
+        :rtype: datetime.datetime
+        """
+        return self.epoch + timedelta(seconds=tick * self.tickSeconds)
+
+
+    def scheduleTask(self, task : TimedTask.TimedTask):
+        """Schedule a task onto the wheel. If the task is already scheduled, it is moved to its current expiryTime.
+        Tasks whose expiryTime has already passed are scheduled for the next tick.
+
+        :param TimedTask task: the task to schedule
+        """
+        self.removeTask(task)
+        tick = max(self.tickOf(task.expiryTime), self.currentTick + 1)
+        self.slots[tick % len(self.slots)][task] = tick
+        self.taskTicks[task] = tick
+
+
+    def removeTask(self, task : TimedTask.TimedTask) -> bool:
+        """Remove a task from the wheel without changing the task. Removing a task that is not in the wheel has no effect.
+
+        :param TimedTask task: the task to remove from the wheel
+        :return: True if the task was in the wheel, False otherwise
+        :rtype: bool
+        """
+        tick = self.taskTicks.pop(task, None)
+        if tick is None:
+            return False
+        del self.slots[tick % len(self.slots)][task]
+        return True
+
+
+    def popDueTasks(self, now : datetime) -> List[TimedTask.TimedTask]:
+        """Remove and return every task in the wheel whose tick has been reached, and advance the wheel to the current tick.
+
+        :param datetime.datetime now: The current time
+        :return: All tasks whose tick is at or before now, in order of tick
+        :rtype: list[TimedTask]
+        """
+        nowTick = math.floor((now - self.epoch).total_seconds() / self.tickSeconds)
+        dueTasks = []
+        # Every slot needs checking at most once, however long it has been since the last check
+        for tick in range(self.currentTick + 1, min(nowTick, self.currentTick + len(self.slots)) + 1):
+            slot = self.slots[tick % len(self.slots)]
+            if slot:
+                slotDueTasks = [(taskTick, task) for task, taskTick in slot.items() if taskTick <= nowTick]
+                for taskTick, task in slotDueTasks:
+                    del slot[task]
+                    del self.taskTicks[task]
+                dueTasks += slotDueTasks
+        self.currentTick = max(self.currentTick, nowTick)
+        # Slots are visited in tick order, unless the wheel has fallen more than a revolution behind
+        if len(dueTasks) > 1:
+            dueTasks.sort(key=lambda dueTask: dueTask[0])
+        return [task for _, task in dueTasks]
+
+
+    def getNextExpiryTime(self) -> datetime:
+        """Find the time of the next tick that has tasks in its slot.
+        The tasks in that slot may be due on a later revolution of the wheel, so this is the earliest time that any task could be due.
+
+        :return: The time of the next tick with a non-empty slot, or None if the wheel is empty
+        :rtype: datetime.datetime
+        """
+        if len(self.taskTicks) == 0:
+            return None
+        for tick in range(self.currentTick + 1, self.currentTick + len(self.slots) + 1):
+            if self.slots[tick % len(self.slots)]:
+                return self.timeOf(tick)
+
+
+    def __contains__(self, task : TimedTask.TimedTask) -> bool:
+        """Decide whether or not the given task is scheduled on this wheel.
+
+        :param TimedTask task: The task to look for
+        :return: True if task is in the wheel, False otherwise
+        :rtype: bool
+        """
+        return task in self.taskTicks
+
+
+    def __len__(self) -> int:
+        """Get the number of tasks in the wheel.
+
+        :return: The number of tasks in the wheel
+        :rtype: int
+        """
+        return len(self.taskTicks)
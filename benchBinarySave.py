@@ -0,0 +1,37 @@
+# Compares the size and encoding and decoding speed of the ndjson and binary users save formats, on synthetic users.
+# Run this from the repository root: python benchBinarySave.py [numUsers]  (Default 100000)
+import os
+import random
+import sys
+import tempfile
+import benchUtil
+from BB.bbDatabases import bbUserDB, bbUserDBBinary
+from BB.bbConfig import bbData
+from BB import bbUtil
+
+
+benchUtil.setUpOffline()
+numUsers = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+random.seed(1)
+moduleNames = list(bbData.builtInModuleData)[:10]
+usersDBDict = benchUtil.makeUsersDBDict(numUsers)
+# Give every user a stack of modules, and one user a value that does not fit the compact layout
+for userDict in usersDBDict["users"].values():
+    userDict["inactiveModules"] = [{"item": {"name": random.choice(moduleNames), "builtIn": True}, "count": 2}]
+usersDBDict["users"]["1"]["credits"] = 10**30
+# Serialise the users as the bot does when saving, rather than saving the minimal dictionaries above
+usersDB = bbUserDB.fromDict(usersDBDict)
+usersDB.startSave()
+records = usersDB.toNDJSONRecords()
+
+with tempfile.TemporaryDirectory() as saveDir:
+    _, ndjsonEncodeTime = benchUtil.timeCall(bbUtil.writeJSONLines, saveDir + "/users.ndjson", records)
+    _, binaryEncodeTime = benchUtil.timeCall(bbUserDBBinary.writeBinarySave, saveDir + "/users.bin", records)
+    ndjsonRecords, ndjsonDecodeTime = benchUtil.timeCall(list, bbUtil.iterJSONLines(saveDir + "/users.ndjson"))
+    binaryRecords, binaryDecodeTime = benchUtil.timeCall(list, bbUserDBBinary.iterBinarySave(saveDir + "/users.bin"))
+    if binaryRecords[1:] != ndjsonRecords[1:]:
+        print("The binary save did not decode to the same users!")
+    for formatName, fileName, encodeTime, decodeTime in [("ndjson", "users.ndjson", ndjsonEncodeTime, ndjsonDecodeTime),
+                                                            ("binary", "users.bin", binaryEncodeTime, binaryDecodeTime)]:
+        print(formatName + " " + str(round(os.path.getsize(saveDir + "/" + fileName) / 1e6, 1)) + " MB, encode " + str(round(numUsers / encodeTime / 1000, 1))
+                + "k users/s, decode " + str(round(numUsers / decodeTime / 1000, 1)) + "k users/s")
@@ -0,0 +1,194 @@
+# Times announcing a won bounty to many guilds, and compares it with the previous announceBountyWon, which built an embed for every guild.
+# Run this from the repository root: python benchBountyWon.py [numGuilds] [numContributors]  (Default 500 and 20)
+# Discord is stood in for by in-memory guilds, users and channels, and the announcements are recorded rather than sent.
+# Like the bot itself, this needs bbPRIVATE to exist, but the bot does not log in.
+import asyncio
+import random
+import sys
+import time
+import benchUtil
+from BB.bbConfig import bbData
+from BB import bountybot, bbGlobals
+from BB.logging import bbLogger
+
+
+class BenchUser:
+    """A stand-in for a discord.User or discord.Member.
+    """
+    def __init__(self, id : int):
+        self.id = id
+        self.display_name = "user" + str(id)
+
+    def __str__(self) -> str:
+        return "user" + str(self.id) + "#0001"
+
+
+class BenchGuild:
+    """A stand-in for a discord.Guild, with a set of members.
+    """
+    def __init__(self, id : int, memberIDs : set):
+        self.id = id
+        self.name = "guild" + str(id)
+        self.members = {memberID: BenchUser(memberID) for memberID in memberIDs}
+
+    def get_member(self, id : int) -> BenchUser:
+        return self.members.get(id)
+
+
+class BenchChannel:
+    """A stand-in for a guild's discord.TextChannel.
+    """
+    def __init__(self, id : int):
+        self.id = id
+
+
+class BenchClient:
+    """A stand-in for the logged in client, holding the given guilds, each with a channel of the same ID.
+    """
+    def __init__(self, guilds : dict):
+        self.guilds = guilds
+        self.channels = {id: BenchChannel(id) for id in guilds}
+
+    def get_guild(self, id : int) -> BenchGuild:
+        return self.guilds.get(id)
+
+    def get_channel(self, id : int) -> BenchChannel:
+        return self.channels.get(id)
+
+    def get_user(self, id : int) -> BenchUser:
+        return BenchUser(id)
+
+
+class BenchBBGuild:
+    """A stand-in for a bbGuild whose play channel has the same ID as the guild.
+    """
+    def __init__(self, id : int):
+        self.id = id
+
+    def hasPlayChannel(self) -> bool:
+        return True
+
+    def getPlayChannelId(self) -> int:
+        return self.id
+
+
+class BenchGuildsDB:
+    """A stand-in for the guilds database, holding a BenchBBGuild for each of the given guild IDs.
+    """
+    def __init__(self, guildIDs : list):
+        self.guilds = [BenchBBGuild(id) for id in guildIDs]
+
+    def getGuilds(self) -> list:
+        return self.guilds
+
+
+class RecordingQueue:
+    """A stand-in for bbGlobals.outboundQueue, which records every announcement instead of sending it.
+    """
+    def __init__(self):
+        self.posts = []
+
+    async def post(self, channel : BenchChannel, content=None, embed=None):
+        self.posts.append((channel.id, content, embed.to_dict()))
+
+
+class BenchBounty:
+    """A stand-in for a bbBounty, with only the attributes that announcements read.
+    """
+    def __init__(self, criminal):
+        self.criminal = criminal
+        self.faction = criminal.faction
+        self.answer = random.choice(list(bbData.builtInSystemData))
+
+
+async def oldAnnounceBountyWon(bounty, rewards : dict, winningGuildObj, winningUserId : int):
+    """announceBountyWon before it shared embeds between guilds, for comparison.
+    For every guild, builds a new embed and looks up the guild, member and user once per contributing user.
+
+    :param bbBounty bounty: the bounty to announce
+    :param dict rewards: the rewards dictionary as defined by bbBounty.calculateRewards
+    :param discord.Guild winningGuildObj: the discord Guild object of the guild containing the winning user
+    :param int winningUserId: the user ID of the discord user that won the bounty
+    """
+    for currentGuild in bbGlobals.guildsDB.getGuilds():
+        if bbGlobals.client.get_guild(currentGuild.id) is not None:
+            if currentGuild.hasPlayChannel():
+                rewardsEmbed = bountybot.makeEmbed(titleTxt="Bounty Complete!", authorName=bountybot.criminalNameOrDiscrim(bounty.criminal) + " Arrested",
+                                                    icon=bounty.criminal.icon, col=bbData.factionColours[bounty.faction], desc="`Suspect located in '" + bounty.answer + "'`")
+
+                if bbGlobals.client.get_guild(currentGuild.id).get_member(winningUserId) is None:
+                    rewardsEmbed.add_field(name="1. 🏆 " + str(rewards[winningUserId]["reward"]) + " credits:", value=str(bbGlobals.client.get_user(winningUserId)) + " checked " + str(
+                        int(rewards[winningUserId]["checked"])) + " system" + ("s" if int(rewards[winningUserId]["checked"]) != 1 else ""), inline=False)
+                else:
+                    rewardsEmbed.add_field(name="1. 🏆 " + str(rewards[winningUserId]["reward"]) + " credits:", value="<@" + str(winningUserId) + "> checked " + str(
+                        int(rewards[winningUserId]["checked"])) + " system" + ("s" if int(rewards[winningUserId]["checked"]) != 1 else ""), inline=False)
+
+                place = 2
+                for userID in rewards:
+                    if not rewards[userID]["won"]:
+                        if bbGlobals.client.get_guild(currentGuild.id).get_member(userID) is None:
+                            rewardsEmbed.add_field(name=str(place) + ". " + str(rewards[userID]["reward"]) + " credits:", value=str(bbGlobals.client.get_user(
+                                userID)) + " checked " + str(int(rewards[userID]["checked"])) + " system" + ("s" if int(rewards[userID]["checked"]) != 1 else ""), inline=False)
+                        else:
+                            rewardsEmbed.add_field(name=str(place) + ". " + str(rewards[userID]["reward"]) + " credits:", value="<@" + str(userID) + "> checked " + str(
+                                int(rewards[userID]["checked"])) + " system" + ("s" if int(rewards[userID]["checked"]) != 1 else ""), inline=False)
+                        place += 1
+
+                if bbGlobals.client.get_channel(currentGuild.getPlayChannelId()) is not None:
+                    if currentGuild.id == winningGuildObj.id:
+                        await bbGlobals.outboundQueue.post(bbGlobals.client.get_channel(currentGuild.getPlayChannelId()), ":trophy: **You win!**\n**" + winningGuildObj.get_member(winningUserId).display_name + "** located and EMP'd **" + bounty.criminal.name + "**, who has been arrested by local security forces. :chains:", embed=rewardsEmbed)
+                    else:
+                        await bbGlobals.outboundQueue.post(bbGlobals.client.get_channel(currentGuild.getPlayChannelId()), ":trophy: Another server has located **" + bounty.criminal.name + "**!", embed=rewardsEmbed)
+
+                else:
+                    bbLogger.log("Main", "AnncBtyWn", "None playchannel received when posting bounty won to guild " + bbGlobals.client.get_guild(
+                        currentGuild.id).name + "#" + str(currentGuild.id) + " in channel ?#" + str(currentGuild.getPlayChannelId()), eventType="PLCH_NONE")
+
+
+async def timeAnnouncement(announceFunc, bounty : BenchBounty, rewards : dict, winningGuild : BenchGuild, winningUserId : int, numRuns=20):
+    """Announce the given bounty with announceFunc several times, recording the announcements made.
+
+    :param announceFunc: announceBountyWon, or oldAnnounceBountyWon
+    :param int numRuns: The number of times to announce the bounty (Default 20)
+    :return: The fastest time taken to announce the bounty in seconds, and the announcements made in that run
+    :rtype: tuple[float, list]
+    """
+    bestTime = None
+    for _ in range(numRuns):
+        bbGlobals.outboundQueue = RecordingQueue()
+        start = time.perf_counter()
+        await announceFunc(bounty, rewards, winningGuild, winningUserId)
+        runTime = time.perf_counter() - start
+        bestTime = runTime if bestTime is None else min(bestTime, runTime)
+    return bestTime, bbGlobals.outboundQueue.posts
+
+
+async def runBenchmark(numGuilds : int, numContributors : int):
+    """Announce a bounty won by the first of numContributors users to numGuilds guilds, with the old and current implementations.
+    Each guild has 200 random members. The first 30 guilds also contain 3 of the contributing users, and the first guild contains the winner.
+
+    :param int numGuilds: The number of guilds to announce the bounty to
+    :param int numContributors: The number of users that contributed to the bounty
+    """
+    random.seed(1)
+    contributorIDs = list(range(1000, 1000 + numContributors))
+    guilds = {}
+    for guildID in range(numGuilds):
+        memberIDs = set(random.sample(range(10**6), 200))
+        if guildID < 30:
+            memberIDs |= set(random.sample(contributorIDs, 3))
+        guilds[guildID] = BenchGuild(guildID, memberIDs | ({contributorIDs[0]} if guildID == 0 else set()))
+    bbGlobals.client = BenchClient(guilds)
+    bbGlobals.guildsDB = BenchGuildsDB(list(guilds))
+    bounty = BenchBounty(next(iter(bbData.builtInCriminalObjs.values())))
+    rewards = {userID: {"reward": random.randint(1, 500), "checked": random.randint(1, 9), "won": userID == contributorIDs[0]} for userID in contributorIDs}
+
+    oldTime, oldPosts = await timeAnnouncement(oldAnnounceBountyWon, bounty, rewards, guilds[0], contributorIDs[0])
+    newTime, newPosts = await timeAnnouncement(bountybot.announceBountyWon, bounty, rewards, guilds[0], contributorIDs[0])
+    print(str(numGuilds) + " guilds, " + str(numContributors) + " contributors, best of 20 runs: old " + str(round(oldTime * 1000, 1)) + "ms, new "
+            + str(round(newTime * 1000, 1)) + "ms (" + str(round(oldTime / newTime, 1)) + "x)")
+    print(str(len(newPosts)) + " announcements, " + ("identical to" if newPosts == oldPosts else "DIFFERENT from") + " the old implementation's")
+
+
+benchUtil.setUpOffline()
+asyncio.run(runBenchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 500, int(sys.argv[2]) if len(sys.argv) > 2 else 20))
@@ -0,0 +1,56 @@
+# Compares loading an ndjson users save serially and with bbConfig.userDBLoadProcesses worker processes, on synthetic users.
+# Run this from the repository root: python benchParallelLoad.py [numUsers ...]  (Default 10000 and 50000)
+# Also splits the serial load into decoding and building users, and times pickling the decoded records,
+# which is the extra work that the main process does to receive records from the workers.
+import os
+import pickle
+import random
+import sys
+import tempfile
+import benchUtil
+from BB.bbDatabases import bbUserDB, bbUserDBLoader
+from BB import bbUtil
+
+
+def writeSave(savePath : str, numUsers : int):
+    """Write a synthetic ndjson users save of numUsers users to savePath.
+
+    :param str savePath: The path to write the save to
+    :param int numUsers: The number of users to generate
+    """
+    random.seed(1)
+    bbUtil.writeJSONLines(savePath, [{"format": bbUserDB.ndjsonSaveFormat, "saveGeneration": 1}]
+                                    + [{"id": userID, "user": benchUtil.makeUserDict(userID)} for userID in range(1, numUsers + 1)])
+
+
+def loadSave(savePath : str, numProcesses : int) -> bbUserDB.bbUserDB:
+    """Load the users save at savePath as on_ready does, with the given number of worker processes.
+
+    :param str savePath: The path of the ndjson users save
+    :param int numProcesses: The number of worker processes to use. 0 loads the save serially.
+    :return: The loaded users database
+    :rtype: bbUserDB
+    """
+    records = bbUserDBLoader.iterNDJSONRecordsParallel(savePath, numProcesses) if numProcesses > 0 else bbUtil.iterJSONLines(savePath)
+    return bbUserDB.fromNDJSONRecords(records)
+
+
+if __name__ == "__main__":
+    benchUtil.setUpOffline()
+    print("CPU cores available: " + str(os.cpu_count()))
+    for numUsers in [int(arg) for arg in sys.argv[1:]] or [10000, 50000]:
+        with tempfile.TemporaryDirectory() as saveDir:
+            savePath = saveDir + "/users.ndjson"
+            writeSave(savePath, numUsers)
+            for numProcesses in [0, 2, 4]:
+                usersDB, loadTime = benchUtil.timeCall(loadSave, savePath, numProcesses)
+                print(str(numUsers) + " users, " + str(numProcesses) + " processes: loaded " + str(len(usersDB.getIds())) + " users in " + str(round(loadTime, 2)) + "s")
+                del usersDB
+
+            records, decodeTime = benchUtil.timeCall(list, bbUtil.iterJSONLines(savePath))
+            _, buildTime = benchUtil.timeCall(bbUserDB.fromNDJSONRecords, records)
+            (normalisedRecords, _), normaliseTime = benchUtil.timeCall(bbUserDBLoader.readNDJSONChunk, savePath, 0, os.path.getsize(savePath))
+            pickled, pickleTime = benchUtil.timeCall(pickle.dumps, normalisedRecords)
+            _, unpickleTime = benchUtil.timeCall(pickle.loads, pickled)
+            print("\tserial: decode " + str(round(decodeTime, 2)) + "s, build users " + str(round(buildTime, 2)) + "s")
+            print("\tworker: decode and normalise " + str(round(normaliseTime, 2)) + "s, pickle " + str(round(pickleTime, 2)) + "s, unpickle on the main process " + str(round(unpickleTime, 2)) + "s")
@@ -0,0 +1,64 @@
+# Compares loading and saving the users database with the JSON and SQLite backends, on synthetic users.
+# Run this from the repository root: python benchSQLiteStore.py [numUsers ...]  (Default 10000 and 100000)
+# Each backend is loaded in a fresh process, so that its memory use can be read from the process' RSS. Linux only.
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import benchUtil
+from BB.bbDatabases import bbUserDB, bbSQLiteDB
+from BB import bbUtil
+
+
+def generateSaves(saveDir : str, numUsers : int):
+    """Write a synthetic JSON users save of numUsers users to saveDir, with empty guilds and bounties saves, and migrate them into an SQLite file.
+
+    :param str saveDir: The directory to write the saves to
+    :param int numUsers: The number of users to generate
+    """
+    random.seed(1)
+    bbUtil.writeJSON(saveDir + "/users.json", benchUtil.makeUsersDBDict(numUsers))
+    bbUtil.writeJSON(saveDir + "/guilds.json", {})
+    bbUtil.writeJSON(saveDir + "/bounties.json", {})
+    _, migrateTime = benchUtil.timeCall(bbSQLiteDB.migrateFromJSON, saveDir + "/users.sqlite3", saveDir + "/users.json", saveDir + "/guilds.json", saveDir + "/bounties.json")
+    print("migrated " + str(numUsers) + " users in " + str(round(migrateTime, 2)) + "s. json save " + str(round(os.path.getsize(saveDir + "/users.json") / 2**20, 1))
+            + " MiB, sqlite save " + str(round(os.path.getsize(saveDir + "/users.sqlite3") / 2**20, 1)) + " MiB")
+
+
+def benchBackend(backend : str, saveDir : str):
+    """Load the users database from saveDir with the given backend, then save it with 1% of users changed.
+
+    :param str backend: "json" or "sqlite"
+    :param str saveDir: The directory holding the saves written by generateSaves
+    """
+    baseRSS = benchUtil.currentRSSMiB()
+    store = bbSQLiteDB.bbSQLiteStore(saveDir + "/users.sqlite3")
+    if backend == "json":
+        usersDB, loadTime = benchUtil.timeCall(bbUserDB.fromDict, bbUtil.readJSON(saveDir + "/users.json"))
+    else:
+        usersDB, loadTime = benchUtil.timeCall(store.loadUsersDB)
+    loadRSS = benchUtil.currentRSSMiB() - baseRSS
+
+    usersDB.startSave()
+    random.seed(2)
+    for userID in random.sample(sorted(usersDB.getIds()), len(usersDB.getIds()) // 100):
+        usersDB.getUser(userID).markDirty()
+    dirtyIDs, removedIDs = usersDB.startSave()
+    if backend == "json":
+        _, saveTime = benchUtil.timeCall(bbUtil.writeJSON, saveDir + "/usersOut.json", usersDB.toDict())
+    else:
+        _, saveTime = benchUtil.timeCall(store.writeSave, usersDB.toJournalRecords(dirtyIDs, removedIDs, includeStats=True), usersDB.saveGeneration, {}, {})
+    store.close()
+    print(backend.ljust(6) + " load " + str(round(loadTime, 2)) + "s, save with 1% of users changed " + str(round(saveTime, 3)) + "s, RSS after load +" + str(round(loadRSS)) + " MiB")
+
+
+benchUtil.setUpOffline()
+if len(sys.argv) == 4 and sys.argv[1] == "--backend":
+    benchBackend(sys.argv[2], sys.argv[3])
+else:
+    for numUsers in [int(arg) for arg in sys.argv[1:]] or [10000, 100000]:
+        with tempfile.TemporaryDirectory() as saveDir:
+            generateSaves(saveDir, numUsers)
+            for backend in ["json", "sqlite"]:
+                subprocess.run([sys.executable, __file__, "--backend", backend, saveDir], check=True)
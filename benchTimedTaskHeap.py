@@ -0,0 +1,102 @@
+# Times scheduling, rescheduling and cancelling TimedTasks in a TimedTaskHeap, and checks the heap's expiry order against a sorted list.
+# Run this from the repository root: python benchTimedTaskHeap.py [numTasks]  (Default 100000)
+# For comparison, also times rescheduling and cancelling in a plain heapq list of TimedTasks, as TimedTaskHeap stored them before it
+# was indexed. A plain heap must be searched to find a task, and re-heapified after changing one, so only 1000 of each are timed.
+import heapq
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from BB.scheduling import TimedTaskHeap, TimedTask
+
+
+def makeTasks(numTasks : int, baseTime : datetime, spreadSeconds : float):
+    """Make numTasks TimedTasks expiring at random times up to spreadSeconds after baseTime.
+
+    :param int numTasks: The number of tasks to make
+    :param datetime baseTime: The earliest expiry time
+    :param float spreadSeconds: The range of expiry times in seconds
+    :return: The new tasks
+    :rtype: list[TimedTask]
+    """
+    return [TimedTask.TimedTask(issueTime=baseTime, expiryTime=baseTime + timedelta(seconds=random.random() * spreadSeconds)) for _ in range(numTasks)]
+
+
+def checkExpiryOrder(numTasks : int, baseTime : datetime):
+    """Randomly cancel and reschedule tasks in a TimedTaskHeap, then check that draining the heap gives the remaining tasks in expiry order.
+
+    :param int numTasks: The number of tasks to schedule, and of random changes to make
+    :param datetime baseTime: The earliest expiry time
+    """
+    heap = TimedTaskHeap.TimedTaskHeap()
+    tasks = makeTasks(numTasks, baseTime, 1000)
+    for task in tasks:
+        heap.scheduleTask(task)
+    liveTasks = set(tasks)
+    for _ in range(numTasks):
+        task = random.choice(tasks)
+        if random.random() < 0.4:
+            heap.unscheduleTask(task)
+            liveTasks.discard(task)
+        elif task in liveTasks:
+            heap.rescheduleTask(task, baseTime + timedelta(seconds=random.random() * 1000))
+    drained = []
+    while len(heap) > 0:
+        drained.append(heap.peekTask())
+        heap.removeTask(drained[-1])
+    print("expiry order " + ("matches" if drained == sorted(liveTasks, key=lambda task: task.expiryTime) else "DOES NOT match")
+            + " a sorted list after " + str(numTasks) + " random cancels and reschedules")
+
+
+def plainHeapReschedule(plainHeap : list, tasks : list, expiryTimes : list):
+    """Reschedule each of the given tasks in a plain heapq list of TimedTasks, restoring heap order after each.
+
+    :param list plainHeap: A heapq list of TimedTasks
+    :param list tasks: The tasks to reschedule
+    :param list expiryTimes: The new expiry time for each task
+    """
+    for task, expiryTime in zip(tasks, expiryTimes):
+        task.expiryTime = expiryTime
+        heapq.heapify(plainHeap)
+
+
+def plainHeapCancel(plainHeap : list, tasks : list):
+    """Remove each of the given tasks from a plain heapq list of TimedTasks, restoring heap order after each.
+
+    :param list plainHeap: A heapq list of TimedTasks
+    :param list tasks: The tasks to remove
+    """
+    for task in tasks:
+        plainHeap.pop(plainHeap.index(task))
+        heapq.heapify(plainHeap)
+
+
+def printTime(label : str, func, *args):
+    """Call func with the given arguments, and print how long it took.
+
+    :param str label: A description of what func does
+    :param func: The function to time
+    """
+    start = time.perf_counter()
+    func(*args)
+    print(label.ljust(52) + str(round(time.perf_counter() - start, 3)) + "s")
+
+
+random.seed(1)
+numTasks = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+baseTime = datetime.utcnow()
+checkExpiryOrder(20000, baseTime)
+
+tasks = makeTasks(numTasks, baseTime, 1e5)
+newExpiryTimes = [baseTime + timedelta(seconds=random.random() * 1e5) for _ in range(numTasks)]
+order = list(range(numTasks))
+random.shuffle(order)
+heap = TimedTaskHeap.TimedTaskHeap()
+printTime("indexed: schedule " + str(numTasks), list, map(heap.scheduleTask, tasks))
+printTime("indexed: reschedule " + str(numTasks), list, map(heap.rescheduleTask, [tasks[i] for i in order], [newExpiryTimes[i] for i in order]))
+printTime("indexed: cancel " + str(numTasks), list, map(heap.unscheduleTask, [tasks[i] for i in order]))
+
+plainHeap = []
+printTime("plain heapq: schedule " + str(numTasks), list, map(heapq.heappush, [plainHeap] * numTasks, tasks))
+printTime("plain heapq: reschedule 1000 (heapify each)", plainHeapReschedule, plainHeap, [tasks[i] for i in order[:1000]], [newExpiryTimes[i] for i in order[:1000]])
+printTime("plain heapq: cancel 1000 (search + heapify each)", plainHeapCancel, plainHeap, [tasks[i] for i in order[:1000]])
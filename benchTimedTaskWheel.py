@@ -0,0 +1,99 @@
+# Compares scheduling, cancelling and expiring TimedTasks in a TimedTaskHeap and a TimedTaskWheel, and checks the wheel's expiries.
+# Run this from the repository root: python benchTimedTaskWheel.py [numTasks]  (Default 100000)
+# Tasks expire between 1 and 16 minutes from the start, like duel requests and reaction menus, and are expired in 1 second steps.
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from BB.scheduling import TimedTaskHeap, TimedTaskWheel, TimedTask
+
+
+def makeTasks(numTasks : int, baseTime : datetime):
+    """Make numTasks TimedTasks expiring at random times between 1 and 16 minutes after baseTime.
+
+    :param int numTasks: The number of tasks to make
+    :param datetime baseTime: The time that the tasks are issued
+    :return: The new tasks
+    :rtype: list[TimedTask]
+    """
+    return [TimedTask.TimedTask(issueTime=baseTime, expiryTime=baseTime + timedelta(seconds=60 + random.random() * 900)) for _ in range(numTasks)]
+
+
+def checkWheelExpiries(numTasks : int, numCancels : int, baseTime : datetime):
+    """Schedule tasks in a TimedTaskWheel, cancel some of them, and step through time.
+    Checks that every remaining task expires exactly once, not before its expiryTime and no more than one tick after, and that no cancelled task expires.
+
+    :param int numTasks: The number of tasks to schedule
+    :param int numCancels: The number of tasks to cancel
+    :param datetime baseTime: The time that the tasks are issued, and the wheel's epoch
+    """
+    wheel = TimedTaskWheel.TimedTaskWheel(tickSeconds=1, numSlots=512, epoch=baseTime)
+    tasks = makeTasks(numTasks, baseTime)
+    for task in tasks:
+        wheel.scheduleTask(task)
+    cancelled = set(random.sample(tasks, numCancels))
+    for task in cancelled:
+        wheel.removeTask(task)
+    expiries = {}
+    problems = 0
+    for second in range(1000):
+        now = baseTime + timedelta(seconds=second)
+        for task in wheel.popDueTasks(now):
+            if task in expiries or task in cancelled or now < task.expiryTime or now > task.expiryTime + timedelta(seconds=1):
+                problems += 1
+            expiries[task] = now
+    problems += len(tasks) - len(cancelled) - len(expiries)
+    print("wheel expiries checked for " + str(numTasks) + " tasks with " + str(numCancels) + " cancelled: " + ("ok" if problems == 0 else str(problems) + " PROBLEMS"))
+
+
+def drainHeap(heap : TimedTaskHeap.TimedTaskHeap, baseTime : datetime):
+    """Remove every task from the heap in expiry order, in 1 second steps.
+
+    :param TimedTaskHeap heap: The heap to drain
+    :param datetime baseTime: The time that the tasks were issued
+    """
+    for second in range(1001):
+        now = baseTime + timedelta(seconds=second)
+        while len(heap) > 0 and heap.getNextExpiryTime() <= now:
+            heap.removeTask(heap.peekTask())
+
+
+def drainWheel(wheel : TimedTaskWheel.TimedTaskWheel, baseTime : datetime):
+    """Remove every task from the wheel as it becomes due, in 1 second steps.
+
+    :param TimedTaskWheel wheel: The wheel to drain
+    :param datetime baseTime: The time that the tasks were issued
+    """
+    for second in range(1001):
+        wheel.popDueTasks(baseTime + timedelta(seconds=second))
+
+
+def printTimePerTask(label : str, numTasks : int, func, *args):
+    """Call func with the given arguments, and print how long it took per task.
+
+    :param str label: A description of what func does
+    :param int numTasks: The number of tasks that func handles
+    :param func: The function to time
+    """
+    start = time.perf_counter()
+    func(*args)
+    print(label.ljust(24) + str(round((time.perf_counter() - start) / numTasks * 1e6, 2)) + "us/task")
+
+
+random.seed(3)
+numTasks = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+baseTime = datetime(2026, 1, 1)
+checkWheelExpiries(5000, 2000, baseTime)
+
+for backendName in ["heap", "wheel"]:
+    for step in ["schedule and cancel", "expire"]:
+        backend = TimedTaskHeap.TimedTaskHeap() if backendName == "heap" else TimedTaskWheel.TimedTaskWheel(tickSeconds=1, numSlots=512, epoch=baseTime)
+        tasks = makeTasks(numTasks, baseTime)
+        if step == "expire":
+            for task in tasks:
+                backend.scheduleTask(task)
+            printTimePerTask(backendName + ": expire", numTasks, drainHeap if backendName == "heap" else drainWheel, backend, baseTime)
+        else:
+            printTimePerTask(backendName + ": schedule", numTasks, list, map(backend.scheduleTask, tasks))
+            random.shuffle(tasks)
+            printTimePerTask(backendName + ": cancel", numTasks, list, map(backend.removeTask, tasks))
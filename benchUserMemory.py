@@ -0,0 +1,36 @@
+# Measures the memory used by loaded users and their ships, and counts the item and emoji objects they hold, on synthetic users.
+# Run this from the repository root: python benchUserMemory.py [numUsers]  (Default 5000)
+# builtIn items and ship emojis are shared between users, so their object counts should not grow with the number of users.
+import gc
+import random
+import sys
+import tracemalloc
+import benchUtil
+from BB.bbObjects import bbUser
+
+
+def countObjects(className : str) -> int:
+    """Count the objects tracked by the garbage collector whose class has the given name.
+
+    :param str className: The name of the class to count instances of
+    :return: The number of live instances of the class
+    :rtype: int
+    """
+    return sum(1 for obj in gc.get_objects() if type(obj).__name__ == className)
+
+
+benchUtil.setUpOffline()
+numUsers = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+random.seed(1)
+userDicts = [benchUtil.makeUserDict(userID, numHangarShips=5) for userID in range(numUsers)]
+
+gc.collect()
+tracemalloc.start()
+users = [bbUser.fromDict(userID, userDicts[userID]) for userID in range(numUsers)]
+currentMemory, peakMemory = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+gc.collect()
+
+print(str(numUsers) + " users with an active ship and 5 hangar ships: traced memory " + str(round(currentMemory / 2**20, 1)) + " MiB (peak " + str(round(peakMemory / 2**20, 1)) + " MiB)")
+for className in ["bbShip", "bbWeapon", "dumbEmoji"]:
+    print("\t" + className + " objects: " + str(countObjects(className)))
@@ -0,0 +1,71 @@
+# Shared setup for the bench*.py scripts. Each script prints its own results, and can be run from the repository root while the bot is offline.
+import json
+import random
+import time
+from discord.ext import commands
+from BB.bbConfig import bbConfig, bbData
+from BB import bbGlobals
+from BB.bbObjects import bbBuiltIns, bbUser
+
+
+def setUpOffline():
+    """Spawn the builtIn objects that users, ships and items are built from, without starting the bot.
+    The client is never logged in. It is only used to look up custom emojis, which are all unknown offline.
+    """
+    bbGlobals.client = commands.Bot(command_prefix=bbConfig.commandPrefix)
+    bbBuiltIns.spawnBuiltInObjects()
+
+
+def makeUserDict(credits : int, numHangarShips=3) -> dict:
+    """Make a serialised user with the default loadout and numHangarShips random builtIn ships in their hangar, each with one weapon.
+    Uses the random module, so seed it for repeatable data.
+
+    :param int credits: The user's balance, so that users can be told apart
+    :param int numHangarShips: The number of ships to put in the user's hangar (Default 3)
+    :return: A dictionary that bbUser.fromDict accepts
+    :rtype: dict
+    """
+    shipNames = list(bbData.builtInShipData)[:20]
+    weaponNames = list(bbData.builtInWeaponData)[:10]
+    userDict = json.loads(json.dumps(bbUser.defaultUserDict))
+    userDict["credits"] = credits
+    userDict["systemsChecked"] = credits % 50
+    userDict["inactiveShips"] = [{"item": {"name": random.choice(shipNames), "builtIn": True, "weapons": [{"name": random.choice(weaponNames), "builtIn": True}]},
+                                    "count": 1} for _ in range(numHangarShips)]
+    return userDict
+
+
+def makeUsersDBDict(numUsers : int, numHangarShips=3) -> dict:
+    """Make a serialised users database of numUsers users made by makeUserDict, with IDs from 1 to numUsers.
+
+    :param int numUsers: The number of users to make
+    :param int numHangarShips: The number of ships in each user's hangar (Default 3)
+    :return: A dictionary that bbUserDB.fromDict accepts
+    :rtype: dict
+    """
+    return {"saveGeneration": 1, "users": {str(userID): makeUserDict(userID, numHangarShips=numHangarShips) for userID in range(1, numUsers + 1)}}
+
+
+def timeCall(func, *args, **kwargs):
+    """Call func with the given arguments, and time how long it took.
+
+    :param func: The function to call
+    :return: func's return value, and the time it took in seconds
+    :rtype: tuple
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def currentRSSMiB() -> float:
+    """Read this process' resident set size from /proc. Linux only.
+
+    :return: This process' resident memory in MiB
+    :rtype: float
+    """
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS"):
+                return int(line.split()[1]) / 1024
+    return 0.0
@@ -0,0 +1,7 @@
+# Writes the binary users database save at bbConfig.userDBPath out as newline-delimited JSON, for debugging.
+# Run this from the repository root. The exported save can be loaded by the bot in place of the binary save.
+from BB.bbConfig import bbConfig
+from BB.bbDatabases import bbUserDBBinary
+
+bbUserDBBinary.exportToNDJSON(bbConfig.userDBPath, bbConfig.userDBPath + ".ndjson")
+print("Exported " + bbConfig.userDBPath + " to " + bbConfig.userDBPath + ".ndjson")
@@ -0,0 +1,14 @@
+# Copies BountyBot's JSON save files into the SQLite database at bbConfig.sqliteDBPath.
+# Run this from the repository root while the bot is offline, then set bbConfig.databaseBackend to "sqlite".
+from discord.ext import commands
+from BB.bbConfig import bbConfig
+from BB import bbGlobals
+from BB.bbObjects import bbBuiltIns
+from BB.bbDatabases import bbSQLiteDB
+
+# Users are built from their saves to index their stats, which needs the builtIn items.
+# The client is never logged in. It is only used to look up custom emojis, which are all unknown offline.
+bbGlobals.client = commands.Bot(command_prefix=bbConfig.commandPrefix)
+bbBuiltIns.spawnBuiltInObjects()
+
+bbSQLiteDB.migrateFromJSON(bbConfig.sqliteDBPath, bbConfig.userDBPath, bbConfig.guildDBPath, bbConfig.bountyDBPath, userDBJournalPath=bbConfig.userDBJournalPath)